@@ -1,19 +1,29 @@
 # auto_pr/main.py
 import os
 import subprocess
-import requests
 import json
 from dotenv import load_dotenv
 import sys
 import re
+from collections import namedtuple
 # Add the parent directory of 'automation' to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from automation.jira_ticket_helper.main import get_jira_issue_info
+from automation.http_client.main import http_get, http_post
+from automation.jira_ticket_helper.main import get_jira_issue_title
+from automation.repo_context.main import RepoContext
+from automation.tracing.main import span, enable_from_env
 
 # Load environment variables from .env file
 load_dotenv()
 
+# GitHub REST API root. Set GITHUB_API_URL for GitHub Enterprise or a local stub.
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# Result of create_auto_pr: the PR URL, the branch it was opened from (the
+# ticket branch or its next free suffix) and its title.
+PullRequestResult = namedtuple('PullRequestResult', ['url', 'branch', 'title'])
+
 # ANSI color codes
 BLUE = '\033[0;34m'
 GREEN = '\033[0;32m'
@@ -46,19 +56,21 @@ def run_command(command):
         return None
     return result.stdout.strip()
 
-def get_default_branch():
+def get_default_branch(repo_context=None):
     """Fetch and return the default branch name from origin."""
     print_info("Fetching default branch name from origin...")
-    result = run_command("git remote show origin | grep 'HEAD branch' | cut -d' ' -f5")
+    repo_context = repo_context or RepoContext()
+    result = repo_context.default_branch
     if result is None:
         raise ValueError("Failed to fetch default branch name.")
     print_success(f"Default branch: {result}")
     return result
 
-def get_repo_info():
+def get_repo_info(repo_context=None):
     """Get the GitHub repository information."""
     print_info("Fetching repository information...")
-    remote_url = run_command("git config --get remote.origin.url")
+    repo_context = repo_context or RepoContext()
+    remote_url = repo_context.remote_url('origin')
     if remote_url is None:
         raise ValueError("Failed to get remote URL.")
     
@@ -84,7 +96,7 @@ def create_pull_request(owner, repo, title, body, head, base, github_token):
     """Create a pull request using GitHub API."""
     print_info("Creating pull request...")
     
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls"
     headers = {
         "Authorization": f"token {github_token}",
         "Accept": "application/vnd.github.v3+json"
@@ -96,7 +108,8 @@ def create_pull_request(owner, repo, title, body, head, base, github_token):
         "base": base
     }
 
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+    # Not retried on 5xx or read timeouts: GitHub may already have opened the PR.
+    response = http_post(url, headers=headers, data=json.dumps(data))
     
     if response.status_code == 201:
         pr_data = response.json()
@@ -116,15 +129,15 @@ def push_branch(branch_name):
 def get_pr_title(ticket_name):
     """Generate PR title based on Jira ticket information."""
     print_info(f"Fetching Jira issue info for {ticket_name}...")
-    issue_info = get_jira_issue_info(ticket_name)
+    # Only the title and type are needed, so skip subtasks and linked issues.
+    issue_info = get_jira_issue_title(ticket_name)
     
     if 'error' in issue_info:
         print_error(f"Error fetching Jira issue info: {issue_info['error']}")
         return f"fix({ticket_name}): Update related to {ticket_name}"
     
-    main_issue = issue_info.get('main_issue', {})
-    issue_type = main_issue.get('type', '').lower()
-    issue_title = main_issue.get('title', '')
+    issue_type = issue_info.get('type', '').lower()
+    issue_title = issue_info.get('title', '')
     
     if issue_type in ['story', 'story subtask']:
         prefix = 'feat'
@@ -140,47 +153,64 @@ def get_pr_title(ticket_name):
     return f"{prefix}({ticket_name}): {issue_title}"
 
 def check_existing_pr(owner, repo, branch, github_token):
-    """Check if a pull request already exists for the given branch."""
+    """
+    Check if an open pull request exists for the given branch of this
+    repository (not a fork). GitHub filters on the head branch, so one small
+    response answers it. A failed lookup counts as no PR.
+    """
     print_verbose(f"Checking for existing PR for branch: {branch}")
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls"
     headers = {
         "Authorization": f"token {github_token}",
         "Accept": "application/vnd.github.v3+json"
     }
     params = {
         "head": f"{owner}:{branch}",
-        "state": "open"
+        "state": "open",
+        "per_page": 1
     }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        prs = response.json()
-        if prs:
-            print_verbose(f"Found existing PR for branch {branch}")
-            return True
+    response = http_get(url, headers=headers, params=params)
+    if response.status_code != 200:
+        print_warning(f"Could not check for an open PR on {branch} (status code {response.status_code}); assuming none")
+        return False
+    if response.json():
+        print_verbose(f"Found existing PR for branch {branch}")
+        return True
     print_verbose(f"No existing PR found for branch {branch}")
     return False
 
-def create_new_branch(base_branch):
-    """Create a new branch with an incremented suffix."""
-    print_verbose(f"Creating new branch based on: {base_branch}")
-    
+def get_next_branch_name(branch_name):
+    """Return the branch name with its numeric suffix incremented (or '-2' added)."""
     # Split the branch name by '-', but only split twice
-    parts = base_branch.split('-', 2)
-    print("parts: ", parts)
+    parts = branch_name.split('-', 2)
     
     if len(parts) == 3 and parts[2].isdigit():
         # If there's already a number after the second '-', increment it
         new_number = int(parts[2]) + 1
-        new_branch = f"{parts[0]}-{parts[1]}-{new_number}"
-    else:
-        # If there's no number after the second '-', add '-2'
-        new_branch = f"{base_branch}-2"
-    
-    print_verbose(f"New branch name: {new_branch}")
-    run_command(f"git checkout -b {new_branch} {base_branch}")
+        return f"{parts[0]}-{parts[1]}-{new_number}"
+    # If there's no number after the second '-', add '-2'
+    return f"{branch_name}-2"
+
+def find_free_branch(owner, repo, ticket_name, github_token):
+    """Follow the suffix sequence from ticket_name to the first branch without an open PR."""
+    branch = ticket_name
+    while check_existing_pr(owner, repo, branch, github_token):
+        print_warning(f"PR already exists for branch {branch}.")
+        branch = get_next_branch_name(branch)
+    return branch
+
+def create_new_branch(new_branch, base_branch):
+    """Create new_branch at the tip of base_branch without checking it out."""
+    print_verbose(f"Creating branch {new_branch} from {base_branch}")
+    # A single ref update: the working tree and current branch stay as they are.
+    # -f resets a suffix branch left over locally from an earlier run, whose PR
+    # is no longer open.
+    result = run_command(f"git branch -f {new_branch} {base_branch}")
+    if result is None:
+        raise ValueError(f"Failed to create branch {new_branch} from {base_branch}.")
     return new_branch
 
-def create_auto_pr(ticket_name, base_branch, custom_commit_message=None, github_token=None):
+def create_auto_pr(ticket_name, base_branch, custom_commit_message=None, github_token=None, repo_context=None):
     """
     Main function to create an automatic pull request.
     
@@ -189,9 +219,10 @@ def create_auto_pr(ticket_name, base_branch, custom_commit_message=None, github_
         base_branch (str): The base branch for the pull request.
         custom_commit_message (str, optional): Custom commit message for the PR.
         github_token (str, optional): GitHub API token. If not provided, it will be read from environment variables.
+        repo_context (RepoContext, optional): Shared git metadata for this run.
     
     Returns:
-        str: The URL of the created pull request.
+        PullRequestResult: The URL, head branch and title of the created pull request.
     
     Raises:
         ValueError: If any step in the process fails.
@@ -204,32 +235,34 @@ def create_auto_pr(ticket_name, base_branch, custom_commit_message=None, github_
             raise ValueError("GitHub token not found. Please provide it as an argument or set the GITHUB_TOKEN environment variable.")
 
     try:
-        owner, repo = get_repo_info()
+        with span('repo_info'):
+            owner, repo = get_repo_info(repo_context)
 
-        current_branch = ticket_name
         original_ticket = ticket_name
-        pr_exists = check_existing_pr(owner, repo, current_branch, github_token)
-        
-        while pr_exists:
-            print_warning(f"PR already exists for branch {current_branch}. Creating a new branch...")
-            current_branch = create_new_branch(current_branch)
-            pr_exists = check_existing_pr(owner, repo, current_branch, github_token)
+        with span('pr_branch'):
+            current_branch = find_free_branch(owner, repo, ticket_name, github_token)
+            if current_branch != ticket_name:
+                print_warning(f"Creating new branch {current_branch} for the PR...")
+                create_new_branch(current_branch, ticket_name)
 
-        push_branch(current_branch)
+        with span('push'):
+            push_branch(current_branch)
 
         if custom_commit_message:
             commit_message = custom_commit_message
         else:
             commit_message = get_commit_message(current_branch)
-        pr_title = get_pr_title(original_ticket)
+        with span('pr_title'):
+            pr_title = get_pr_title(original_ticket)
         
         # Prepend the PR title to the commit message
         pr_body = f"{pr_title}\n\n{commit_message}"
 
-        pr_url = create_pull_request(owner, repo, pr_title, pr_body, current_branch, base_branch, github_token)
+        with span('pull_request'):
+            pr_url = create_pull_request(owner, repo, pr_title, pr_body, current_branch, base_branch, github_token)
 
         print_success("Auto PR process completed successfully.")
-        return pr_url
+        return PullRequestResult(pr_url, current_branch, pr_title)
     except Exception as e:
         print_error(f"Error in create_auto_pr: {str(e)}")
         raise
@@ -242,10 +275,11 @@ if __name__ == "__main__":
     ticket_name = sys.argv[1]
     base_branch = sys.argv[2]
     custom_commit_message = sys.argv[3] if len(sys.argv) == 4 else None
+    enable_from_env()
     try:
         print("Starting the auto PR process...")
-        pr_url = create_auto_pr(ticket_name, base_branch, custom_commit_message)
-        print(f"Pull request created: {pr_url}")
+        result = create_auto_pr(ticket_name, base_branch, custom_commit_message)
+        print(f"Pull request created: {result.url}")
     except ValueError as e:
         print_error(str(e))
         sys.exit(1)
\ No newline at end of file
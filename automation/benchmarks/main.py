@@ -0,0 +1,227 @@
+# benchmarks/main.py
+import sys
+import os
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# integrator.py imports its sibling packages as top-level modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.synthetic_repo.main import RepoSpec, generate_repo
+from automation.service_stubs.main import StubBehaviour, start_stub, stub_environment
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_REPEATS = 3
+PERCENTILES = (50, 90, 99)
+TICKET = 'BENCH-1'
+
+# Integrator phases in the order they run; 'amend' belongs to the checkout
+# commit mode and 'commit' to the plumbing one. 'total' covers all of them.
+PHASES = ('changes', 'commit_message', 'amend', 'commit', 'auto_pr', 'total')
+
+# Timings of one run, in seconds per phase; `error` is set when a phase failed
+# and the remaining phases were skipped.
+RunResult = namedtuple('RunResult', ['size', 'run', 'timings', 'requests', 'error'])
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+YELLOW = '\033[0;33m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_error(message):
+    """Print an error message in red."""
+    print(f"{RED}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[rank - 1]
+
+def run_integration(repo_path, ticket_name, github_token, commit_mode='checkout'):
+    """
+    Run the integrator's steps in order against one repository and return the
+    seconds spent in each. The steps are the ones integrator.py schedules, run
+    one after another so each can be timed on its own.
+    """
+    # Imported here so the stub URLs in the environment are picked up when the
+    # modules read their configuration.
+    from automation.repo_context.main import RepoContext
+    from automation.change_manifest.main import MANIFEST_FILENAME
+    from automation.git_change_processor.main import process_git_changes, stage_ticket_tree, commit_ticket_tree
+    from automation.llm_handler.main import generate_commit_message
+    from automation.auto_pr.main import create_auto_pr
+    from automation.integrator import parse_commit_message, update_commit_message
+
+    timings = {}
+
+    @contextlib.contextmanager
+    def phase(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    with RepoContext(cwd=repo_path) as repo_context:
+        with phase('total'):
+            ticket_tree = None
+            with phase('changes'):
+                if commit_mode == 'plumbing':
+                    ticket_tree = stage_ticket_tree(ticket_name, repo_context)
+                    changed = ticket_tree is not None
+                else:
+                    changed = process_git_changes(ticket_name, repo_context, commit_mode)
+                if not changed:
+                    raise RuntimeError("process_git_changes found no changes")
+            with phase('commit_message'):
+                manifest_path = os.path.join(repo_context.root, MANIFEST_FILENAME)
+                commit_message_json = generate_commit_message(ticket_name, manifest_path, use_cache=False,
+                                                              repo_context=repo_context)
+                commit_message = commit_message_json and parse_commit_message(commit_message_json)
+                if not commit_message:
+                    raise RuntimeError("generate_commit_message returned no message")
+            if ticket_tree is not None:
+                with phase('commit'):
+                    if commit_ticket_tree(ticket_tree, commit_message) is None:
+                        raise RuntimeError("commit_ticket_tree failed")
+            else:
+                with phase('amend'):
+                    update_commit_message(ticket_name, commit_message)
+            with phase('auto_pr'):
+                create_auto_pr(ticket_name, repo_context.current_branch, commit_message, github_token, repo_context)
+    return timings
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeats=DEFAULT_REPEATS, spec=None, behaviour=None, workdir=None, keep=False,
+                  commit_mode='checkout'):
+    """
+    Generate a repository per size and run, time every integrator phase against
+    local stubs, and return a list of RunResult. Repositories are generated
+    fresh for each run, outside the timed phases.
+    """
+    spec = spec or RepoSpec()
+    stubs = {name: start_stub(name, behaviour) for name in ('chat', 'github', 'jira')}
+    saved_environ = dict(os.environ)
+    saved_cwd = os.getcwd()
+    workdir = workdir or tempfile.mkdtemp(prefix='shared-scripts-bench-')
+    os.environ.update(stub_environment(stubs))
+    # Every run must reach the stubs rather than a local copy of a previous answer.
+    os.environ['LLM_CACHE_DISABLE'] = '1'
+    os.environ['JIRA_MIRROR_DISABLE'] = '1'
+
+    results = []
+    try:
+        for size in sizes:
+            for run in range(repeats):
+                for stub in stubs.values():
+                    stub.reset()
+                repo_path = os.path.join(workdir, f"repo-{size}-{run}")
+                generate_repo(repo_path, spec._replace(changed_files=size, seed=spec.seed + run))
+                error = None
+                timings = {}
+                output = io.StringIO()
+                try:
+                    # The pipeline prints per-file progress; keep the report readable.
+                    with contextlib.redirect_stdout(output):
+                        timings = run_integration(repo_path, TICKET, os.environ['GITHUB_TOKEN'], commit_mode)
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                finally:
+                    os.chdir(saved_cwd)
+                requests = {name: stub.stats['requests'] for name, stub in stubs.items()}
+                results.append(RunResult(size, run, timings, requests, error))
+                if error:
+                    print_error(f"{size} files, run {run + 1}: {error}")
+                else:
+                    print_info(f"{size} files, run {run + 1}: {timings['total']:.2f}s "
+                               f"({', '.join(f'{name} {count}' for name, count in requests.items())} requests)")
+                if not keep:
+                    shutil.rmtree(repo_path, ignore_errors=True)
+                    shutil.rmtree(f"{repo_path}-remote.git", ignore_errors=True)
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        for stub in stubs.values():
+            stub.stop()
+        if keep:
+            print_info(f"Repositories kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def summarize_results(results):
+    """Percentiles per size and phase: a list of dicts, one per (size, phase) with at least one sample."""
+    rows = []
+    for size in sorted({result.size for result in results}):
+        runs = [result for result in results if result.size == size]
+        for name in PHASES:
+            samples = [result.timings[name] for result in runs if name in result.timings]
+            if not samples:
+                continue
+            row = {"size": size, "phase": name, "runs": len(samples), "failed": sum(1 for result in runs if result.error)}
+            for pct in PERCENTILES:
+                row[f"p{pct}"] = percentile(samples, pct)
+            row["max"] = max(samples)
+            rows.append(row)
+    return rows
+
+def print_table(rows):
+    """Print the percentile table, in milliseconds."""
+    header = f"{'Files':>6}  {'Phase':<15}{'Runs':>5}" + ''.join(f"{f'p{pct}':>11}" for pct in PERCENTILES) + f"{'max':>11}"
+    print(f"\n{header}")
+    for row in rows:
+        line = f"{row['size']:>6}  {row['phase']:<15}{row['runs']:>5}"
+        line += ''.join(f"{row[f'p{pct}'] * 1000:>9.1f}ms" for pct in PERCENTILES)
+        line += f"{row['max'] * 1000:>9.1f}ms"
+        print(line if not row['failed'] else f"{line}  {YELLOW}({row['failed']} failed){RESET}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the integrator phases on synthetic repositories against local service stubs.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated changed-file counts (default: 10,100,1000,10000)")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help=f"Runs per size (default: {DEFAULT_REPEATS})")
+    parser.add_argument('--file-size', type=int, default=2048, help="Approximate bytes per file (default: 2048)")
+    parser.add_argument('--binary-ratio', type=float, default=0.05, help="Fraction of changes that are binary (default: 0.05)")
+    parser.add_argument('--rename-ratio', type=float, default=0.05, help="Fraction of changes that are renames (default: 0.05)")
+    parser.add_argument('--ignored-ratio', type=float, default=0.05, help="Ignored untracked files per change (default: 0.05)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every stub response (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds per response (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of stub responses that fail with 503 (default: 0)")
+    parser.add_argument('--commit-mode', choices=('checkout', 'plumbing'), default='checkout',
+                        help="How the ticket commit is built (default: checkout)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for repositories and stubs (default: 0)")
+    parser.add_argument('--json', dest='json_path', help="Also write the raw runs and the percentile table to this file")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated repositories")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    spec = RepoSpec(binary_ratio=args.binary_ratio, rename_ratio=args.rename_ratio,
+                    ignored_ratio=args.ignored_ratio, file_size=args.file_size, seed=args.seed)
+    behaviour = StubBehaviour(args.latency, args.jitter, args.error_rate, seed=args.seed)
+
+    results = run_benchmark(sizes, args.repeats, spec, behaviour, keep=args.keep, commit_mode=args.commit_mode)
+    rows = summarize_results(results)
+    print_table(rows)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump({"runs": [result._asdict() for result in results], "summary": rows}, file, indent=2)
+        print_success(f"Results written to {args.json_path}")
+    sys.exit(1 if any(result.error for result in results) else 0)
@@ -1,10 +1,17 @@
 import sys
-import subprocess
 import os
-import re
-import json
 import shutil
 
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.repo_context.main import RepoContext
+from automation.git_branch_processor.main import process_branch_changes
+from automation.branch_llm_handler.main import get_branch_commit_message
+from automation.auto_pr.main import create_auto_pr
+from automation.tracing.main import span, enable_from_env
+from automation.change_manifest.main import MANIFEST_FILENAME
+
 # ANSI color codes for colorful output
 GREEN = '\033[0;32m'
 YELLOW = '\033[0;33m'
@@ -32,100 +39,40 @@ def print_warning(message):
     """Print a warning message in yellow."""
     print(f"{YELLOW}{message}{RESET}")
 
-def run_command(command):
-    """Run a shell command and return its output."""
-    print_info(f"Executing command: {command}")
-    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-    print_info("Command output:")
-    print(result.stdout)
-    if result.stderr:
-        print_warning("Command stderr:")
-        print(result.stderr)
-    if result.returncode != 0:
-        print_error(f"Error executing command: {command}")
-        print_error(f"Error message: {result.stderr}")
-        return None
-    print_success(f"Command executed successfully")
-    return result.stdout.strip()
-
-def get_current_branch():
+def get_current_branch(repo_context):
     """Get the name of the current Git branch."""
-    return run_command("git rev-parse --abbrev-ref HEAD")
-
-def run_git_branch_processor():
-    """Run the git_branch_processor/main.py script and extract the merge base hash."""
-    print_step(1, "Running git_branch_processor/main.py")
-    output = run_command("python3 shared-scripts/automation/git_branch_processor/main.py")
-    if output is None:
-        raise Exception("Failed to run git_branch_processor/main.py")
-    
-    print_info("Extracting merge base hash from output")
-    match = re.search(r"Merge base found: ([a-f0-9]+)", output)
-    if match:
-        merge_base = match.group(1)
-        print_success(f"Merge base hash found: {merge_base}")
-        return merge_base
-    else:
-        print_error("Failed to extract merge base hash from output")
-        raise Exception("Merge base hash not found in output")
-
-def run_branch_llm_handler(merge_base):
-    """Run the branch_llm_handler/main.py script with the given merge base hash."""
-    print_step(2, f"Running branch_llm_handler/main.py with merge base: {merge_base}")
-    output = run_command(f"python shared-scripts/automation/branch_llm_handler/main.py {merge_base}")
-    if output is None:
-        raise Exception("Failed to run branch_llm_handler/main.py")
-    
-    print_info("Reading commit message from TEMP/final_commit_message.txt")
-    try:
-        with open('TEMP/final_commit_message.txt', 'r') as file:
-            content = file.read().strip()
-        
-        # Parse the JSON content
-        message_obj = json.loads(content)
-        commit_message = message_obj.get("response", "").strip()
-        
-        if commit_message:
-            print_success(f"Commit message extracted successfully")
-            return commit_message
-        else:
-            print_error("Failed to extract commit message from the file")
-            raise Exception("Commit message not found in the file")
-    except FileNotFoundError:
-        print_error("Failed to find TEMP/final_commit_message.txt")
-        raise Exception("Commit message file not found")
-    except json.JSONDecodeError:
-        print_error("Failed to parse JSON content in TEMP/final_commit_message.txt")
-        raise Exception("Invalid JSON format in commit message file")
-    except IOError:
-        print_error("Failed to read TEMP/final_commit_message.txt")
-        raise Exception("Error reading commit message file")
-
-def run_auto_pr(ticket_number, base_branch, commit_message):
-    """Run the auto_pr/main.py script with the given parameters."""
-    print_step(3, f"Running auto_pr/main.py")
-    escaped_commit_message = json.dumps(commit_message)  # This escapes special characters
-    command = f"python shared-scripts/automation/auto_pr/main.py {ticket_number} {base_branch} {escaped_commit_message}"
-    output = run_command(command)
-    if output is None:
-        raise Exception("Failed to run auto_pr/main.py")
-    
-    print_info("Extracting pull request URL from output")
-    match = re.search(r"Pull request created: (https://.*)", output)
-    if match:
-        pr_url = match.group(1)
-        print_success(f"Pull request created: {pr_url}")
-        return pr_url
-    else:
-        print_error("Failed to extract pull request URL from output")
-        raise Exception("Pull request URL not found in output")
-
-def cleanup_artifacts():
+    return repo_context.current_branch
+
+def run_git_branch_processor(repo_context):
+    """Write the change manifest (autoCommitManifest.jsonl) of the branch and return the merge base hash."""
+    print_step(1, "Collecting branch changes")
+    with span('changes'):
+        changes = process_branch_changes(repo_context)
+    print_success(f"Merge base hash found: {changes.merge_base}")
+    return changes.merge_base
+
+def run_branch_llm_handler(merge_base, repo_context):
+    """Generate the commit message for the changes since the merge base."""
+    print_step(2, f"Generating commit message for changes since merge base: {merge_base}")
+    with span('commit_message'):
+        result = get_branch_commit_message(merge_base, repo_context=repo_context)
+    print_success("Commit message generated successfully")
+    return result.message
+
+def run_auto_pr(ticket_number, base_branch, commit_message, repo_context):
+    """Create the pull request and return its URL."""
+    print_step(3, "Creating pull request")
+    with span('auto_pr'):
+        result = create_auto_pr(ticket_number, base_branch, commit_message, repo_context=repo_context)
+    print_success(f"Pull request created: {result.url}")
+    return result.url
+
+def cleanup_artifacts(repo_root):
     """Delete temporary artifacts generated during the integration process."""
     print_step(4, "Cleaning up artifacts")
 
     # Delete TEMP folder
-    temp_folder = os.path.join(os.getcwd(), "TEMP")
+    temp_folder = os.path.join(repo_root, "TEMP")
     if os.path.exists(temp_folder):
         try:
             print_info(f"Attempting to delete TEMP folder: {temp_folder}")
@@ -136,17 +83,17 @@ def cleanup_artifacts():
     else:
         print_info(f"TEMP folder not found: {temp_folder}")
 
-    # Delete autoCommitArtifact.csv
-    csv_file = os.path.join(os.getcwd(), "autoCommitArtifact.csv")
-    if os.path.exists(csv_file):
+    # Delete autoCommitManifest.jsonl
+    manifest_file = os.path.join(repo_root, MANIFEST_FILENAME)
+    if os.path.exists(manifest_file):
         try:
-            print_info(f"Attempting to delete file: {csv_file}")
-            os.remove(csv_file)
-            print_success(f"Successfully deleted file: {csv_file}")
+            print_info(f"Attempting to delete file: {manifest_file}")
+            os.remove(manifest_file)
+            print_success(f"Successfully deleted file: {manifest_file}")
         except Exception as e:
-            print_error(f"Failed to delete file {csv_file}: {str(e)}")
+            print_error(f"Failed to delete file {manifest_file}: {str(e)}")
     else:
-        print_info(f"CSV file not found: {csv_file}")
+        print_info(f"Change manifest not found: {manifest_file}")
 
     print_success("Cleanup process completed.")
 
@@ -156,15 +103,20 @@ def main():
         sys.exit(1)
 
     pr_into = sys.argv[1]
+    enable_from_env()
     print_info(f"Branch to open PR into: {pr_into}")
 
+    # Every step runs in this process and shares one set of git metadata
+    repo_context = RepoContext()
+    repo_root = os.getcwd()
     try:
-        current_branch = get_current_branch()
+        repo_root = repo_context.root
+        current_branch = get_current_branch(repo_context)
         print_info(f"Current branch: {current_branch}")
 
-        merge_base = run_git_branch_processor()
-        commit_message = run_branch_llm_handler(merge_base)
-        pr_url = run_auto_pr(current_branch, pr_into, commit_message)
+        merge_base = run_git_branch_processor(repo_context)
+        commit_message = run_branch_llm_handler(merge_base, repo_context)
+        pr_url = run_auto_pr(current_branch, pr_into, commit_message, repo_context)
 
         print_success(f"Branch integration process completed successfully.")
         print_info(f"Pull request URL: {pr_url}")
@@ -172,8 +124,10 @@ def main():
         print_error(f"An error occurred during the branch integration process: {str(e)}")
         sys.exit(1)
     finally:
+        repo_context.close()
         # Perform cleanup
-        cleanup_artifacts()
+        with span('cleanup_artifacts'):
+            cleanup_artifacts(repo_root)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
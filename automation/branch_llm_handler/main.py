@@ -1,10 +1,28 @@
 # branch_llm_handler/main.py
 import sys
-import subprocess
 import os
-import csv
 import requests
 import json
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.http_client.main import http_post, describe_error
+from automation.tracing.main import enable_from_env
+from automation.summary_pipeline.main import summarize_manifest
+
+# Part of every summary cache key. Bump it whenever a system prompt changes so
+# responses produced with the old prompt are no longer reused.
+PROMPT_VERSION = 'branch_llm_handler-v1'
+
+# Chat endpoint for every summary request. Set LLM_CHAT_URL to use another
+# deployment, e.g. the local stub in automation/benchmarks.
+DEFAULT_CHAT_URL = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+
+# Result of get_branch_commit_message: the commit message text and the raw
+# JSON response it was taken from.
+BranchCommitMessage = namedtuple('BranchCommitMessage', ['message', 'raw'])
 
 # ANSI color codes for colorful output
 GREEN = '\033[0;32m'
@@ -29,59 +47,15 @@ def print_info(message):
     """Print an info message in blue."""
     print(f"{BLUE}{message}{RESET}")
 
-def print_warning(message):
-    """Print a warning message in yellow."""
-    print(f"{YELLOW}{message}{RESET}")
-
-def run_command(command):
-    """Run a shell command and return its output."""
-    print_info(f"Executing command: {command}")
-    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-    if result.returncode != 0:
-        print_error(f"Error executing command: {command}")
-        print_error(f"Error message: {result.stderr}")
-    else:
-        print_success(f"Command executed successfully")
-    return result
-
-def get_file_content(file_path, ref):
-    """Get the content of a file from a specific ref (branch or commit)."""
-    print_info(f"Attempting to retrieve content of file '{file_path}' from ref '{ref}'")
-    try:
-        git_path = file_path[len('shared-scripts/'):] if file_path.startswith('shared-scripts/') else file_path
-        content = subprocess.check_output(['git', 'show', f'{ref}:{git_path}'], stderr=subprocess.PIPE)
-        print_success(f"Successfully retrieved content from '{ref}'")
-        return content
-    except subprocess.CalledProcessError as e:
-        print_error(f"File '{file_path}' does not exist in ref '{ref}' or error occurred: {e}")
-        return None
-
-def create_merged_file(original_content, new_content, output_file):
-    """Create a merged file with original and new content."""
-    print_info(f"Creating merged file: {output_file}")
-    try:
-        with open(output_file, 'wb') as f:
-            if original_content is not None:
-                f.write(b"===== ORIGINAL CONTENT =====\n\n")
-                f.write(original_content)
-                f.write(b"\n\n===== NEW CONTENT =====\n\n")
-            if new_content is not None:
-                f.write(new_content)
-            else:
-                f.write(b"File does not exist in the current branch.")
-        print_success(f"Successfully created merged file: {output_file}")
-        return output_file
-    except IOError as e:
-        print_error(f"Error creating merged file: {e}")
-        return None
-
-def get_commit_message(file_content, is_new_file, file_name):
-    url = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+def get_commit_message(file_content, is_new_file, file_name, is_diff=False, is_deleted=False):
+    url = os.getenv('LLM_CHAT_URL', DEFAULT_CHAT_URL)
     
     if is_new_file:
         system_prompt = f"You must generate a succinct commit message from the text you are provided. The commit message should include the file name '{file_name}' and describe what this new file does."
-    elif "===== ORIGINAL CONTENT =====" not in file_content:
+    elif is_deleted:
         system_prompt = f"You must generate a succinct commit message for the deleted file '{file_name}'. The commit message should mention that the file has been deleted and briefly describe its purpose if possible."
+    elif is_diff:
+        system_prompt = f"You will be provided with a unified diff of the file '{file_name}'. Lines starting with '-' were removed and lines starting with '+' were added. Based on this, you must create a commit message. The commit message should include the file name '{file_name}' and describe the changes made to this file."
     else:
         system_prompt = f"You will be provided with text that contains the original and modified content of a file. Based on this, you must create a commit message. The commit message should include the file name '{file_name}' and describe the changes made to this file."
 
@@ -93,26 +67,19 @@ def get_commit_message(file_content, is_new_file, file_name):
 
     print_info(f"Sending request to AI service for commit message generation")
     try:
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
+        # Summary requests are safe to repeat, so 5xx responses and read
+        # timeouts are retried too.
+        response = http_post(url, data=json.dumps(payload), headers=headers, idempotent=True,
+                             compress=bool(os.getenv('LLM_GZIP_REQUESTS')))
         response.raise_for_status()
         print_success("Successfully received commit message from AI service")
         return response.text
     except requests.RequestException as e:
-        print_error(f"Error making POST request: {e}")
+        print_error(f"Error making POST request: {describe_error(e)}")
         return None
 
-def combine_commit_messages(temp_folder):
-    print_step(4, "Combining individual commit messages")
-    combined_content = ""
-    for filename in os.listdir(temp_folder):
-        if filename.endswith("_llm.txt"):
-            with open(os.path.join(temp_folder, filename), 'r') as f:
-                combined_content += f.read() + "\n-------------\n"
-    print_success("Successfully combined all commit messages")
-    return combined_content.strip()
-
 def get_final_commit_message(combined_content):
-    url = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+    url = os.getenv('LLM_CHAT_URL', DEFAULT_CHAT_URL)
     
     system_prompt = "You will be given a list of commit messages. Your job is to combine them into a cohesive and easy to understand commit message and just return the commit message without any preamble or other text."
 
@@ -124,120 +91,110 @@ def get_final_commit_message(combined_content):
 
     print_info("Sending request to AI service for final commit message generation")
     try:
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
+        # Summary requests are safe to repeat, so 5xx responses and read
+        # timeouts are retried too.
+        response = http_post(url, data=json.dumps(payload), headers=headers, idempotent=True,
+                             compress=bool(os.getenv('LLM_GZIP_REQUESTS')))
         response.raise_for_status()
         print_success("Successfully received final commit message from AI service")
         return response.text
     except requests.RequestException as e:
-        print_error(f"Error making POST request: {e}")
+        print_error(f"Error making POST request: {describe_error(e)}")
         return None
 
-def process_file(file_path, commit_hash, temp_folder, index):
-    print_step(3, f"Processing file {index}: {file_path}")
-    try:
-        # Convert to relative path if it's an absolute path
-        repo_root = run_command("git rev-parse --show-toplevel").stdout.strip()
-        relative_path = os.path.relpath(file_path, repo_root)
-        
-        original_content = get_file_content(relative_path, commit_hash)
-        new_content = get_file_content(relative_path, 'HEAD')
-        
-        if original_content is not None or new_content is not None:
-            if original_content is None:
-                file_prefix = 'new'
-                print_info(f"File '{relative_path}' is new")
-            elif new_content is None:
-                file_prefix = 'deleted'
-                print_info(f"File '{relative_path}' has been deleted")
-            else:
-                file_prefix = 'modified'
-                print_info(f"File '{relative_path}' has been modified")
-            
-            output_file = os.path.join(temp_folder, f'{file_prefix}_{index}.txt')
-            merged_file = create_merged_file(original_content, new_content, output_file)
-            
-            if merged_file:
-                with open(merged_file, 'r', encoding='utf-8') as f:
-                    merged_content = f.read()
-                
-                commit_message = get_commit_message(merged_content, file_prefix == 'new', relative_path)
-                if commit_message:
-                    commit_file = os.path.join(temp_folder, f'{file_prefix}_{index}_llm.txt')
-                    with open(commit_file, 'w') as f:
-                        f.write(commit_message)
-                    print_success(f"Created commit message file: {commit_file}")
-        else:
-            print_warning(f"Skipping file '{file_path}' as it doesn't exist in either the commit or the current branch.")
-    
-    except Exception as e:
-        print_error(f"Error processing file {file_path}: {str(e)}")
-        print_warning("Skipping this file and continuing with the next one.")
+def request_file_summary(payload):
+    """Ask the chat endpoint for the commit message of one file payload."""
+    print_step(2, f"Summarizing file {payload.index}: {payload.path}")
+    print_info(f"File '{payload.path}' is {payload.kind}")
+    return get_commit_message(payload.text, payload.kind == 'new', payload.path,
+                              is_diff=payload.payload_kind != 'full', is_deleted=payload.kind == 'deleted')
 
-def generate_commit_message(commit_hash, csv_file_path=None):
+def generate_commit_message(commit_hash, manifest_path=None, max_workers=None, use_cache=None, payload_mode=None, diff_context=None, repo_context=None, debug_artifacts=None, token_budget=None, fan_out=None, chunk_size=None, max_file_bytes=None, trivial_rules=None):
     """
     Generate a commit message based on the changes between the current branch and a specific commit.
+
+    Files stream through an in-memory pipeline: manifest records -> blob fetch ->
+    payload build -> summarize -> combine. Nothing is written to disk unless debug
+    artifacts are enabled. Trivial changes (binaries, vendored files, lockfiles,
+    version bumps, whitespace-only edits) are summarized locally, without a request.
     
     Args:
-    commit_hash (str): The commit hash to compare against.
-    csv_file_path (str, optional): Path to the CSV file containing file paths. If not provided,
-                                   it will look for 'autoCommitArtifact.csv' in the repo root.
+    commit_hash (str): The commit hash to compare against. The manifest must list the changes
+                       since this commit, as git_branch_processor writes it.
+    manifest_path (str, optional): Path to the change manifest written by the processor. If not
+                                   provided, it will look for 'autoCommitManifest.jsonl' in the
+                                   repo root.
+    max_workers (int, optional): Number of files summarized in parallel. Defaults to the
+                                 LLM_MAX_WORKERS environment variable, or DEFAULT_MAX_WORKERS.
+    use_cache (bool, optional): Reuse LLM responses from the on-disk summary cache. Defaults to
+                                True unless the LLM_CACHE_DISABLE environment variable is set.
+    payload_mode (str, optional): 'diff' to send unified hunks, 'full' to send whole files.
+                                  Defaults to LLM_PAYLOAD_MODE, or DEFAULT_PAYLOAD_MODE.
+    diff_context (int, optional): Context lines around each hunk. Defaults to LLM_DIFF_CONTEXT,
+                                  or DEFAULT_DIFF_CONTEXT.
+    repo_context (RepoContext, optional): Shared git metadata for this run. A private one is
+                                          created (and closed) when not provided.
+    debug_artifacts (bool, optional): Write payloads and responses to TEMP for debugging.
+                                      Defaults to the LLM_DEBUG_ARTIFACTS environment variable.
+    token_budget (int, optional): Estimated tokens per combine request. Defaults to
+                                  LLM_REDUCE_TOKEN_BUDGET, or DEFAULT_REDUCE_TOKEN_BUDGET.
+    fan_out (int, optional): Summaries per combine request. Defaults to LLM_REDUCE_FAN_OUT,
+                             or DEFAULT_REDUCE_FAN_OUT.
+    chunk_size (int, optional): Payloads longer than this many characters are summarized in
+                                chunks. Defaults to LLM_CHUNK_SIZE, or DEFAULT_CHUNK_SIZE.
+    max_file_bytes (int, optional): Blobs larger than this are not read and get a metadata-only
+                                    summary. Defaults to LLM_MAX_FILE_BYTES, or DEFAULT_MAX_FILE_BYTES.
+    trivial_rules (TrivialRules, optional): Rules for changes summarized locally. Defaults to the
+                                            rules of the repo's .autocommit-rules.json, or none
+                                            when the LLM_TRIVIAL_DISABLE environment variable is set.
     
     Returns:
     str: The generated commit message.
     """
     print_step(1, f"Starting commit message generation comparing current branch with commit: {commit_hash}")
-    
-    repo_root = run_command("git rev-parse --show-toplevel").stdout.strip()
-    print_info(f"Git repository root: {repo_root}")
-    
-    if csv_file_path is None:
-        csv_file_path = os.path.join(repo_root, 'autoCommitArtifact.csv')
-    
-    file_paths = []
-    print_step(2, f"Reading CSV file: {csv_file_path}")
-    try:
-        with open(csv_file_path, 'r') as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-            for row in csv_reader:
-                file_paths.append(row['File Path'])
-        print_success(f"Successfully read {len(file_paths)} file path(s) from the CSV.")
-    except FileNotFoundError:
-        print_error(f"Error: CSV file '{csv_file_path}' not found.")
-        return None
-    except csv.Error as e:
-        print_error(f"Error reading CSV file: {e}")
-        return None
-    
-    temp_folder = os.path.join(repo_root, 'TEMP')
-    os.makedirs(temp_folder, exist_ok=True)
-    print_info(f"Created TEMP folder at: {temp_folder}")
-    
-    for index, file_path in enumerate(file_paths, start=1):
-        process_file(file_path, commit_hash, temp_folder, index)
-    
-    combined_content = combine_commit_messages(temp_folder)
-    
-    print_step(5, "Generating final commit message")
-    final_commit_message = get_final_commit_message(combined_content)
+    final_commit_message = summarize_manifest(
+        request_file_summary, get_final_commit_message, PROMPT_VERSION, manifest_path, repo_context,
+        diff_base=commit_hash, include_deleted=True, missing_side_message="File does not exist in the current branch.",
+        max_workers=max_workers, use_cache=use_cache, payload_mode=payload_mode, diff_context=diff_context,
+        debug_artifacts=debug_artifacts, token_budget=token_budget, fan_out=fan_out, chunk_size=chunk_size,
+        max_file_bytes=max_file_bytes, trivial_rules=trivial_rules,
+    )
     if final_commit_message:
-        final_commit_file = os.path.join(temp_folder, 'final_commit_message.txt')
-        with open(final_commit_file, 'w') as f:
-            f.write(final_commit_message)
-        print_success(f"Created final commit message file: {final_commit_file}")
-    
-    print_success("Commit message generation completed.")
+        print_success("Commit message generation completed.")
     return final_commit_message
 
-# Example usage:
+def parse_commit_message(raw_message):
+    """Return the 'response' field of the chat endpoint's JSON reply, or None."""
+    try:
+        return json.loads(raw_message).get("response", "").strip() or None
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+def get_branch_commit_message(commit_hash, **options):
+    """
+    Generate the commit message for the changes since `commit_hash` and return a
+    BranchCommitMessage. Accepts the keyword options of generate_commit_message.
+    Raises ValueError when no message could be generated or parsed.
+    """
+    raw_message = generate_commit_message(commit_hash, **options)
+    if not raw_message:
+        raise ValueError("Failed to generate commit message")
+    message = parse_commit_message(raw_message)
+    if not message:
+        raise ValueError("Failed to parse the generated commit message")
+    return BranchCommitMessage(message, raw_message)
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print_error("Usage: python script_name.py <commit_hash>")
         sys.exit(1)
     
     commit_hash = sys.argv[1]
-    commit_message = generate_commit_message(commit_hash)
-    if commit_message:
-        print_success("Generated commit message:")
-        print_info(commit_message)
-    else:
-        print_error("Failed to generate commit message.")
\ No newline at end of file
+    enable_from_env()
+    try:
+        result = get_branch_commit_message(commit_hash)
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    print_success("Generated commit message:")
+    print_info(result.message)
\ No newline at end of file
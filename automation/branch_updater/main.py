@@ -0,0 +1,187 @@
+# branch_updater/main.py
+import sys
+import os
+import re
+import subprocess
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.repo_context.main import RepoContext
+from automation.tracing.main import enable_from_env
+
+# One local branch as reported by for-each-ref. `remote_ref` is the configured
+# upstream on whichever remote it lives (None when there is none); `remote_oid`,
+# `ahead` and `behind` are None when the upstream ref doesn't exist.
+LocalBranch = namedtuple('LocalBranch', ['name', 'oid', 'remote_ref', 'remote_oid', 'ahead', 'behind', 'is_current', 'worktree'])
+
+# Outcome of one run: branches fast-forwarded, branches that diverged from
+# their remote, branches that could not be updated and branches skipped for
+# lack of an upstream (the last two with the reason).
+BranchUpdateReport = namedtuple('BranchUpdateReport', ['updated', 'diverged', 'failed', 'skipped'])
+
+FIELD_SEPARATOR = '%00'
+BRANCH_FORMAT = FIELD_SEPARATOR.join([
+    '%(refname)', '%(objectname)', '%(upstream)', '%(upstream:track)', '%(HEAD)', '%(worktreepath)',
+])
+
+# ANSI color codes for colorful output
+GREEN = '\033[0;32m'
+YELLOW = '\033[0;33m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_error(message):
+    """Print an error message in red."""
+    print(f"{RED}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def print_warning(message):
+    """Print a warning message in yellow."""
+    print(f"{YELLOW}{message}{RESET}")
+
+def run_git(repo_root, args, input_text=None):
+    """Run git in the repository; returns the CompletedProcess."""
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    return subprocess.run(['git', *args], capture_output=True, text=True, cwd=repo_root, input=input_text, env=env)
+
+def parse_track(track):
+    """Parse %(upstream:track) such as '[ahead 1, behind 2]' into (ahead, behind); '[gone]' gives None."""
+    if track == '[gone]':
+        return None
+    ahead = re.search(r'ahead (\d+)', track)
+    behind = re.search(r'behind (\d+)', track)
+    return (int(ahead.group(1)) if ahead else 0, int(behind.group(1)) if behind else 0)
+
+def list_local_branches(repo_root):
+    """
+    Read every local branch, its upstream and how far apart they are from a
+    single for-each-ref over refs/heads and refs/remotes. The upstream is
+    whatever %(upstream) names, on any remote (or a local branch).
+    """
+    result = run_git(repo_root, ['for-each-ref', f"--format={BRANCH_FORMAT}", 'refs/heads', 'refs/remotes'])
+    if result.returncode != 0:
+        raise RuntimeError(f"git for-each-ref failed: {result.stderr.strip()}")
+
+    rows = [line.split('\0') for line in result.stdout.splitlines() if line]
+    oids = {refname: oid for refname, oid, *_ in rows}
+
+    branches = []
+    for refname, oid, upstream, track, head, worktree in rows:
+        if not refname.startswith('refs/heads/'):
+            continue
+        name = refname[len('refs/heads/'):]
+        remote_oid = oids.get(upstream) if upstream else None
+        counts = parse_track(track) if remote_oid is not None else None
+        ahead, behind = counts if counts is not None else (None, None)
+        branches.append(LocalBranch(name, oid, upstream or None, remote_oid, ahead, behind, head == '*', worktree))
+    return branches
+
+def short_ref(refname):
+    """origin/main for refs/remotes/origin/main, main for refs/heads/main."""
+    for prefix in ('refs/remotes/', 'refs/heads/'):
+        if refname.startswith(prefix):
+            return refname[len(prefix):]
+    return refname
+
+def fast_forward_refs(repo_root, branches):
+    """
+    Move every branch to its remote commit in one `git update-ref --stdin`
+    transaction. Each update names the old commit, so a branch that moved in
+    the meantime makes the whole batch fail instead of losing commits.
+    """
+    commands = ''.join(f"update refs/heads/{branch.name} {branch.remote_oid} {branch.oid}\n" for branch in branches)
+    result = run_git(repo_root, ['update-ref', '-m', 'branch_updater: fast-forward', '--stdin'], input_text=commands)
+    if result.returncode != 0:
+        raise RuntimeError(f"git update-ref failed: {result.stderr.strip()}")
+
+def update_local_branches(repo_context=None, fetch=True):
+    """
+    Fetch once, then fast-forward every local branch that is only behind its
+    remote. Branches are moved by ref updates without touching the working
+    tree; only the checked-out branch is updated with `git merge --ff-only`.
+    Returns a BranchUpdateReport.
+    """
+    repo_context = repo_context or RepoContext()
+    repo_root = repo_context.root
+
+    if fetch:
+        print_info("Fetching all remotes...")
+        result = run_git(repo_root, ['fetch', '--all', '--prune', '--quiet'])
+        if result.returncode != 0:
+            raise RuntimeError(f"git fetch failed: {result.stderr.strip()}")
+
+    updated, diverged, failed, skipped = [], [], [], []
+    to_move = []
+    current = None
+    for branch in list_local_branches(repo_root):
+        if branch.remote_ref is None:
+            skipped.append((branch, "no upstream configured"))
+            continue
+        if branch.remote_oid is None:
+            skipped.append((branch, f"upstream {short_ref(branch.remote_ref)} is gone"))
+            continue
+        if branch.behind in (None, 0):
+            continue
+        if branch.ahead:
+            diverged.append(branch)
+        elif branch.is_current:
+            current = branch
+        elif branch.worktree:
+            # Moving a branch checked out elsewhere would leave that worktree
+            # out of sync with its HEAD.
+            failed.append((branch, f"checked out in {branch.worktree}"))
+        else:
+            to_move.append(branch)
+
+    if to_move:
+        try:
+            fast_forward_refs(repo_root, to_move)
+            updated.extend(to_move)
+        except RuntimeError as e:
+            failed.extend((branch, str(e)) for branch in to_move)
+
+    if current is not None:
+        result = run_git(repo_root, ['merge', '--ff-only', '--quiet', current.remote_oid])
+        if result.returncode == 0:
+            updated.append(current)
+        else:
+            failed.append((current, result.stderr.strip().splitlines()[0] if result.stderr.strip() else "git merge --ff-only failed"))
+
+    return BranchUpdateReport(updated, diverged, failed, skipped)
+
+def print_report(report):
+    """Print the fast-forwarded count, then only the branches that need attention."""
+    print_success(f"Fast-forwarded {len(report.updated)} branch(es).")
+    for branch in report.updated:
+        print(f"  {branch.name}: {branch.oid[:10]} -> {branch.remote_oid[:10]} ({branch.behind} commit(s))")
+    if report.diverged:
+        print_warning(f"{len(report.diverged)} branch(es) have diverged from their remote and were left alone:")
+        for branch in report.diverged:
+            print_warning(f"  {branch.name}: ahead {branch.ahead}, behind {branch.behind} {short_ref(branch.remote_ref)}")
+    if report.skipped:
+        print_info(f"Skipped {len(report.skipped)} branch(es) without an upstream to follow:")
+        for branch, reason in report.skipped:
+            print(f"  {branch.name}: {reason}")
+    for branch, reason in report.failed:
+        print_error(f"  {branch.name}: not updated ({reason})")
+
+if __name__ == "__main__":
+    fetch = '--no-fetch' not in sys.argv[1:]
+    enable_from_env()
+    try:
+        report = update_local_branches(fetch=fetch)
+    except (RuntimeError, ValueError) as e:
+        print_error(str(e))
+        sys.exit(1)
+    print_report(report)
+    sys.exit(1 if report.failed else 0)
@@ -0,0 +1,158 @@
+# change_manifest/main.py
+import sys
+import os
+import json
+import subprocess
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# The manifest the processors write and the LLM handlers read, in the
+# repository root. Bump MANIFEST_VERSION whenever a record field changes
+# meaning; readers refuse versions they don't know.
+MANIFEST_FILENAME = "autoCommitManifest.jsonl"
+MANIFEST_VERSION = 1
+
+# One changed file. Paths are relative to the repository root, with '/'
+# separators. `status` is added, modified, deleted, renamed or copied, and
+# `source` is the path a renamed or copied file came from. The old_* fields
+# describe the file at the original ref (at `source` for renames and copies)
+# and the new_* fields at the new ref; they are None where the file doesn't
+# exist. `binary` is git's own verdict, .gitattributes included.
+ManifestEntry = namedtuple('ManifestEntry', [
+    'path', 'status', 'source', 'old_oid', 'new_oid', 'old_size', 'new_size', 'old_mode', 'new_mode', 'binary',
+])
+
+# First line of the manifest: the format version and the two refs the records
+# were taken from.
+ManifestHeader = namedtuple('ManifestHeader', ['version', 'original_ref', 'new_ref', 'files'])
+
+STATUS_NAMES = {'A': 'added', 'M': 'modified', 'D': 'deleted', 'R': 'renamed', 'C': 'copied', 'T': 'modified'}
+
+# Gitlinks point at commits in another repository, so they have no blob here.
+GITLINK_MODE = '160000'
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def _object_id(oid):
+    return None if not oid.strip('0') else oid
+
+def _mode(mode):
+    return None if mode == '000000' else mode
+
+def parse_diff_tree(output):
+    """
+    Parse `git diff-tree -r -z --raw --numstat` output into a list of
+    ManifestEntry without sizes. The raw records come first and the numstat
+    records follow in the same order; numstat only contributes the binary
+    flag ('-' instead of line counts).
+    """
+    fields = iter(output.split('\0'))
+    entries = []
+    binary = []
+    for field in fields:
+        if not field:
+            continue
+        if field.startswith(':'):
+            old_mode, new_mode, old_oid, new_oid, status = field[1:].split(' ')
+            source = next(fields) if status[0] in 'RC' else None
+            path = next(fields)
+            entries.append(ManifestEntry(path, STATUS_NAMES.get(status[0], 'unknown'), source,
+                                         _object_id(old_oid), _object_id(new_oid), None, None,
+                                         _mode(old_mode), _mode(new_mode), False))
+        else:
+            added, _deleted, path = field.split('\t', 2)
+            if not path:
+                # Renames and copies: the source and destination follow.
+                next(fields)
+                next(fields)
+            binary.append(added == '-')
+    flags = iter(binary)
+    return [entry._replace(binary=next(flags, False)) for entry in entries]
+
+def diff_manifest_entries(original_ref, new_ref, blob_reader, diff_options=(), repo_root=None):
+    """
+    Every file that differs between two commits or trees, as a list of
+    ManifestEntry: one `git diff-tree` for paths, modes, OIDs, renames and the
+    binary flag, and one `git cat-file --batch-check` round for the sizes.
+    `diff_options` adds options such as rename detection (-M, -C).
+    Raises subprocess.CalledProcessError when git fails.
+    """
+    command = ['git', 'diff-tree', '-r', '-z', '--raw', '--numstat', *diff_options, original_ref, new_ref]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=repo_root)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+    entries = parse_diff_tree(result.stdout)
+
+    oids = sorted({oid for entry in entries
+                   for oid, mode in ((entry.old_oid, entry.old_mode), (entry.new_oid, entry.new_mode))
+                   if oid and mode != GITLINK_MODE})
+    sizes = {info.oid: info.size for info in blob_reader.check_many(oids) if not info.missing}
+    return [entry._replace(old_size=sizes.get(entry.old_oid), new_size=sizes.get(entry.new_oid)) for entry in entries]
+
+def write_manifest(manifest_path, entries, original_ref, new_ref):
+    """Write the header and one JSON record per entry; returns the number of records."""
+    with span(f"write {os.path.basename(manifest_path)}", 'file') as current:
+        with open(manifest_path, 'w', encoding='utf-8') as manifest:
+            header = ManifestHeader(MANIFEST_VERSION, original_ref, new_ref, len(entries))
+            manifest.write(json.dumps(header._asdict()) + '\n')
+            for entry in entries:
+                manifest.write(json.dumps(entry._asdict()) + '\n')
+        current.bytes_out = os.path.getsize(manifest_path)
+    return len(entries)
+
+def _read_header(line, manifest_path):
+    try:
+        header = json.loads(line)
+    except json.JSONDecodeError:
+        header = None
+    if not isinstance(header, dict) or header.get('version') != MANIFEST_VERSION:
+        version = header.get('version') if isinstance(header, dict) else None
+        raise ValueError(f"{manifest_path} is not a version {MANIFEST_VERSION} change manifest (found version {version})")
+    return ManifestHeader(*(header.get(field) for field in ManifestHeader._fields))
+
+def read_manifest_header(manifest_path):
+    """The ManifestHeader of a manifest. Raises ValueError for an unknown version."""
+    with open(manifest_path, 'r', encoding='utf-8') as manifest:
+        return _read_header(manifest.readline(), manifest_path)
+
+def iter_manifest(manifest_path):
+    """
+    Stream the records of a manifest as ManifestEntry, one line at a time.
+    Raises ValueError for an unknown version or a malformed record.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as manifest:
+        _read_header(manifest.readline(), manifest_path)
+        for number, line in enumerate(manifest, start=2):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield ManifestEntry(**{field: record.get(field) for field in ManifestEntry._fields})
+            except (json.JSONDecodeError, AttributeError) as e:
+                raise ValueError(f"{manifest_path}:{number}: malformed record ({e})")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python change_manifest/main.py <autoCommitManifest.jsonl>")
+        sys.exit(1)
+
+    try:
+        header = read_manifest_header(sys.argv[1])
+        print_success(f"Version {header.version}: {header.files} file(s), {header.original_ref} -> {header.new_ref}")
+        for entry in iter_manifest(sys.argv[1]):
+            sizes = ' -> '.join(str(size) for size in (entry.old_size, entry.new_size) if size is not None)
+            source = f"{entry.source} -> " if entry.source else ''
+            print(f"{entry.status:<9} {source}{entry.path} ({sizes} bytes{', binary' if entry.binary else ''})")
+    except (OSError, ValueError) as e:
+        print(str(e))
+        sys.exit(1)
@@ -0,0 +1,131 @@
+# git_blob_reader/main.py
+import sys
+import os
+import subprocess
+import threading
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# Result of resolving one `<ref>:<path>` spec. `missing` is True when git could
+# not resolve the spec (unknown ref, path absent at that ref, ambiguous name);
+# oid, type, size and content are None in that case. content is also None for
+# size-only lookups made with `check_many`.
+BlobInfo = namedtuple('BlobInfo', ['spec', 'oid', 'type', 'size', 'content', 'missing'])
+
+class GitBlobReader:
+    """
+    Read many objects through a single long-lived `git cat-file --batch` process.
+
+    The process is started lazily on first use and shared by every caller; a lock
+    serializes access to the pipe so the reader can be used from worker threads.
+    Size lookups go through a second `git cat-file --batch-check` process, so
+    callers can decide what to load before any content is read.
+    """
+
+    def __init__(self, repo_root=None):
+        self.repo_root = repo_root
+        self._process = None
+        self._check_process = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self, process, mode):
+        if process is None or process.poll() is not None:
+            process = subprocess.Popen(
+                ['git', 'cat-file', mode],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.repo_root,
+            )
+        return process
+
+    def _request(self, spec, with_content=True):
+        # cat-file reads one spec per line, so a path with a newline in it can
+        # never be resolved; report it the same way git reports a bad name.
+        if '\n' in spec:
+            return BlobInfo(spec, None, None, None, None, True)
+
+        if with_content:
+            process = self._process = self._start(self._process, '--batch')
+        else:
+            process = self._check_process = self._start(self._check_process, '--batch-check')
+        process.stdin.write(spec.encode('utf-8') + b'\n')
+        process.stdin.flush()
+
+        header = process.stdout.readline()
+        if not header:
+            if with_content:
+                self._process = None
+            else:
+                self._check_process = None
+            raise RuntimeError(f"git cat-file exited while reading '{spec}'")
+
+        header = header.rstrip(b'\n')
+        if header.endswith(b' missing') or header.endswith(b' ambiguous'):
+            return BlobInfo(spec, None, None, None, None, True)
+
+        oid, object_type, size = header.split(b' ')
+        size = int(size)
+        content = None
+        if with_content:
+            content = process.stdout.read(size)
+            process.stdout.read(1)  # trailing LF after the object body
+        return BlobInfo(spec, oid.decode('ascii'), object_type.decode('ascii'), size, content, False)
+
+    def _request_batch(self, specs, with_content):
+        name = 'git cat-file --batch' if with_content else 'git cat-file --batch-check'
+        with self._lock, span(name, 'subprocess', objects=len(specs)) as current:
+            results = [self._request(spec, with_content) for spec in specs]
+            current.bytes_out = sum(len(spec) + 1 for spec in specs)
+            current.bytes_in = sum(len(result.content) for result in results if result.content is not None)
+            return results
+
+    def read_spec(self, spec):
+        """Resolve a single `<ref>:<path>` (or any object name) spec."""
+        return self._request_batch([spec], True)[0]
+
+    def read(self, ref, path):
+        """Resolve the blob at `path` in `ref`."""
+        return self.read_spec(f"{ref}:{path}")
+
+    def read_many(self, specs):
+        """Resolve a list of specs over the shared pipe, preserving input order."""
+        return self._request_batch(specs, True)
+
+    def check_many(self, specs):
+        """Resolve oid, type and size for a list of specs without reading content (content is None)."""
+        return self._request_batch(specs, False)
+
+    def close(self):
+        """Stop the background git processes."""
+        with self._lock:
+            for process in (self._process, self._check_process):
+                if process is not None:
+                    if process.poll() is None:
+                        process.stdin.close()
+                        process.wait()
+                    process.stdout.close()
+            self._process = None
+            self._check_process = None
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python git_blob_reader/main.py <ref:path> [<ref:path> ...]")
+        sys.exit(1)
+
+    with GitBlobReader() as reader:
+        for blob in reader.check_many(sys.argv[1:]):
+            if blob.missing:
+                print(f"{blob.spec}: missing")
+            else:
+                print(f"{blob.spec}: {blob.oid} {blob.type} {blob.size}")
@@ -1,7 +1,28 @@
 # git_branch_processor/main.py
 import subprocess
-import csv
 import os
+import sys
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.repo_context.main import RepoContext
+from automation.tracing.main import enable_from_env
+from automation.change_manifest.main import MANIFEST_FILENAME, diff_manifest_entries, write_manifest
+
+# Result of process_branch_changes: the branches compared, their merge base,
+# and the change manifest written for the LLM handler.
+BranchChanges = namedtuple('BranchChanges', ['current_branch', 'parent_branch', 'merge_base', 'manifest_path', 'files_written'])
+
+# Rename and copy detection. Files at least DEFAULT_RENAME_THRESHOLD percent
+# similar to a deleted file are reported as renames of it, so the LLM handler
+# diffs them against their source, and pure renames are summarized without a
+# request. Copy detection compares new files with the files modified in the
+# same diff; it is off by default. Override with GIT_BRANCH_RENAME_THRESHOLD
+# (0 turns rename detection off) and GIT_BRANCH_DETECT_COPIES.
+DEFAULT_RENAME_THRESHOLD = 50
+DEFAULT_DETECT_COPIES = False
 
 # ANSI color codes for colorful output
 GREEN = '\033[0;32m'
@@ -40,9 +61,11 @@ def run_git_command(command):
         print_error(f"Error executing Git command: {e}")
         raise
 
-def get_current_branch():
+def get_current_branch(repo_context):
     print_step(1, "Determining current branch")
-    branch = run_git_command("git rev-parse --abbrev-ref HEAD")
+    branch = repo_context.current_branch
+    if not branch:
+        raise Exception("Could not determine current branch")
     print_success(f"Current branch: {branch}")
     return branch
 
@@ -84,71 +107,113 @@ def get_parent_branch(current_branch):
     print_error("Could not determine parent branch")
     raise Exception("Could not determine parent branch")
 
-def get_merge_base(current_branch, parent_branch):
+def get_merge_base(current_branch, parent_branch, repo_context):
     print_step(3, f"Finding merge base between '{current_branch}' and '{parent_branch}'")
-    merge_base = run_git_command(f"git merge-base {current_branch} {parent_branch}")
+    merge_base = repo_context.merge_base(current_branch, parent_branch)
+    if not merge_base:
+        raise Exception(f"No merge base found between '{current_branch}' and '{parent_branch}'")
     print_success(f"Merge base found: {merge_base}")
     return merge_base
 
-def get_changed_files(merge_base):
+def get_rename_options(rename_threshold=None, detect_copies=None):
+    """`git diff` options for rename and copy detection, from the arguments or the environment."""
+    if rename_threshold is None:
+        rename_threshold = int(os.getenv('GIT_BRANCH_RENAME_THRESHOLD', DEFAULT_RENAME_THRESHOLD))
+    if detect_copies is None:
+        detect_copies = bool(os.getenv('GIT_BRANCH_DETECT_COPIES')) or DEFAULT_DETECT_COPIES
+    if rename_threshold <= 0:
+        return ['--no-renames']
+    threshold = min(rename_threshold, 100)
+    options = [f"-M{threshold}%"]
+    if detect_copies:
+        options.append(f"-C{threshold}%")
+    return options
+
+def get_changed_files(merge_base, repo_context, rename_threshold=None, detect_copies=None):
+    """
+    Manifest entries for every file changed on the branch: the merge base
+    against HEAD, which is what the LLM handler summarizes.
+    """
     print_step(4, f"Retrieving changed files since merge base {merge_base}")
-    output = run_git_command(f"git diff --name-status {merge_base}")
-    changed_files = []
-    for line in output.split('\n'):
-        if line:
-            status, file_path = line.split('\t', 1)
-            status_map = {'M': 'modified', 'A': 'added', 'D': 'deleted', 'R': 'renamed'}
-            status = status_map.get(status[0], 'unknown')
-            changed_files.append((file_path, status))
-            print_info(f"Found {status} file: {file_path}")
+    options = get_rename_options(rename_threshold, detect_copies)
+    print_info(f"Executing Git command: git diff-tree -r {' '.join(options)} {merge_base} HEAD")
+    changed_files = diff_manifest_entries(merge_base, repo_context.head_oid, repo_context.blob_reader, options,
+                                          repo_context.root)
+    for changed in changed_files:
+        if changed.source:
+            print_info(f"Found {changed.status} file: {changed.source} -> {changed.path}")
+        else:
+            print_info(f"Found {changed.status} file: {changed.path}")
     print_success(f"Total changed files: {len(changed_files)}")
     return changed_files
 
-def is_ignored(file_path):
+def get_ignored_files(file_paths):
+    """
+    Return the subset of file_paths matched by ignore rules.
+    All paths go through a single `git check-ignore --stdin` process, NUL-delimited
+    so names with spaces or newlines are passed through untouched.
+    """
+    if not file_paths:
+        return set()
+    print_info(f"Checking {len(file_paths)} file(s) against ignore rules")
+    command = ['git', 'check-ignore', '--stdin', '-z', '--verbose', '--non-matching']
+    input_data = b''.join(path.encode('utf-8') + b'\0' for path in file_paths)
+    result = subprocess.run(command, input=input_data, capture_output=True)
+    # Exit status 1 only means that no path was ignored.
+    if result.returncode not in (0, 1):
+        print_error(f"Error executing Git command: {' '.join(command)}")
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+
+    # Each record is <source> NUL <linenum> NUL <pattern> NUL <pathname> NUL, with
+    # empty source fields for paths that matched nothing. A negated pattern means
+    # the path was explicitly re-included.
+    fields = result.stdout.split(b'\0')
+    ignored = set()
+    for i in range(0, len(fields) - 3, 4):
+        _, _, pattern, path = fields[i:i + 4]
+        if pattern and not pattern.startswith(b'!'):
+            ignored.add(path.decode('utf-8'))
+            print_warning(f"File is ignored: {path.decode('utf-8')}")
+    return ignored
+
+def process_branch_changes(repo_context=None):
+    """
+    Write autoCommitManifest.jsonl with the files changed on the current branch
+    since it diverged from its parent, and return a BranchChanges.
+    Raises on failure.
+    """
+    print_step(0, "Starting Git Changes to manifest script")
+    if repo_context is None:
+        repo_context = RepoContext()
+    git_root = repo_context.root
+    print_success(f"Git root directory: {git_root}")
+    os.chdir(git_root)
+
+    current_branch = get_current_branch(repo_context)
+    parent_branch = get_parent_branch(current_branch)
+    merge_base = get_merge_base(current_branch, parent_branch, repo_context)
+    changed_files = get_changed_files(merge_base, repo_context)
+
+    manifest_path = os.path.join(git_root, MANIFEST_FILENAME)
+    print_step(5, f"Creating {MANIFEST_FILENAME}")
+    ignored_files = get_ignored_files([changed.path for changed in changed_files])
+    for changed in changed_files:
+        if changed.path in ignored_files:
+            print_warning(f"Skipped ignored file: {changed.path}")
+    files_written = write_manifest(manifest_path, [changed for changed in changed_files if changed.path not in ignored_files],
+                                   merge_base, repo_context.head_oid)
+    print_success(f"{MANIFEST_FILENAME} created successfully with {files_written} files.")
+    return BranchChanges(current_branch, parent_branch, merge_base, manifest_path, files_written)
+
+def main(repo_context=None):
     try:
-        subprocess.check_output(f"git check-ignore -q {file_path}", shell=True, stderr=subprocess.STDOUT)
-        print_warning(f"File is ignored: {file_path}")
-        return True
-    except subprocess.CalledProcessError:
-        # If the command returns a non-zero exit status, the file is not ignored
-        return False
-
-def main():
-    try:
-        print_step(0, "Starting Git Changes to CSV script")
-        git_root = run_git_command("git rev-parse --show-toplevel")
-        print_success(f"Git root directory: {git_root}")
-        os.chdir(git_root)
-
-        current_branch = get_current_branch()
-        parent_branch = get_parent_branch(current_branch)
-        merge_base = get_merge_base(current_branch, parent_branch)
-        changed_files = get_changed_files(merge_base)
-
-        csv_filename = "autoCommitArtifact.csv"
-        csv_path = os.path.join(git_root, csv_filename)
-        
-        print_step(5, f"Creating {csv_filename}")
-        with open(csv_path, 'w', newline='') as csvfile:
-            csv_writer = csv.writer(csvfile)
-            csv_writer.writerow(["File Path", "Status"])
-            
-            files_written = 0
-            for file, status in changed_files:
-                if not is_ignored(file):
-                    absolute_path = os.path.abspath(os.path.join(git_root, file))
-                    csv_writer.writerow([absolute_path, status])
-                    files_written += 1
-                    print_info(f"Added to CSV: {absolute_path} ({status})")
-                else:
-                    print_warning(f"Skipped ignored file: {file}")
-        
-        print_success(f"{csv_filename} created successfully with {files_written} files.")
-
+        return process_branch_changes(repo_context)
     except subprocess.CalledProcessError as e:
         print_error(f"Error executing Git command: {e}")
     except Exception as e:
         print_error(f"An error occurred: {e}")
+    return None
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    enable_from_env()
+    sys.exit(0 if main() else 1)
\ No newline at end of file
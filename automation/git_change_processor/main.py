@@ -1,8 +1,49 @@
 import sys
 import subprocess
 import os
-import csv
-import fnmatch
+import shutil
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.repo_context.main import RepoContext
+from automation.gitignore_matcher.main import GitignoreMatcher
+from automation.tracing.main import enable_from_env
+from automation.change_manifest.main import MANIFEST_FILENAME, diff_manifest_entries, write_manifest
+
+# How process_git_changes builds the ticket commit. 'checkout' stages the
+# changes in the real index, checks the ticket branch out, commits and checks
+# the original branch out again, which leaves the work tree without the
+# changes. 'plumbing' writes the tree from a temporary index and the commit
+# with commit-tree and update-ref: HEAD, the index and the work tree never
+# move and the changes stay in the work tree. Override with
+# GIT_CHANGE_COMMIT_MODE.
+DEFAULT_COMMIT_MODE = 'checkout'
+COMMIT_MODES = ('checkout', 'plumbing')
+
+# Plumbing mode's staged changes: the tree holding them, the commit that will
+# be its parent, the ticket branch's current commit (None when it doesn't
+# exist yet) and the change manifest.
+TicketTree = namedtuple('TicketTree', ['ticket', 'tree', 'parent', 'branch_oid', 'manifest_path'])
+
+# One path of the change set, from a single `git status --porcelain=v2 -z`.
+# `index` and `worktree` are git's XY states ('.' for unchanged, '?' for
+# untracked files) and `status` is a one-letter summary of them.
+# `source` is the original path of a staged rename or copy. Modes and object
+# IDs are those in HEAD (the source's, for a rename) and the index, None where
+# the path doesn't exist; `submodule` is True for gitlinks.
+ChangeEntry = namedtuple('ChangeEntry', [
+    'path', 'status', 'index', 'worktree', 'source', 'head_mode', 'index_mode', 'worktree_mode',
+    'head_oid', 'index_oid', 'submodule',
+])
+
+# git status reads the untracked cache and queries fsmonitor whenever the
+# repository enables them (core.untrackedCache, core.fsmonitor), and may write
+# the refreshed index back so the next scan starts from fresh stat data. Set
+# GIT_CHANGE_UNTRACKED_CACHE=1 to turn the untracked cache on for a repository
+# that hasn't configured it; git stores it in the index for later runs.
+DEFAULT_UNTRACKED_CACHE = False
 
 # ANSI color codes
 RED = '\033[0;31m'
@@ -27,102 +68,287 @@ def run_command(command):
         return None
     return result
 
-def get_changed_files():
-    staged = run_command("git diff --cached --name-status")
-    unstaged = run_command("git diff --name-status")
-    untracked = run_command("git ls-files --others --exclude-standard")
-
-    files = set()
-    if staged:
-        files.update(parse_git_status(staged.stdout))
-    if unstaged:
-        files.update(parse_git_status(unstaged.stdout))
-    if untracked:
-        files.update((file, '?') for file in untracked.stdout.splitlines())
-
-    return list(files)
-
-def parse_git_status(status_output):
-    files = []
-    for line in status_output.splitlines():
-        parts = line.split(maxsplit=1)
-        if len(parts) == 2:
-            status, file = parts
-            files.append((file, status))
-    return files
-
-def is_binary_file(file_path):
-    try:
-        with open(file_path, 'rb') as file:
-            chunk = file.read(1024)
-            return b'\0' in chunk
-    except IOError:
-        print_warning(f"Unable to read file: {file_path}")
-        return False
+def run_status(untracked_cache=None):
+    """Run `git status --porcelain=v2 -z` for the change set; returns its output, or None on failure."""
+    if untracked_cache is None:
+        untracked_cache = bool(os.getenv('GIT_CHANGE_UNTRACKED_CACHE')) or DEFAULT_UNTRACKED_CACHE
+    options = ['-c', 'core.untrackedCache=true'] if untracked_cache else []
+    result = run_git([*options, 'status', '--porcelain=v2', '-z', '--untracked-files=all'])
+    return result.stdout if result else None
 
-def parse_gitignore(gitignore_path):
-    if not os.path.exists(gitignore_path):
+def _object_id(oid):
+    """None for git's all-zero OID (the side where the path doesn't exist)."""
+    return None if not oid or not oid.strip('0') else oid
+
+def _mode(mode):
+    return None if not mode or mode == '000000' else mode
+
+def change_status(index, worktree):
+    """One-letter status for git's XY states."""
+    if 'D' in (index, worktree):
+        return 'D'
+    if index in ('A', 'R', 'C'):
+        return index
+    return 'M'
+
+def parse_porcelain_v2(output):
+    """
+    Parse `git status --porcelain=v2 -z` output into a list of ChangeEntry.
+    Fields are NUL-terminated, so paths with spaces, tabs or newlines come
+    through as they are; a rename's source path is the field after it.
+    """
+    entries = []
+    fields = iter(output.split('\0'))
+    for field in fields:
+        if not field or field[0] in '#!':
+            continue
+        kind = field[0]
+        if kind == '?':
+            entries.append(ChangeEntry(field[2:], '?', '?', '?', None, None, None, None, None, None, False))
+            continue
+        if kind == '1':
+            xy, sub, head_mode, index_mode, worktree_mode, head_oid, index_oid, path = field[2:].split(' ', 7)
+            source = None
+        elif kind == '2':
+            xy, sub, head_mode, index_mode, worktree_mode, head_oid, index_oid, _score, path = field[2:].split(' ', 8)
+            source = next(fields)
+        elif kind == 'u':
+            # Unmerged: stage 2 ("ours") stands in for HEAD and nothing is staged.
+            xy, sub, _base_mode, head_mode, _their_mode, worktree_mode, _base_oid, head_oid, _their_oid, path = field[2:].split(' ', 9)
+            entries.append(ChangeEntry(path, 'U', xy[0], xy[1], None, _mode(head_mode), None, _mode(worktree_mode),
+                                       _object_id(head_oid), None, sub[0] == 'S'))
+            continue
+        else:
+            continue
+        index, worktree = xy
+        entries.append(ChangeEntry(path, change_status(index, worktree), index, worktree, source,
+                                   _mode(head_mode), _mode(index_mode), _mode(worktree_mode),
+                                   _object_id(head_oid), _object_id(index_oid), sub[0] == 'S'))
+    return entries
+
+def get_changed_files(untracked_cache=None):
+    """
+    The change set of the work tree against HEAD: staged, unstaged and
+    untracked files from one `git status` call, as a list of ChangeEntry:
+    tracked paths first, then untracked ones, each in path order. Returns an
+    empty list when git fails.
+    """
+    output = run_status(untracked_cache)
+    if output is None:
         return []
-    with open(gitignore_path, 'r') as f:
-        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return parse_porcelain_v2(output)
 
-def should_ignore_file(file_path, repo_root):
-    gitignore_path = os.path.join(repo_root, '.gitignore')
-    ignore_patterns = parse_gitignore(gitignore_path)
-    ignore_patterns.append('.git/**')
-    
-    relative_path = os.path.relpath(file_path, repo_root)
-    
-    for pattern in ignore_patterns:
-        if pattern.endswith('/'):
-            if fnmatch.fnmatch(relative_path, f"{pattern}*"):
-                return True
-        elif fnmatch.fnmatch(relative_path, pattern):
-            return True
-        elif '/' not in pattern and fnmatch.fnmatch(os.path.basename(relative_path), pattern):
-            return True
-    return False
-
-def process_file(file_path, status, repo_root):
-    try:
-        full_path = os.path.join(repo_root, file_path)
-        if should_ignore_file(full_path, repo_root):
-            print_warning(f"Ignoring file: {file_path}")
-            return False
-        if status != 'D' and is_binary_file(full_path):
-            print_warning(f"Skipping binary file: {file_path}")
-            return False
-        print_success(f"Processing file: {file_path} (Status: {status})")
+def stage_changes(changed_files, env=None):
+    """
+    `git add -A` for just the paths in the change set that differ in the work
+    tree, so git doesn't scan the whole work tree a second time. Paths that
+    only differ in the index are already staged. Returns False on failure.
+    """
+    paths = [entry.path for entry in changed_files if entry.worktree != '.']
+    if not paths:
         return True
-    except Exception as e:
-        print_error(f"Error processing file {file_path}: {str(e)}")
+    # Literal pathspecs: a path containing '*' or '?' must not act as a glob.
+    return run_git(['--literal-pathspecs', 'add', '-A', '--pathspec-from-file=-', '--pathspec-file-nul'],
+                   env=env, input_text='\0'.join(paths)) is not None
+
+def apply_changes(base, changed_files, env):
+    """
+    Load `base`'s tree into the index of `env` and give every path of the
+    change set (rename sources included) its work-tree state on top of it:
+    changed files are added and missing ones removed. Everything else keeps
+    the content it has in `base`. Returns False on failure.
+    """
+    paths = list(dict.fromkeys(path for entry in changed_files for path in (entry.source, entry.path) if path))
+    if run_git(['read-tree', base], env=env) is None:
         return False
+    return run_git(['update-index', '--add', '--remove', '-z', '--stdin'],
+                   env=env, input_text=''.join(f"{path}\0" for path in paths)) is not None
 
-def process_git_changes(ticket_name):
-    git_root = run_command("git rev-parse --show-toplevel")
-    if not git_root:
+def process_file(entry, ignored_files):
+    """Whether a manifest entry goes into the manifest: ignored files are left out."""
+    if entry.path in ignored_files:
+        print_warning(f"Ignoring file: {entry.path}")
         return False
-    git_root = git_root.stdout.strip()
+    if entry.binary:
+        print_warning(f"Binary file: {entry.path} (its content will not be summarized)")
+    print_success(f"Processing file: {entry.path} (Status: {entry.status})")
+    return True
+
+def run_git(args, env=None, input_text=None):
+    """Run git with an argument list; returns the CompletedProcess, or None on failure."""
+    result = subprocess.run(['git', *args], capture_output=True, text=True, env=env, input=input_text)
+    if result.returncode != 0:
+        print_error(f"Error executing command: git {' '.join(args)}")
+        print_error(f"Error message: {result.stderr}")
+        return None
+    return result
+
+def get_commit_mode(commit_mode=None):
+    """The commit mode to use: the argument, else GIT_CHANGE_COMMIT_MODE, else DEFAULT_COMMIT_MODE."""
+    commit_mode = commit_mode or os.getenv('GIT_CHANGE_COMMIT_MODE', DEFAULT_COMMIT_MODE)
+    if commit_mode not in COMMIT_MODES:
+        raise ValueError(f"Unknown commit mode '{commit_mode}'; expected one of: {', '.join(COMMIT_MODES)}")
+    return commit_mode
+
+def collect_changes(repo_context):
+    """
+    Move to the repository root and list the changed files.
+    Returns (git_root, current_branch, changed_files), or None when there is nothing to do.
+    """
+    try:
+        git_root = repo_context.root
+    except ValueError as e:
+        print_error(str(e))
+        return None
     os.chdir(git_root)
 
     repo_name = os.path.basename(git_root)
     print(f"Current repository: {repo_name}")
 
-    current_branch = run_command("git rev-parse --abbrev-ref HEAD")
+    current_branch = repo_context.current_branch
     if not current_branch:
-        return False
-    current_branch = current_branch.stdout.strip()
+        print_error("Unable to determine the current branch")
+        return None
     print(f"Current branch: {current_branch}")
 
     changed_files = get_changed_files()
     if not changed_files:
         print("No changes detected in the current branch.")
-        return False
+        return None
 
     print("Changes detected in the current branch.")
+    return git_root, current_branch, changed_files
+
+# Rename detection for the manifest, at git's default similarity (50%).
+MANIFEST_DIFF_OPTIONS = ['-M']
+
+def write_change_manifest(repo_context, original_ref, new_ref):
+    """
+    Write autoCommitManifest.jsonl with every file that differs between the
+    two commits or trees, except ignored ones; returns its path, or None when
+    git fails.
+    """
+    git_root = repo_context.root
+    manifest_path = os.path.join(git_root, MANIFEST_FILENAME)
+    try:
+        entries = diff_manifest_entries(original_ref, new_ref, repo_context.blob_reader, MANIFEST_DIFF_OPTIONS, git_root)
+    except subprocess.CalledProcessError as e:
+        print_error(f"Error executing command: {' '.join(e.cmd)}")
+        print_error(f"Error message: {e.stderr}")
+        return None
+    # Ignore rules are compiled once for the run and checked for every path in one pass
+    ignore_matcher = GitignoreMatcher.from_repo(git_root)
+    ignored_files = ignore_matcher.ignored_paths(entry.path for entry in entries)
+
+    print(f"\nCreating {MANIFEST_FILENAME}...")
+    written = write_manifest(manifest_path, [entry for entry in entries if process_file(entry, ignored_files)],
+                             original_ref, new_ref)
+    print_success(f"{MANIFEST_FILENAME} created successfully with {written} files.")
+    return manifest_path
+
+def write_tree_from_work_tree(git_root, parent, changed_files, parent_is_head=True):
+    """
+    Snapshot the work tree as a tree object using a temporary index, so the
+    real index, HEAD and the work tree are left as they are. When `parent` is
+    HEAD the temporary index starts as a copy of the real one; otherwise (an
+    existing ticket branch) it starts from the parent's tree, so commits that
+    only exist on that branch are kept. Either way only the paths in the
+    change set are added to it, so the work tree isn't scanned again.
+    Returns the tree OID, or None on failure.
+    """
+    index_path = run_git(['rev-parse', '--git-path', 'index'])
+    if index_path is None:
+        return None
+    index_path = os.path.join(git_root, index_path.stdout.strip())
+    temp_index = os.path.join(os.path.dirname(index_path), f"ticket-index.{os.getpid()}")
+    env = dict(os.environ, GIT_INDEX_FILE=temp_index)
+    try:
+        if not parent_is_head:
+            staged = apply_changes(parent, changed_files, env)
+        elif os.path.exists(index_path):
+            shutil.copyfile(index_path, temp_index)
+            staged = stage_changes(changed_files, env=env)
+        else:
+            # Without an index the change set wasn't measured against the
+            # parent's tree, so everything is added.
+            staged = run_git(['read-tree', parent], env=env) is not None and run_git(['add', '-A'], env=env) is not None
+        if not staged:
+            return None
+        tree = run_git(['write-tree'], env=env)
+        return tree.stdout.strip() if tree else None
+    finally:
+        for path in (temp_index, f"{temp_index}.lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+def stage_ticket_tree(ticket_name, repo_context=None):
+    """
+    Plumbing mode, first half: write the tree of the changes and the
+    manifest without creating a commit or touching HEAD, the index or the work tree.
+    The tree can be read like a branch (`<tree>:<path>`) while the commit
+    message is generated. Returns a TicketTree, or None when there is
+    nothing to commit.
+    """
+    if repo_context is None:
+        repo_context = RepoContext()
+    collected = collect_changes(repo_context)
+    if collected is None:
+        return None
+    git_root, current_branch, changed_files = collected
+
+    branch_oid = repo_context.git('rev-parse', '--verify', '--quiet', f"refs/heads/{ticket_name}") or None
+    parent = branch_oid or repo_context.head_oid
+    if branch_oid:
+        print_success(f"Branch '{ticket_name}' already exists. The new commit will go on top of it.")
+
+    print("\nWriting the changes to a tree...")
+    tree = write_tree_from_work_tree(git_root, parent, changed_files, parent == repo_context.head_oid)
+    if tree is None:
+        return None
+    print_success(f"Tree {tree[:10]} written; HEAD and the work tree were not touched.")
+
+    # The tree is the parent plus the changes, so diffing it against the
+    # parent lists exactly what the new commit changes.
+    manifest_path = write_change_manifest(repo_context, parent, tree)
+    if manifest_path is None:
+        return None
+    return TicketTree(ticket_name, tree, parent, branch_oid, manifest_path)
+
+def commit_ticket_tree(ticket_tree, message):
+    """
+    Plumbing mode, second half: commit the tree with its final message and
+    point the ticket branch at it. The ref update names the branch's
+    previous value, so it fails if the branch moved in the meantime.
+    Returns the commit OID, or None on failure.
+    """
+    commit = run_git(['commit-tree', ticket_tree.tree, '-p', ticket_tree.parent, '-F', '-'], input_text=message)
+    if commit is None:
+        return None
+    commit_oid = commit.stdout.strip()
+    # An empty old value means the branch must not exist yet.
+    if run_git(['update-ref', '-m', f"commit for {ticket_tree.ticket}", f"refs/heads/{ticket_tree.ticket}",
+                commit_oid, ticket_tree.branch_oid or '']) is None:
+        return None
+    print_success(f"Branch '{ticket_tree.ticket}' now points to {commit_oid[:10]}.")
+    return commit_oid
+
+def process_git_changes(ticket_name, repo_context=None, commit_mode=None):
+    if repo_context is None:
+        repo_context = RepoContext()
+
+    if get_commit_mode(commit_mode) == 'plumbing':
+        ticket_tree = stage_ticket_tree(ticket_name, repo_context)
+        if ticket_tree is None:
+            return False
+        return commit_ticket_tree(ticket_tree, f"Commit for {ticket_name}") is not None
+
+    collected = collect_changes(repo_context)
+    if collected is None:
+        return False
+    git_root, current_branch, changed_files = collected
     
     print("\nStaging all changes...")
-    if not run_command("git add -A"):
+    if not stage_changes(changed_files):
         return False
     print_success("All changes have been staged.")
 
@@ -145,17 +371,9 @@ def process_git_changes(ticket_name):
         return False
     print_success("Changes committed successfully.")
 
-    csv_filename = "autoCommitArtifact.csv"
-    csv_path = os.path.join(git_root, csv_filename)
-    print(f"\nCreating {csv_filename}...")
-    with open(csv_path, 'w', newline='') as csvfile:
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(["File Path", "Status"])
-        for file, status in changed_files:
-            if process_file(file, status, git_root):
-                absolute_path = os.path.abspath(os.path.join(git_root, file))
-                csv_writer.writerow([absolute_path, status])
-    print_success(f"{csv_filename} created successfully.")
+    commits = run_git(['rev-parse', 'HEAD^', 'HEAD'])
+    if commits is None or write_change_manifest(repo_context, *commits.stdout.split()) is None:
+        return False
 
     print(f"\nSwitching back to '{current_branch}'...")
     if not run_command(f"git checkout {current_branch}"):
@@ -163,7 +381,7 @@ def process_git_changes(ticket_name):
 
     print_success(f"\nScript completed. You are now on branch '{current_branch}'.")
     print_success(f"A new branch '{ticket_name}' has been created with all changes.")
-    print_success(f"The {csv_filename} has been created in the '{current_branch}' branch but is not committed.")
+    print_success(f"The {MANIFEST_FILENAME} has been created in the '{current_branch}' branch but is not committed.")
 
     return True
 
@@ -173,5 +391,10 @@ if __name__ == "__main__":
         sys.exit(1)
     
     ticket_name = sys.argv[1]
-    result = process_git_changes(ticket_name)
+    enable_from_env()
+    try:
+        result = process_git_changes(ticket_name)
+    except ValueError as e:
+        print_error(str(e))
+        result = False
     sys.exit(0 if result else 1)
\ No newline at end of file
@@ -0,0 +1,240 @@
+# gitignore_matcher/main.py
+import sys
+import os
+import re
+import subprocess
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# One parsed ignore pattern. `base` is the directory (relative to the repo root,
+# '' for the root) of the file the pattern came from; `source` and `line` are
+# kept for diagnostics.
+IgnoreRule = namedtuple('IgnoreRule', ['regex', 'negated', 'dir_only', 'base', 'source', 'line', 'pattern'])
+
+def _translate_segment(pattern):
+    """Translate glob syntax without `**` into a regex that never crosses '/'."""
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            end = i + 1
+            if end < len(pattern) and pattern[end] in '!^':
+                end += 1
+            if end < len(pattern) and pattern[end] == ']':
+                end += 1
+            while end < len(pattern) and pattern[end] != ']':
+                end += 1
+            if end >= len(pattern):
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                regex += '[' + body.replace('\\', '\\\\') + ']'
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+def translate_pattern(pattern):
+    """Translate a gitignore glob (already stripped of '!', leading and trailing '/') into a regex."""
+    parts = pattern.split('/')
+    regex = ''
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == '**':
+            if last:
+                # Trailing "/**" matches everything inside the directory.
+                regex += '.*'
+            else:
+                # Leading "**/" or inner "/**/" matches zero or more directories.
+                regex += '(?:.*/)?'
+            continue
+        # Any other "**" behaves like a regular "*".
+        regex += _translate_segment(part.replace('**', '*'))
+        if not last:
+            regex += '/'
+    return regex
+
+def parse_ignore_line(line, base, source, line_number):
+    """Parse one line of an ignore file into an IgnoreRule, or None for blanks and comments."""
+    line = line.rstrip('\n').rstrip('\r')
+    # Trailing spaces are ignored unless escaped with a backslash.
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        stripped += ' '
+    line = stripped
+    if not line or line.startswith('#'):
+        return None
+
+    negated = False
+    if line.startswith('!'):
+        negated = True
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    pattern = line.rstrip('/')
+    if not pattern:
+        return None
+
+    # A slash at the start or in the middle anchors the pattern to `base`;
+    # otherwise it matches at any depth below it.
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    prefix = re.escape(base + '/') if base else ''
+    regex = prefix + ('' if anchored else '(?:.*/)?') + translate_pattern(pattern)
+    return IgnoreRule(regex, negated, dir_only, base, source, line_number, line)
+
+def read_ignore_file(path, base):
+    """Read every rule from one ignore file; missing files yield no rules."""
+    try:
+        with span('read ignore file', 'file', path=path) as current, \
+                open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+            current.bytes_in = sum(len(line) for line in lines)
+    except OSError:
+        return []
+    rules = []
+    for line_number, line in enumerate(lines, start=1):
+        rule = parse_ignore_line(line, base, path, line_number)
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+def _git(repo_root, *args):
+    result = subprocess.run(['git', *args], capture_output=True, cwd=repo_root)
+    return result.stdout if result.returncode == 0 else b''
+
+def load_repo_rules(repo_root):
+    """
+    Collect the rules git applies to a work tree, lowest precedence first:
+    core.excludesFile, .git/info/exclude, then every .gitignore from the root
+    down (deeper files override shallower ones).
+    """
+    rules = []
+
+    excludes_file = _git(repo_root, 'config', '--path', 'core.excludesFile').decode().strip()
+    if not excludes_file:
+        config_home = os.getenv('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+        excludes_file = os.path.join(config_home, 'git', 'ignore')
+    rules.extend(read_ignore_file(os.path.expanduser(excludes_file), ''))
+
+    git_dir = _git(repo_root, 'rev-parse', '--git-dir').decode().strip() or '.git'
+    rules.extend(read_ignore_file(os.path.join(repo_root, git_dir, 'info', 'exclude'), ''))
+
+    # git itself lists the .gitignore files, tracked or not, skipping those that
+    # sit inside ignored directories (they can never re-include anything).
+    listing = _git(repo_root, 'ls-files', '-z', '--cached', '--others', '--exclude-standard',
+                   '--', ':(glob)**/.gitignore')
+    gitignore_paths = sorted(
+        {path for path in listing.decode('utf-8', errors='replace').split('\0') if path},
+        key=lambda path: (path.count('/'), path),
+    )
+    for relative_path in gitignore_paths:
+        base = os.path.dirname(relative_path)
+        rules.extend(read_ignore_file(os.path.join(repo_root, relative_path), base))
+    return rules
+
+def _compile(rules):
+    """
+    Compile rules into one alternation. Rules are listed last-first so the first
+    alternative that matches is the rule git would apply (last match wins).
+    """
+    if not rules:
+        return None
+    alternatives = [f"(?P<r{index}>{rule.regex})" for index, rule in reversed(list(enumerate(rules)))]
+    return re.compile('|'.join(alternatives))
+
+class GitignoreMatcher:
+    """
+    Gitignore rules compiled once into a single regex per path kind.
+
+    Matching follows gitignore semantics: last matching rule wins, '!' re-includes,
+    trailing '/' only matches directories, and nothing inside an ignored directory
+    can be re-included. Directory decisions are memoized, so checking a path costs
+    one regex match for the file plus a dictionary lookup per parent directory.
+    Like `git check-ignore --no-index`, it answers from the patterns alone and does
+    not look at whether a path is tracked.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._dir_regex = _compile(self.rules)
+        self._file_rule_indexes = [index for index, rule in enumerate(self.rules) if not rule.dir_only]
+        self._file_regex = _compile([self.rules[index] for index in self._file_rule_indexes])
+        self._dir_cache = {}
+
+    @classmethod
+    def from_repo(cls, repo_root):
+        """Build a matcher from every ignore source that applies to `repo_root`."""
+        return cls(load_repo_rules(repo_root))
+
+    def match(self, path, is_dir=False):
+        """Return the IgnoreRule deciding `path` on its own (ignoring parents), or None."""
+        if is_dir:
+            regex, indexes = self._dir_regex, None
+        else:
+            regex, indexes = self._file_regex, self._file_rule_indexes
+        if regex is None:
+            return None
+        found = regex.fullmatch(path)
+        if not found:
+            return None
+        index = int(found.lastgroup[1:])
+        return self.rules[indexes[index] if indexes is not None else index]
+
+    def _is_dir_ignored(self, directory):
+        if directory in self._dir_cache:
+            return self._dir_cache[directory]
+        parent = directory.rpartition('/')[0]
+        if directory == '.git' or (parent and self._is_dir_ignored(parent)):
+            ignored = True
+        else:
+            rule = self.match(directory, is_dir=True)
+            ignored = rule is not None and not rule.negated
+        self._dir_cache[directory] = ignored
+        return ignored
+
+    def is_ignored(self, path, is_dir=False):
+        """Whether a repo-relative path (using '/' separators) is ignored."""
+        path = path.strip('/')
+        parent = path.rpartition('/')[0]
+        if parent and self._is_dir_ignored(parent):
+            return True
+        if is_dir:
+            return self._is_dir_ignored(path)
+        if path == '.git':
+            return True
+        rule = self.match(path)
+        return rule is not None and not rule.negated
+
+    def ignored_paths(self, paths):
+        """Return the subset of `paths` that is ignored, evaluated in one pass."""
+        return {path for path in paths if self.is_ignored(path)}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python gitignore_matcher/main.py <path> [<path> ...]")
+        sys.exit(1)
+
+    repo_root = _git(os.getcwd(), 'rev-parse', '--show-toplevel').decode().strip() or os.getcwd()
+    matcher = GitignoreMatcher.from_repo(repo_root)
+    for path in sys.argv[1:]:
+        relative_path = os.path.relpath(os.path.abspath(path), repo_root).replace(os.sep, '/')
+        print(f"{'ignored' if matcher.is_ignored(relative_path) else 'kept'}\t{relative_path}")
@@ -0,0 +1,227 @@
+# http_client/main.py
+import sys
+import os
+import gzip
+import time
+import re
+import random
+import threading
+import email.utils
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# Seconds to wait for a connection and for each read of the response. The chat
+# endpoint can take a while to answer, so the read timeout is generous; a hung
+# endpoint still fails instead of blocking the pipeline forever.
+# Override with HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT.
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 120
+
+# Retries after the first attempt, and the base and cap (seconds) of the
+# jittered exponential backoff between them. Override with HTTP_MAX_RETRIES.
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Status codes worth retrying. Non-idempotent requests only retry 429, which
+# guarantees the server did not act on the request.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+NON_IDEMPOTENT_RETRY_STATUSES = frozenset([429])
+
+# Keep-alive connections kept per host.
+POOL_SIZE = 16
+
+# Request bodies at least this large are gzip-compressed when the caller asks
+# for compression. Override with HTTP_GZIP_MIN_BYTES.
+DEFAULT_GZIP_MIN_BYTES = 64 * 1024
+
+# A URL query string in an exception message. The chat URL carries its token
+# there, and requests quotes the full URL (or its path and query) in its errors.
+QUERY_PATTERN = re.compile(r"\?[^\s'\"]*")
+
+# ANSI color codes
+YELLOW = '\033[0;33m'
+RESET = '\033[0m'
+
+def print_warning(message):
+    """Print a warning message in yellow."""
+    print(f"{YELLOW}{message}{RESET}")
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(url):
+    """Return the pooled Session for the scheme and host of `url`, creating it on first use."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(key, adapter)
+            _sessions[key] = session
+        return session
+
+def close_sessions():
+    """Close every pooled Session and its connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def get_timeout():
+    """(connect, read) timeout tuple from the environment."""
+    return (
+        float(os.getenv('HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        float(os.getenv('HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+    )
+
+def parse_retry_after(response):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def retry_delay(attempt, response=None):
+    """
+    Delay before retry number `attempt` (0-based): the server's Retry-After when
+    given, otherwise full-jitter exponential backoff.
+    """
+    retry_after = parse_retry_after(response)
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def failed_before_sending(error):
+    """
+    Whether a requests exception happened before the request reached the
+    server: a connect timeout, or a connection that was never established.
+    Anything else (a reset or aborted connection, a read timeout) may come
+    after the server received the request.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    # requests wraps urllib3's MaxRetryError, whose `reason` is the failure.
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+def redact_url(url):
+    """Host and path of a URL, without its scheme, credentials or query string."""
+    parts = urlsplit(url)
+    return f"{parts.hostname or ''}{f':{parts.port}' if parts.port else ''}{parts.path}"
+
+def describe_error(error):
+    """
+    A requests exception as a message that is safe to log: status and reason
+    for an error response, otherwise the message with query strings removed.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return f"{response.status_code} {response.reason} for {redact_url(response.url)}"
+    return QUERY_PATTERN.sub('?...', str(error))
+
+def compress_body(data, headers, min_bytes=None):
+    """Gzip `data` when it is at least min_bytes long; returns the (data, headers) to send."""
+    if min_bytes is None:
+        min_bytes = int(os.getenv('HTTP_GZIP_MIN_BYTES', DEFAULT_GZIP_MIN_BYTES))
+    if data is None:
+        return data, headers
+    body = data.encode('utf-8') if isinstance(data, str) else data
+    if not isinstance(body, bytes) or len(body) < min_bytes:
+        return data, headers
+    headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+    return gzip.compress(body), headers
+
+def http_request(method, url, timeout=None, max_retries=None, idempotent=None, compress=False, **kwargs):
+    """
+    Send a request through the pooled Session for its host.
+
+    Connection errors, and 5xx/429 responses, are retried with jittered
+    exponential backoff that honors Retry-After. Requests that are not
+    idempotent (POST by default) are only retried on a 429 or when the
+    connection was never established: after a dropped connection, a read
+    timeout or a 5xx the server may already have acted on them. Pass
+    idempotent=True for POSTs that are safe to repeat. With compress=True,
+    large `data` bodies are sent gzip-compressed. Returns the last response; raises the requests
+    exception when every attempt failed to get one.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+    if timeout is None:
+        timeout = get_timeout()
+    if max_retries is None:
+        max_retries = int(os.getenv('HTTP_MAX_RETRIES', DEFAULT_MAX_RETRIES))
+    retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+    if compress:
+        kwargs['data'], kwargs['headers'] = compress_body(kwargs.get('data'), kwargs.get('headers'))
+
+    session = get_session(url)
+    parts = urlsplit(url)
+    # The query string stays out of the trace and the warnings: the chat URL
+    # carries its token there.
+    target = redact_url(url)
+    with span(f"{method} {parts.netloc}", 'http', path=parts.path) as current:
+        body = kwargs.get('data')
+        if isinstance(body, (bytes, str)):
+            current.bytes_out = len(body)
+        for attempt in range(max_retries + 1):
+            last_attempt = attempt == max_retries
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Failures before the request was sent are retried for every
+                # request; the rest only when repeating is safe.
+                retryable = idempotent or failed_before_sending(e)
+                if last_attempt or not retryable:
+                    raise
+                delay = retry_delay(attempt)
+                print_warning(f"{method} {target} failed ({e.__class__.__name__}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code in retry_statuses and not last_attempt:
+                delay = retry_delay(attempt, response)
+                print_warning(f"{method} {target} returned {response.status_code}; retrying in {delay:.1f}s")
+                response.close()
+                time.sleep(delay)
+                continue
+            current.set(status=response.status_code, bytes_in=len(response.content))
+            return response
+
+def http_get(url, **kwargs):
+    """GET through the pooled client; see `http_request`."""
+    return http_request('GET', url, **kwargs)
+
+def http_post(url, **kwargs):
+    """POST through the pooled client; see `http_request`."""
+    return http_request('POST', url, **kwargs)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python http_client/main.py <url>")
+        sys.exit(1)
+
+    started = time.time()
+    response = http_get(sys.argv[1])
+    print(f"{response.status_code} in {time.time() - started:.2f}s ({len(response.content)} bytes)")
@@ -4,10 +4,32 @@ import os
 import subprocess
 import json
 import shutil
-from git_change_processor.main import process_git_changes
+from git_change_processor.main import process_git_changes, get_commit_mode, stage_ticket_tree, commit_ticket_tree
 from llm_handler.main import generate_commit_message
 from dotenv import load_dotenv
 import shlex
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.repo_context.main import RepoContext
+from automation.task_graph.main import TaskGraph
+from automation.tracing.main import span, enable_from_env
+from automation.change_manifest.main import MANIFEST_FILENAME
+from automation.auto_pr.main import (
+    get_repo_info, find_free_branch, create_new_branch, push_branch, get_pr_title,
+    create_pull_request as create_github_pull_request, PullRequestResult,
+)
+
+# Where the pull request will be opened from, resolved from GitHub while the
+# commit message is still being generated.
+PullRequestTarget = namedtuple('PullRequestTarget', ['owner', 'repo', 'branch'])
+
+# What the early push published: the commit now on the remote branch and the
+# one it replaced (None when the push created the branch), so a failed run can
+# put the remote back.
+PushedBranch = namedtuple('PushedBranch', ['branch', 'oid', 'previous_oid'])
 
 # Load environment variables from .env file
 load_dotenv()
@@ -57,21 +79,23 @@ def run_command(command, shell=True):
         print_error(f"Output: {e.stdout}")
         return None
 
-def find_repo_root():
+def find_repo_root(repo_context):
     """
     Find the root directory of the git repository.
     Returns the path if successful, None otherwise.
     """
-    result = run_command("git rev-parse --show-toplevel")
-    return result.stdout.strip() if result.returncode == 0 else None
+    try:
+        return repo_context.root
+    except ValueError:
+        return None
 
-def find_csv_file(repo_root):
+def find_manifest_file(repo_root):
     """
-    Look for the 'autoCommitArtifact.csv' file in the repository root.
+    Look for the 'autoCommitManifest.jsonl' change manifest in the repository root.
     Returns the file path if found, None otherwise.
     """
-    csv_file_path = os.path.join(repo_root, 'autoCommitArtifact.csv')
-    return csv_file_path if os.path.exists(csv_file_path) else None
+    manifest_path = os.path.join(repo_root, MANIFEST_FILENAME)
+    return manifest_path if os.path.exists(manifest_path) else None
 
 def parse_commit_message(json_message):
     """
@@ -85,42 +109,112 @@ def parse_commit_message(json_message):
         print_error("Failed to parse commit message JSON")
         return None
 
-def create_pull_request(ticket_name, base_branch):
+def get_branch_oid(branch_name):
+    """Return the commit a local branch points to, or None."""
+    result = run_command(["git", "rev-parse", f"refs/heads/{branch_name}"], shell=False)
+    return result.stdout.strip() if result else None
+
+def resolve_pr_target(ticket_name, repo_context, github_token):
     """
-    Create a pull request using the auto_pr script.
-    Returns True if successful, False otherwise.
+    Look up the repository and pick the branch the PR will be opened from: the
+    ticket branch, or its next free suffix when that already has an open PR.
     """
-    print_step(7, "Creating pull request")
-    auto_pr_script = os.path.join(os.path.dirname(__file__), 'auto_pr', 'main.py')
-
-    if not os.path.exists(auto_pr_script):
-        print_error(f"Error: auto_pr script not found at {auto_pr_script}")
-        return False
+    owner, repo = get_repo_info(repo_context)
+    return PullRequestTarget(owner, repo, find_free_branch(owner, repo, ticket_name, github_token))
 
-    github_token = os.getenv('GITHUB_TOKEN')
-    if not github_token:
-        print_error("GitHub token not found. Please set the GITHUB_TOKEN environment variable.")
-        return False
+def get_remote_branch_oid(branch_name):
+    """Return the commit a branch points to on origin, or None when it doesn't exist there."""
+    result = run_command(["git", "ls-remote", "origin", f"refs/heads/{branch_name}"], shell=False)
+    return result.stdout.split()[0] if result and result.stdout.strip() else None
 
-    print_info(f"Running auto_pr script: {auto_pr_script}")
-    result = run_command(f"python3 {auto_pr_script} {ticket_name} {base_branch}")
-
-    if result.returncode == 0:
-        print_success("Pull request created successfully")
-        print(result.stdout)
-        return True
+def push_pr_branch(ticket_name, target):
+    """
+    Push the ticket's commit to the PR branch early, while the commit message is
+    still being generated. Returns a PushedBranch; the final push leases
+    against its commit.
+    """
+    print_info(f"Pushing {target.branch}")
+    if target.branch != ticket_name:
+        create_new_branch(target.branch, ticket_name)
+    pushed_oid = get_branch_oid(target.branch)
+    previous_oid = get_remote_branch_oid(target.branch)
+    push_branch(target.branch)
+    return PushedBranch(target.branch, pushed_oid, previous_oid)
+
+def publish_amended_commit(ticket_name, target, pushed):
+    """
+    Point the PR branch at the amended commit and force-push it. The lease makes
+    the push fail if the remote branch moved since the early push. Returns the
+    PushedBranch for the amended commit.
+    """
+    print_info(f"Publishing the amended commit to {target.branch}")
+    if target.branch != ticket_name:
+        if run_command(["git", "branch", "-f", target.branch, ticket_name], shell=False) is None:
+            raise Exception(f"Failed to move branch {target.branch} to the amended commit")
+    push_result = run_command(
+        ["git", "push", f"--force-with-lease={target.branch}:{pushed.oid}", "origin", target.branch], shell=False)
+    if push_result is None:
+        raise Exception(f"Failed to push the amended commit to {target.branch}")
+    print_success(f"Amended commit pushed to {target.branch}")
+    return pushed._replace(oid=get_branch_oid(target.branch))
+
+def restore_remote_branch(pushed):
+    """
+    Undo this run's push after a failure: delete the remote branch if the push
+    created it, otherwise put it back on its previous commit. The lease makes
+    this a no-op if someone else pushed to the branch in the meantime.
+    """
+    print_step("Rollback", f"Restoring remote branch {pushed.branch}")
+    lease = f"--force-with-lease={pushed.branch}:{pushed.oid}"
+    if pushed.previous_oid:
+        command = ["git", "push", lease, "origin", f"{pushed.previous_oid}:refs/heads/{pushed.branch}"]
+    else:
+        command = ["git", "push", lease, "origin", "--delete", pushed.branch]
+    if run_command(command, shell=False) is None:
+        print_error(f"Failed to restore remote branch {pushed.branch}; it may need to be deleted by hand")
     else:
+        print_success(f"Remote branch {pushed.branch} restored")
+
+def create_pull_request(target, pr_title, commit_message, base_branch, github_token):
+    """
+    Open the pull request from the already pushed branch.
+    Returns a PullRequestResult if successful, None otherwise.
+    """
+    print_step(7, "Creating pull request")
+    pr_body = f"{pr_title}\n\n{commit_message}"
+    try:
+        pr_url = create_github_pull_request(target.owner, target.repo, pr_title, pr_body,
+                                            target.branch, base_branch, github_token)
+    except ValueError as e:
         print_error("Failed to create pull request")
-        print(f"Return code: {result.returncode}")
-        print(f"Error output: {result.stderr}")
-        print(f"Standard output: {result.stdout}")
+        print(f"Error output: {e}")
 
-        if "422" in result.stdout:
+        if "422" in str(e):
             print_warning("It seems the branch already exists on the remote. You may need to update the existing pull request or create a new one manually.")
-        elif "404" in result.stdout:
+        elif "404" in str(e):
             print_warning("The repository might not exist or you may not have the necessary permissions. Please check your GitHub access and repository settings.")
 
-        return False
+        return None
+
+    print_success(f"Pull request created successfully: {pr_url}")
+    return PullRequestResult(pr_url, target.branch, pr_title)
+
+def rollback_ticket_commit(ticket_tree, commit_oid):
+    """
+    Roll back a plumbing-mode run. The changes never left the work tree, so
+    only the ticket branch is put back where it was (or deleted if this run
+    created it).
+    """
+    print_step("Rollback", "Restoring the ticket branch")
+    ref = f"refs/heads/{ticket_tree.ticket}"
+    if ticket_tree.branch_oid:
+        result = run_command(["git", "update-ref", ref, ticket_tree.branch_oid, commit_oid], shell=False)
+    else:
+        result = run_command(["git", "update-ref", "-d", ref, commit_oid], shell=False)
+    if result is None:
+        print_error(f"Failed to restore branch {ticket_tree.ticket}")
+    else:
+        print_success(f"Branch {ticket_tree.ticket} restored; your changes are still in the work tree.")
 
 def rollback_changes(ticket_name, original_branch):
     """
@@ -214,12 +308,16 @@ def cleanup_branches(ticket_name, original_branch, create_pr):
     Clean up branches related to the ticket.
     """
     print_step("Branch Cleanup", "Cleaning up branches")
-    # Switch back to the original branch
-    switch_result = run_command(f"git checkout {original_branch}")
-    if switch_result and switch_result.returncode == 0:
-        print_success(f"Switched back to original branch: {original_branch}")
+    # Switch back to the original branch; a checkout of the branch we are
+    # already on would still rescan the work tree.
+    if get_current_branch() == original_branch:
+        print_success(f"Already on original branch: {original_branch}")
     else:
-        print_error(f"Failed to switch to original branch: {original_branch}")
+        switch_result = run_command(f"git checkout {original_branch}")
+        if switch_result and switch_result.returncode == 0:
+            print_success(f"Switched back to original branch: {original_branch}")
+        else:
+            print_error(f"Failed to switch to original branch: {original_branch}")
 
     # Delete ticket branches only if PR=true
     if create_pr:
@@ -252,14 +350,14 @@ def cleanup_artifacts(repo_root, ticket_name, original_branch, create_pr):
         except Exception as e:
             print_error(f"Failed to delete TEMP folder: {str(e)}")
 
-    # Delete autoCommitArtifact.csv
-    csv_file = os.path.join(repo_root, "autoCommitArtifact.csv")
-    if os.path.exists(csv_file):
+    # Delete autoCommitManifest.jsonl
+    manifest_file = os.path.join(repo_root, MANIFEST_FILENAME)
+    if os.path.exists(manifest_file):
         try:
-            os.remove(csv_file)
-            print_success(f"Successfully deleted file: {csv_file}")
+            os.remove(manifest_file)
+            print_success(f"Successfully deleted file: {manifest_file}")
         except Exception as e:
-            print_error(f"Failed to delete file {csv_file}: {str(e)}")
+            print_error(f"Failed to delete file {manifest_file}: {str(e)}")
 
 
 def update_commit_message(ticket_name, commit_message):
@@ -285,6 +383,7 @@ def main():
     """
     Main function to orchestrate the integration process.
     """
+    enable_from_env()
     print_step(1, "Initializing integrator script")
 
     if len(sys.argv) < 2:
@@ -297,76 +396,155 @@ def main():
     print(f"Ticket name: {ticket_name}")
     print(f"Create PR: {'Yes' if create_pr else 'No'}")
 
+    # Git metadata is resolved once here and shared with every step below
+    repo_context = RepoContext()
+
     # Store the original branch
-    original_branch = get_current_branch()
+    original_branch = repo_context.current_branch
     if not original_branch:
         print_error("Failed to determine the current branch")
         sys.exit(1)
     print_info(f"Starting from branch: {original_branch}")
 
+    try:
+        commit_mode = get_commit_mode()
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    print_info(f"Commit mode: {commit_mode}")
+
+    graph = None
     try:
         # Find the repository root
         print_step(2, "Detecting repository root")
-        repo_root = find_repo_root()
+        repo_root = find_repo_root(repo_context)
         if not repo_root:
             raise Exception("Unable to determine repository root")
         print_success(f"Repository root found: {repo_root}")
-
-        # Detect changes in the repository
-        print_step(3, "Detecting changes in the repository")
         os.chdir(repo_root)
-        changes_detected = process_git_changes(ticket_name)
-
-        if not changes_detected:
-            raise Exception("No changes detected in the repository")
 
-        print_success("Changes detected in the repository.")
-
-        # Find the CSV file
-        print_step(4, "Locating CSV file")
-        csv_file_path = find_csv_file(repo_root)
-
-        if not csv_file_path:
-            raise Exception("CSV file 'autoCommitArtifact.csv' not found in the repository root")
-
-        print_success(f"CSV file found: {csv_file_path}")
-
-        # Generate commit message
-        print_step(5, "Generating commit message")
-        commit_message_json = generate_commit_message(ticket_name, csv_file_path)
-
-        if not commit_message_json:
-            raise Exception("Failed to generate commit message")
-
-        commit_message = parse_commit_message(commit_message_json)
-        if not commit_message:
-            raise Exception("Failed to parse commit message")
-
-        print_success("Commit message generated successfully.")
-        print("\nGenerated commit message:")
-        print(f"{GREEN}{commit_message}{RESET}")
+        github_token = None
+        if create_pr:
+            github_token = os.getenv('GITHUB_TOKEN')
+            if not github_token:
+                raise Exception("GitHub token not found. Please set the GITHUB_TOKEN environment variable.")
+
+        def detect_changes():
+            # Detect changes in the repository
+            print_step(3, "Detecting changes in the repository")
+            if not process_git_changes(ticket_name, repo_context, commit_mode):
+                raise Exception("No changes detected in the repository")
+            print_success("Changes detected in the repository.")
+
+            # Find the change manifest
+            print_step(4, "Locating change manifest")
+            manifest_path = find_manifest_file(repo_root)
+            if not manifest_path:
+                raise Exception(f"Change manifest '{MANIFEST_FILENAME}' not found in the repository root")
+            print_success(f"Change manifest found: {manifest_path}")
+            return manifest_path
+
+        def stage_changes():
+            # Detect changes and write them to a tree, without a checkout
+            print_step(3, "Detecting changes in the repository")
+            ticket_tree = stage_ticket_tree(ticket_name, repo_context)
+            if ticket_tree is None:
+                raise Exception("No changes detected in the repository")
+            print_success("Changes detected in the repository.")
+            return ticket_tree
+
+        def generate_message(manifest_path):
+            # Generate commit message
+            print_step(5, "Generating commit message")
+            commit_message_json = generate_commit_message(ticket_name, manifest_path, repo_context=repo_context)
+            if not commit_message_json:
+                raise Exception("Failed to generate commit message")
+
+            commit_message = parse_commit_message(commit_message_json)
+            if not commit_message:
+                raise Exception("Failed to parse commit message")
+
+            print_success("Commit message generated successfully.")
+            print("\nGenerated commit message:")
+            print(f"{GREEN}{commit_message}{RESET}")
+            return commit_message
+
+        def commit_changes(ticket_tree, commit_message):
+            print_step(6, "Committing with the generated message")
+            commit_oid = commit_ticket_tree(ticket_tree, commit_message)
+            if commit_oid is None:
+                raise Exception(f"Failed to commit to branch {ticket_name}")
+            return commit_oid
+
+        # Steps run as soon as what they depend on is done. With PR=true, the
+        # Jira title and GitHub lookups run during change detection and
+        # summarization.
+        graph = TaskGraph()
+        if create_pr:
+            graph.add('pr_title', lambda: get_pr_title(ticket_name))
+            graph.add('pr_target', lambda: resolve_pr_target(ticket_name, repo_context, github_token))
+
+        if commit_mode == 'plumbing':
+            # The commit is written once, with the final message, from the tree
+            # staged in a temporary index: no checkout, no amend, and HEAD and
+            # the work tree never move. The branch is pushed once it exists.
+            graph.add('changes', stage_changes)
+            graph.add('commit_message', lambda ticket_tree: generate_message(ticket_tree.manifest_path),
+                      ['changes'])
+            graph.add('commit', commit_changes, ['changes', 'commit_message'])
+            graph.add('cleanup_artifacts', lambda _: cleanup_artifacts(repo_root, ticket_name, original_branch, create_pr), ['commit'])
+            if create_pr:
+                graph.add('push', lambda _, target: push_pr_branch(ticket_name, target), ['commit', 'pr_target'])
+                graph.add('pull_request',
+                          lambda _, target, pr_title, commit_message: create_pull_request(
+                              target, pr_title, commit_message, original_branch, github_token),
+                          ['push', 'pr_target', 'pr_title', 'commit_message'])
+        else:
+            # The branch is pushed while the message is being generated; the
+            # amended commit is force-pushed before the PR opens.
+            graph.add('changes', detect_changes)
+            graph.add('commit_message', generate_message, ['changes'])
+            amend_deps = ['commit_message']
+            if create_pr:
+                graph.add('push', lambda _, target: push_pr_branch(ticket_name, target), ['changes', 'pr_target'])
+                # The amend waits for the early push so the two never race on the branch
+                amend_deps.append('push')
+            graph.add('amend', lambda commit_message, *_: update_commit_message(ticket_name, commit_message), amend_deps)
+            graph.add('cleanup_artifacts', lambda _: cleanup_artifacts(repo_root, ticket_name, original_branch, create_pr), ['amend'])
+            if create_pr:
+                graph.add('publish', lambda _, target, pushed: publish_amended_commit(ticket_name, target, pushed),
+                          ['amend', 'pr_target', 'push'])
+                graph.add('pull_request',
+                          lambda _, target, pr_title, commit_message: create_pull_request(
+                              target, pr_title, commit_message, original_branch, github_token),
+                          ['publish', 'pr_target', 'pr_title', 'commit_message'])
 
-        # Update the commit message
-        update_commit_message(ticket_name, commit_message)
+        try:
+            results = graph.run()
+        finally:
+            graph.print_summary()
 
-   # Perform cleanup before creating the pull request
-        cleanup_artifacts(repo_root, ticket_name, original_branch, create_pr)
-        # Create pull request if requested
-        if create_pr:
-            pr_created = create_pull_request(ticket_name, original_branch)
-            if not pr_created:
-                raise Exception("Pull request creation failed")
+        if create_pr and not results['pull_request']:
+            raise Exception("Pull request creation failed")
 
         print_step(8, "Integration process complete")
 
     except Exception as e:
         print_error(f"An error occurred: {str(e)}")
-        rollback_changes(ticket_name, original_branch)
+        if graph is not None and 'push' in graph.results:
+            # The newest push is the amended commit once it has been published.
+            restore_remote_branch(graph.results.get('publish') or graph.results['push'])
+        if commit_mode != 'plumbing':
+            rollback_changes(ticket_name, original_branch)
+        elif graph is not None and 'commit' in graph.results:
+            rollback_ticket_commit(graph.results['changes'], graph.results['commit'])
         sys.exit(1)
 
     finally:
+        repo_context.close()
         # Call the new function for branch cleanup
-        cleanup_branches(ticket_name, original_branch, create_pr)
+        with span('cleanup_branches'):
+            cleanup_branches(ticket_name, original_branch, create_pr)
         # Check if we're on the original branch, if not, switch to it
         current_branch = get_current_branch()
         if current_branch != original_branch:
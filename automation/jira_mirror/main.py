@@ -0,0 +1,247 @@
+# jira_mirror/main.py
+import sys
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+# Entries younger than the TTL are served without contacting Jira. Older
+# entries, up to DEFAULT_MAX_STALE_SECONDS, are served immediately while a
+# background refresh updates them; past that a read waits for Jira. The stale
+# copy is what the caller gets, so the window is kept to one day.
+# Override with JIRA_MIRROR_TTL and JIRA_MIRROR_MAX_STALE (seconds).
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_MAX_STALE_SECONDS = 24 * 3600
+
+# Background refreshes still running when the process exits are waited for up
+# to this long in total, so a refresh that was started gets a chance to land.
+REFRESH_EXIT_TIMEOUT_SECONDS = 5
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+YELLOW = '\033[0;33m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_warning(message):
+    """Print a warning message in yellow."""
+    print(f"{YELLOW}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def get_default_mirror_path():
+    """Return the mirror database path, honoring JIRA_MIRROR_PATH and XDG_CACHE_HOME."""
+    if os.getenv('JIRA_MIRROR_PATH'):
+        return os.getenv('JIRA_MIRROR_PATH')
+    cache_home = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'shared-scripts', 'jira-mirror.sqlite3')
+
+class JiraMirror:
+    """
+    Local SQLite copy of formatted Jira issue data, keyed by issue key.
+
+    Each issue can hold several kinds of entry: 'info' is the full
+    get_jira_issue_info result (the issue with its subtasks and linked issues)
+    and 'title' is the title-only lookup. Every call opens its own connection,
+    so the mirror can be used from worker and refresh threads.
+    """
+
+    def __init__(self, path=None, ttl=None, max_stale=None):
+        self.path = path or get_default_mirror_path()
+        if ttl is None:
+            ttl = float(os.getenv('JIRA_MIRROR_TTL', DEFAULT_TTL_SECONDS))
+        if max_stale is None:
+            max_stale = float(os.getenv('JIRA_MIRROR_MAX_STALE', DEFAULT_MAX_STALE_SECONDS))
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._threads = []
+        self._initialized = False
+        atexit.register(self.wait_for_refreshes)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS issues ("
+                " issue_key TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (issue_key, kind))"
+            )
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def get(self, issue_key, kind):
+        """Return (data, age_seconds) for an entry, or None when it is not mirrored."""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT data, fetched_at FROM issues WHERE issue_key = ? AND kind = ?",
+                (issue_key, kind),
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def put_many(self, entries, fetched_at=None):
+        """Store (issue_key, kind, data) entries in one transaction."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO issues (issue_key, kind, data, fetched_at) VALUES (?, ?, ?, ?)",
+                    [(issue_key, kind, json.dumps(data), fetched_at) for issue_key, kind, data in entries],
+                )
+        finally:
+            connection.close()
+
+    def put(self, issue_key, kind, data):
+        """Store one entry."""
+        self.put_many([(issue_key, kind, data)])
+
+    def _revalidate(self, issue_key, kind, fetch, store):
+        with self._lock:
+            if (issue_key, kind) in self._refreshing:
+                return
+            self._refreshing.add((issue_key, kind))
+
+        def refresh():
+            try:
+                value = fetch(issue_key)
+                if 'error' not in value:
+                    self._store(issue_key, value, store)
+            finally:
+                with self._lock:
+                    self._refreshing.discard((issue_key, kind))
+
+        thread = threading.Thread(target=refresh, name=f"jira-mirror-{issue_key}", daemon=True)
+        with self._lock:
+            self._threads = [running for running in self._threads if running.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def wait_for_refreshes(self, timeout=REFRESH_EXIT_TIMEOUT_SECONDS):
+        """Wait up to `timeout` seconds in total for background refreshes; registered to run at exit."""
+        deadline = time.time() + timeout
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()))
+
+    def _lookup(self, issue_key, kind):
+        try:
+            return self.get(issue_key, kind)
+        except (sqlite3.Error, OSError) as e:
+            print_warning(f"Jira mirror at {self.path} could not be read ({e}); asking Jira")
+            return None
+
+    def _store(self, issue_key, value, store):
+        try:
+            store(issue_key, value)
+        except (sqlite3.Error, OSError) as e:
+            print_warning(f"Jira mirror at {self.path} could not be updated: {e}")
+
+    def read_through(self, issue_key, kind, fetch, store=None):
+        """
+        Return the mirrored entry, fetching it with `fetch(issue_key)` when needed.
+
+        Fresh entries are returned as they are. Stale entries within max_stale are
+        returned at once and refreshed in the background. Otherwise the call waits
+        for `fetch`; if that fails, a stale entry is still better than nothing.
+        `fetch` returns a dict with an 'error' key on failure, which is never
+        stored. `store(issue_key, value)` saves a fetched value; it defaults to
+        storing it under `kind`. A mirror that can't be read or written is
+        reported and treated as empty, so the lookup still reaches Jira.
+        """
+        if store is None:
+            store = lambda key, value: self.put(key, kind, value)
+        cached = self._lookup(issue_key, kind)
+        if cached is not None:
+            data, age = cached
+            if age <= self.ttl:
+                return data
+            if age <= self.max_stale:
+                self._revalidate(issue_key, kind, fetch, store)
+                return data
+
+        value = fetch(issue_key)
+        if 'error' not in value:
+            self._store(issue_key, value, store)
+            return value
+        if cached is not None:
+            print_warning(f"Jira lookup for {issue_key} failed; using the mirrored copy from {cached[1] / 60:.0f} minutes ago")
+            return cached[0]
+        return value
+
+    def stats(self):
+        """Return a dict describing the mirror contents."""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT COUNT(DISTINCT issue_key), COUNT(*), MIN(fetched_at), MAX(fetched_at) FROM issues"
+            ).fetchone()
+        finally:
+            connection.close()
+        return {
+            "path": self.path,
+            "issues": row[0],
+            "entries": row[1],
+            "oldest": row[2],
+            "newest": row[3],
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+        }
+
+    def purge(self, older_than_seconds=None):
+        """Delete all entries, or only those fetched more than `older_than_seconds` ago. Returns the count removed."""
+        connection = self._connect()
+        try:
+            with connection:
+                if older_than_seconds is None:
+                    cursor = connection.execute("DELETE FROM issues")
+                else:
+                    cursor = connection.execute("DELETE FROM issues WHERE fetched_at < ?",
+                                                (time.time() - older_than_seconds,))
+            return cursor.rowcount
+        finally:
+            connection.close()
+
+def format_timestamp(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else "-"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'purge'):
+        print("Usage: python jira_mirror/main.py stats")
+        print("       python jira_mirror/main.py purge [<olderThanDays>]")
+        print("To preload a sprint, run: python jira_ticket_helper/main.py sync <sprintId|open>")
+        sys.exit(1)
+
+    mirror = JiraMirror()
+    if sys.argv[1] == 'stats':
+        stats = mirror.stats()
+        print_info(f"Mirror database: {stats['path']}")
+        print(f"Issues: {stats['issues']} ({stats['entries']} entries)")
+        print(f"TTL: {stats['ttl']:.0f}s, served stale for up to {stats['max_stale']:.0f}s")
+        print(f"Oldest fetch: {format_timestamp(stats['oldest'])}")
+        print(f"Newest fetch: {format_timestamp(stats['newest'])}")
+    else:
+        older_than = float(sys.argv[2]) * 86400 if len(sys.argv) > 2 else None
+        removed = mirror.purge(older_than)
+        print_success(f"Removed {removed} mirrored entr{'y' if removed == 1 else 'ies'} from {mirror.path}")
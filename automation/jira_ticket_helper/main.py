@@ -1,20 +1,86 @@
 # automation/jira_ticket_helper/main.py
 
 import os
+import sys
 import requests
 from requests.auth import HTTPBasicAuth
 import json
+import threading
 from dotenv import load_dotenv
 
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.http_client.main import http_get, http_post
+from automation.jira_mirror.main import JiraMirror
+from automation.tracing.main import enable_from_env
+
 # Load environment variables from .env file
 load_dotenv()
 
-def get_issue_details(issue_key, auth, headers):
-    api_endpoint = f"https://budsense.atlassian.net/rest/api/3/issue/{issue_key}"
-    response = requests.get(api_endpoint, headers=headers, auth=auth)
+# Jira site root. Set JIRA_BASE_URL to use another site or a local stub.
+JIRA_BASE_URL = os.getenv('JIRA_BASE_URL', "https://budsense.atlassian.net").rstrip('/')
+
+# Only the fields format_issue_details reads, plus the relationships of the
+# main issue. Projecting them keeps responses small (no comments, changelog,
+# attachments or custom fields).
+ISSUE_FIELDS = ['summary', 'status', 'issuetype', 'description', 'subtasks', 'issuelinks']
+RELATED_ISSUE_FIELDS = ['summary', 'status', 'issuetype', 'description']
+TITLE_FIELDS = ['summary', 'issuetype']
+
+# Issues requested per JQL search page.
+SEARCH_PAGE_SIZE = 100
+
+def get_jira_auth():
+    """Return (auth, headers) from JIRA_EMAIL and JIRA_API_TOKEN, or None when they are not set."""
+    email = os.getenv('JIRA_EMAIL')
+    api_token = os.getenv('JIRA_API_TOKEN')
+    if not email or not api_token:
+        return None
+    return HTTPBasicAuth(email, api_token), {"Accept": "application/json"}
+
+def get_issue_details(issue_key, auth, headers, fields=ISSUE_FIELDS):
+    api_endpoint = f"{JIRA_BASE_URL}/rest/api/3/issue/{issue_key}"
+    response = http_get(api_endpoint, headers=headers, auth=auth, params={"fields": ','.join(fields)})
     response.raise_for_status()
     return response.json()
 
+def jql_string(value):
+    """A JQL string literal for `value`: double-quoted, with backslashes and quotes escaped."""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def search_jql(jql, auth, headers, fields=RELATED_ISSUE_FIELDS):
+    """Yield every issue matching a JQL query, following nextPageToken pagination."""
+    api_endpoint = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
+    body = {"jql": jql, "fields": fields, "maxResults": SEARCH_PAGE_SIZE}
+    while True:
+        # A search changes nothing on the server, so it is safe to retry.
+        response = http_post(api_endpoint, headers=dict(headers, **{"Content-Type": "application/json"}),
+                             auth=auth, data=json.dumps(body), idempotent=True)
+        response.raise_for_status()
+        page = response.json()
+        for issue in page.get('issues', []):
+            yield issue
+        if page.get('isLast', True) or not page.get('nextPageToken'):
+            break
+        body["nextPageToken"] = page['nextPageToken']
+
+def search_issues(issue_keys, auth, headers, fields=RELATED_ISSUE_FIELDS):
+    """
+    Fetch many issues with JQL `key in (...)` searches instead of one GET per
+    issue. Returns a dict of issue key to issue data; keys Jira does not return
+    (deleted, or not visible to this account) are left out.
+    """
+    issue_keys = list(dict.fromkeys(issue_keys))
+    issues = {}
+    for start in range(0, len(issue_keys), SEARCH_PAGE_SIZE):
+        batch = issue_keys[start:start + SEARCH_PAGE_SIZE]
+        jql = "key in ({})".format(', '.join(jql_string(key) for key in batch))
+        for issue in search_jql(jql, auth, headers, fields):
+            issues[issue['key']] = issue
+    return issues
+
 def format_issue_details(issue_data):
     description = issue_data['fields']['description']
     formatted_description = ""
@@ -36,50 +102,75 @@ def format_issue_details(issue_data):
         "description": formatted_description.strip() if formatted_description else "No description provided."
     }
 
-def get_jira_issue_info(issue_key):
-    base_url = "https://budsense.atlassian.net"
-    api_endpoint = f"{base_url}/rest/api/3/issue/{issue_key}"
+def get_related_links(issue_data):
+    """Return (subtask keys, [(relationship, key)] links) of an issue fetched with ISSUE_FIELDS."""
+    subtask_keys = [subtask['key'] for subtask in issue_data['fields'].get('subtasks') or []]
+    links = []
+    for link in issue_data['fields'].get('issuelinks') or []:
+        if 'outwardIssue' in link:
+            links.append((f"This issue {link['type']['outward']}", link['outwardIssue']['key']))
+        elif 'inwardIssue' in link:
+            links.append((f"This issue {link['type']['inward']} by", link['inwardIssue']['key']))
+    return subtask_keys, links
 
-    # Get email and API token from environment variables
-    email = os.getenv('JIRA_EMAIL')
-    api_token = os.getenv('JIRA_API_TOKEN')
+def build_issue_info(issue_data, related):
+    """Assemble the get_jira_issue_info result from an issue and a dict of its related issues."""
+    subtask_keys, links = get_related_links(issue_data)
+    result = {
+        "main_issue": format_issue_details(issue_data),
+        "subtasks": [],
+        "linked_issues": []
+    }
+    for key in subtask_keys:
+        if key in related:
+            result["subtasks"].append(format_issue_details(related[key]))
+    for relationship, key in links:
+        if key in related:
+            result["linked_issues"].append({
+                "relationship": relationship,
+                "issue": format_issue_details(related[key])
+            })
+    return result
 
-    if not email or not api_token:
+def fetch_jira_issue_info(issue_key):
+    """Fetch an issue with its subtasks and linked issues from Jira, bypassing the mirror."""
+    auth_headers = get_jira_auth()
+    if auth_headers is None:
         return {"error": "JIRA_EMAIL or JIRA_API_TOKEN not set in .env file"}
-
-    auth = HTTPBasicAuth(email, api_token)
-    headers = {"Accept": "application/json"}
+    auth, headers = auth_headers
 
     try:
         main_issue = get_issue_details(issue_key, auth, headers)
-        result = {
-            "main_issue": format_issue_details(main_issue),
-            "subtasks": [],
-            "linked_issues": []
-        }
+        subtask_keys, links = get_related_links(main_issue)
+        # Subtasks and linked issues come back from one search instead of a
+        # request each.
+        related = search_issues(subtask_keys + [key for _, key in links], auth, headers)
+        return build_issue_info(main_issue, related)
 
-        # Get subtasks
-        for subtask in main_issue['fields'].get('subtasks', []):
-            subtask_data = get_issue_details(subtask['key'], auth, headers)
-            result["subtasks"].append(format_issue_details(subtask_data))
-
-        # Get linked issues
-        for link in main_issue['fields'].get('issuelinks', []):
-            if 'outwardIssue' in link:
-                linked_issue = get_issue_details(link['outwardIssue']['key'], auth, headers)
-                result["linked_issues"].append({
-                    "relationship": f"This issue {link['type']['outward']}",
-                    "issue": format_issue_details(linked_issue)
-                })
-            elif 'inwardIssue' in link:
-                linked_issue = get_issue_details(link['inwardIssue']['key'], auth, headers)
-                result["linked_issues"].append({
-                    "relationship": f"This issue {link['type']['inward']} by",
-                    "issue": format_issue_details(linked_issue)
-                })
-
-        return result
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"HTTP Error occurred: {str(e)}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"An error occurred while making the request: {str(e)}"}
+    except KeyError as e:
+        return {"error": f"Error parsing the response: {str(e)}"}
+
+def fetch_jira_issue_title(issue_key):
+    """
+    Fast path for callers that only need the title and type of an issue, such as
+    the PR title: one request for two fields, without subtasks or links.
+    """
+    auth_headers = get_jira_auth()
+    if auth_headers is None:
+        return {"error": "JIRA_EMAIL or JIRA_API_TOKEN not set in .env file"}
+    auth, headers = auth_headers
 
+    try:
+        issue = get_issue_details(issue_key, auth, headers, fields=TITLE_FIELDS)
+        return {
+            "key": issue['key'],
+            "title": issue['fields']['summary'],
+            "type": issue['fields']['issuetype']['name'],
+        }
     except requests.exceptions.HTTPError as e:
         return {"error": f"HTTP Error occurred: {str(e)}"}
     except requests.exceptions.RequestException as e:
@@ -87,8 +178,89 @@ def get_jira_issue_info(issue_key):
     except KeyError as e:
         return {"error": f"Error parsing the response: {str(e)}"}
 
+_mirror = None
+_mirror_lock = threading.Lock()
+
+def get_mirror():
+    """The shared JiraMirror, or None when JIRA_MIRROR_DISABLE is set."""
+    global _mirror
+    if os.getenv('JIRA_MIRROR_DISABLE'):
+        return None
+    # Lookups run from task graph and summary worker threads; build it once.
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = JiraMirror()
+    return _mirror
+
+def title_entry(info):
+    main_issue = info['main_issue']
+    return {"key": main_issue['key'], "title": main_issue['title'], "type": main_issue['type']}
+
+def store_issue_info(issue_key, info):
+    """Mirror a full issue lookup, along with the title entry it implies."""
+    get_mirror().put_many([(issue_key, 'info', info), (issue_key, 'title', title_entry(info))])
+
+def get_jira_issue_info(issue_key):
+    """Issue details with subtasks and linked issues, read through the local mirror."""
+    mirror = get_mirror()
+    if mirror is None:
+        return fetch_jira_issue_info(issue_key)
+    return mirror.read_through(issue_key, 'info', fetch_jira_issue_info, store_issue_info)
+
+def get_jira_issue_title(issue_key):
+    """Title and type of an issue, read through the local mirror."""
+    mirror = get_mirror()
+    if mirror is None:
+        return fetch_jira_issue_title(issue_key)
+    return mirror.read_through(issue_key, 'title', fetch_jira_issue_title)
+
+def sync_sprint(sprint):
+    """
+    Preload every issue of a sprint into the mirror: one paginated search for the
+    sprint's issues and one for related issues outside it. `sprint` is a sprint
+    id, a sprint name, or 'open' for all open sprints. Returns the number of
+    issues mirrored.
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        raise ValueError("The Jira mirror is disabled (JIRA_MIRROR_DISABLE is set)")
+    auth_headers = get_jira_auth()
+    if auth_headers is None:
+        raise ValueError("JIRA_EMAIL or JIRA_API_TOKEN not set in .env file")
+    auth, headers = auth_headers
+
+    if sprint == 'open':
+        jql = "sprint in openSprints()"
+    elif str(sprint).isdigit():
+        jql = f"sprint = {sprint}"
+    else:
+        jql = f"sprint = {jql_string(sprint)}"
+    issues = {issue['key']: issue for issue in search_jql(jql, auth, headers, ISSUE_FIELDS)}
+
+    related_keys = set()
+    for issue in issues.values():
+        subtask_keys, links = get_related_links(issue)
+        related_keys.update(subtask_keys)
+        related_keys.update(key for _, key in links)
+    related = dict(issues)
+    related.update(search_issues(sorted(related_keys - set(issues)), auth, headers))
+
+    entries = []
+    for key, issue in issues.items():
+        info = build_issue_info(issue, related)
+        entries.append((key, 'info', info))
+        entries.append((key, 'title', title_entry(info)))
+    mirror.put_many(entries)
+    return len(issues)
+
 # Example usage
 if __name__ == "__main__":
+    enable_from_env()
+    if len(sys.argv) == 3 and sys.argv[1] == 'sync':
+        count = sync_sprint(sys.argv[2])
+        print(f"Mirrored {count} issue(s) from sprint {sys.argv[2]} into {get_mirror().path}")
+        sys.exit(0)
+
     issue_key = input("Enter the Jira issue key: ")
     result = get_jira_issue_info(issue_key)
     print(json.dumps(result, indent=2))
\ No newline at end of file
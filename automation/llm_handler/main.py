@@ -1,10 +1,23 @@
 import sys
-import subprocess
 import os
-import csv
 import requests
 import json
 
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.http_client.main import http_post, describe_error
+from automation.tracing.main import enable_from_env
+from automation.summary_pipeline.main import summarize_manifest
+
+# Part of every summary cache key. Bump it whenever a system prompt changes so
+# responses produced with the old prompt are no longer reused.
+PROMPT_VERSION = 'llm_handler-v1'
+
+# Chat endpoint for every summary request. Set LLM_CHAT_URL to use another
+# deployment, e.g. the local stub in automation/benchmarks.
+DEFAULT_CHAT_URL = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+
 # ANSI color codes
 RED = '\033[0;31m'
 RESET = '\033[0m'
@@ -13,50 +26,13 @@ def print_error(message):
     """Print an error message in red."""
     print(f"{RED}{message}{RESET}")
 
-def run_command(command):
-    """Run a shell command and return its output."""
-    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-    if result.returncode != 0:
-        print_error(f"Error executing command: {command}")
-        print_error(f"Error message: {result.stderr}")
-    return result
-
-def get_file_content(file_path, branch):
-    """Get the content of a file from a specific branch."""
-    print(f"Attempting to retrieve content of file '{file_path}' from branch '{branch}'")
-    try:
-        git_path = file_path[len('shared-scripts/'):] if file_path.startswith('shared-scripts/') else file_path
-        content = subprocess.check_output(['git', 'show', f'{branch}:{git_path}'], stderr=subprocess.PIPE)
-        print(f"Successfully retrieved content from '{branch}'")
-        return content
-    except subprocess.CalledProcessError as e:
-        print_error(f"File '{file_path}' does not exist in branch '{branch}' or error occurred: {e}")
-        return None
-
-def create_merged_file(original_content, new_content, output_file):
-    """Create a merged file with original and new content."""
-    print(f"Creating merged file: {output_file}")
-    try:
-        with open(output_file, 'wb') as f:
-            if original_content is not None:
-                f.write(b"===== ORIGINAL CONTENT =====\n\n")
-                f.write(original_content)
-                f.write(b"\n\n===== NEW CONTENT =====\n\n")
-            if new_content is not None:
-                f.write(new_content)
-            else:
-                f.write(b"File does not exist in the new branch.")
-        print(f"Successfully created merged file: {output_file}")
-        return output_file
-    except IOError as e:
-        print_error(f"Error creating merged file: {e}")
-        return None
-
-def get_commit_message(file_content, is_new_file, file_name):
-    url = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+def get_commit_message(file_content, is_new_file, file_name, is_diff=False):
+    url = os.getenv('LLM_CHAT_URL', DEFAULT_CHAT_URL)
     
     if is_new_file:
         system_prompt = f"You must generate a succinct commit message from the text you are provided. The commit message should include the file name '{file_name}' and describe what this new file does."
+    elif is_diff:
+        system_prompt = f"You will be provided with a unified diff of the file '{file_name}'. Lines starting with '-' were removed and lines starting with '+' were added. Based on this, you must create a commit message. The commit message should include the file name '{file_name}' and describe the changes made to this file."
     else:
         system_prompt = f"You will be provided with text that contains the original and modified content of a file. Based on this, you must create a commit message. The commit message should include the file name '{file_name}' and describe the changes made to this file."
 
@@ -67,24 +43,18 @@ def get_commit_message(file_content, is_new_file, file_name):
     headers = {'Content-Type': 'application/json'}
 
     try:
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
+        # Summary requests are safe to repeat, so 5xx responses and read
+        # timeouts are retried too.
+        response = http_post(url, data=json.dumps(payload), headers=headers, idempotent=True,
+                             compress=bool(os.getenv('LLM_GZIP_REQUESTS')))
         response.raise_for_status()
         return response.text
     except requests.RequestException as e:
-        print_error(f"Error making POST request: {e}")
+        print_error(f"Error making POST request: {describe_error(e)}")
         return None
 
-def combine_commit_messages(temp_folder):
-    print("Combining individual commit messages...")
-    combined_content = ""
-    for filename in os.listdir(temp_folder):
-        if filename.endswith("_llm.txt"):
-            with open(os.path.join(temp_folder, filename), 'r') as f:
-                combined_content += f.read() + "\n-------------\n"
-    return combined_content.strip()
-
 def get_final_commit_message(combined_content):
-    url = "https://budbot.mybudsense.com/chat?token=9d41ed1c-1b89-41e7-845a-21bd6cb29277"
+    url = os.getenv('LLM_CHAT_URL', DEFAULT_CHAT_URL)
     
     system_prompt = "You will be given a list of commit messages. Your job is to combine them into a cohesive and easy to understand commit message and just return the commit message without any preamble or other text."
 
@@ -95,107 +65,72 @@ def get_final_commit_message(combined_content):
     headers = {'Content-Type': 'application/json'}
 
     try:
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
+        # Summary requests are safe to repeat, so 5xx responses and read
+        # timeouts are retried too.
+        response = http_post(url, data=json.dumps(payload), headers=headers, idempotent=True,
+                             compress=bool(os.getenv('LLM_GZIP_REQUESTS')))
         response.raise_for_status()
         return response.text
     except requests.RequestException as e:
-        print_error(f"Error making POST request: {e}")
+        print_error(f"Error making POST request: {describe_error(e)}")
         return None
 
-def process_file(file_path, current_branch, ticket_number, temp_folder, index):
-    try:
-        print(f"\nProcessing file {index}: {file_path}")
-        
-        # Convert to relative path if it's an absolute path
-        repo_root = run_command("git rev-parse --show-toplevel").stdout.strip()
-        relative_path = os.path.relpath(file_path, repo_root)
-        
-        original_content = get_file_content(relative_path, current_branch)
-        new_content = get_file_content(relative_path, ticket_number)
-        
-        if original_content is not None or new_content is not None:
-            if original_content is None:
-                file_prefix = 'new'
-            elif new_content is None:
-                file_prefix = 'deleted'
-            else:
-                file_prefix = 'modified'
-            
-            output_file = os.path.join(temp_folder, f'{file_prefix}_{index}.txt')
-            merged_file = create_merged_file(original_content, new_content, output_file)
-            
-            if merged_file and file_prefix in ['new', 'modified']:
-                with open(merged_file, 'r', encoding='utf-8') as f:
-                    merged_content = f.read()
-                
-                commit_message = get_commit_message(merged_content, file_prefix == 'new', relative_path)
-                if commit_message:
-                    commit_file = os.path.join(temp_folder, f'{file_prefix}_{index}_llm.txt')
-                    with open(commit_file, 'w') as f:
-                        f.write(commit_message)
-                    print(f"Created commit message file: {commit_file}")
-        else:
-            print(f"Skipping file '{file_path}' as it doesn't exist in either branch.")
-    
-    except Exception as e:
-        print_error(f"Error processing file {file_path}: {str(e)}")
-        print("Skipping this file and continuing with the next one.")
+def request_file_summary(payload):
+    """Ask the chat endpoint for the commit message of one file payload."""
+    print(f"\nSummarizing file {payload.index}: {payload.path}")
+    return get_commit_message(payload.text, payload.kind == 'new', payload.path,
+                              is_diff=payload.payload_kind != 'full')
 
-def generate_commit_message(ticket_number, csv_file_path=None):
+def generate_commit_message(ticket_number, manifest_path=None, max_workers=None, use_cache=None, payload_mode=None, diff_context=None, repo_context=None, debug_artifacts=None, token_budget=None, fan_out=None, chunk_size=None, max_file_bytes=None, trivial_rules=None):
     """
     Generate a commit message based on the changes in the given ticket.
+
+    Files stream through an in-memory pipeline: manifest records -> blob fetch ->
+    payload build -> summarize -> combine. Nothing is written to disk unless debug
+    artifacts are enabled. Trivial changes (binaries, vendored files, lockfiles,
+    version bumps, whitespace-only edits) are summarized locally, without a request.
     
     Args:
     ticket_number (str): The ticket number or branch name containing the changes.
-    csv_file_path (str, optional): Path to the CSV file containing file paths. If not provided,
-                                   it will look for 'autoCommitArtifact.csv' in the repo root.
+    manifest_path (str, optional): Path to the change manifest written by the processor. If not
+                                   provided, it will look for 'autoCommitManifest.jsonl' in the
+                                   repo root.
+    max_workers (int, optional): Number of files summarized in parallel. Defaults to the
+                                 LLM_MAX_WORKERS environment variable, or DEFAULT_MAX_WORKERS.
+    use_cache (bool, optional): Reuse LLM responses from the on-disk summary cache. Defaults to
+                                True unless the LLM_CACHE_DISABLE environment variable is set.
+    payload_mode (str, optional): 'diff' to send unified hunks, 'full' to send whole files.
+                                  Defaults to LLM_PAYLOAD_MODE, or DEFAULT_PAYLOAD_MODE.
+    diff_context (int, optional): Context lines around each hunk. Defaults to LLM_DIFF_CONTEXT,
+                                  or DEFAULT_DIFF_CONTEXT.
+    repo_context (RepoContext, optional): Shared git metadata for this run. A private one is
+                                          created (and closed) when not provided.
+    debug_artifacts (bool, optional): Write payloads and responses to TEMP for debugging.
+                                      Defaults to the LLM_DEBUG_ARTIFACTS environment variable.
+    token_budget (int, optional): Estimated tokens per combine request. Defaults to
+                                  LLM_REDUCE_TOKEN_BUDGET, or DEFAULT_REDUCE_TOKEN_BUDGET.
+    fan_out (int, optional): Summaries per combine request. Defaults to LLM_REDUCE_FAN_OUT,
+                             or DEFAULT_REDUCE_FAN_OUT.
+    chunk_size (int, optional): Payloads longer than this many characters are summarized in
+                                chunks. Defaults to LLM_CHUNK_SIZE, or DEFAULT_CHUNK_SIZE.
+    max_file_bytes (int, optional): Blobs larger than this are not read and get a metadata-only
+                                    summary. Defaults to LLM_MAX_FILE_BYTES, or DEFAULT_MAX_FILE_BYTES.
+    trivial_rules (TrivialRules, optional): Rules for changes summarized locally. Defaults to the
+                                            rules of the repo's .autocommit-rules.json, or none
+                                            when the LLM_TRIVIAL_DISABLE environment variable is set.
     
     Returns:
     str: The generated commit message.
     """
     print(f"Starting commit message generation for ticket: {ticket_number}")
-    
-    repo_root = run_command("git rev-parse --show-toplevel").stdout.strip()
-    print(f"Git repository root: {repo_root}")
-    
-    if csv_file_path is None:
-        csv_file_path = os.path.join(repo_root, 'autoCommitArtifact.csv')
-    
-    file_paths = []
-    print(f"Reading CSV file: {csv_file_path}")
-    try:
-        with open(csv_file_path, 'r') as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-            for row in csv_reader:
-                file_paths.append(row['File Path'])
-        print(f"Successfully read {len(file_paths)} file path(s) from the CSV.")
-    except FileNotFoundError:
-        print_error(f"Error: CSV file '{csv_file_path}' not found.")
-        return None
-    except csv.Error as e:
-        print_error(f"Error reading CSV file: {e}")
-        return None
-    
-    current_branch = subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], text=True).strip()
-    print(f"Current git branch (base branch): {current_branch}")
-    
-    temp_folder = os.path.join(repo_root, 'TEMP')
-    os.makedirs(temp_folder, exist_ok=True)
-    print(f"Created TEMP folder at: {temp_folder}")
-    
-    for index, file_path in enumerate(file_paths, start=1):
-        process_file(file_path, current_branch, ticket_number, temp_folder, index)
-    
-    combined_content = combine_commit_messages(temp_folder)
-    
-    final_commit_message = get_final_commit_message(combined_content)
+    final_commit_message = summarize_manifest(
+        request_file_summary, get_final_commit_message, PROMPT_VERSION, manifest_path, repo_context,
+        max_workers=max_workers, use_cache=use_cache, payload_mode=payload_mode, diff_context=diff_context,
+        debug_artifacts=debug_artifacts, token_budget=token_budget, fan_out=fan_out, chunk_size=chunk_size,
+        max_file_bytes=max_file_bytes, trivial_rules=trivial_rules,
+    )
     if final_commit_message:
-        final_commit_file = os.path.join(temp_folder, 'final_commit_message.txt')
-        with open(final_commit_file, 'w') as f:
-            f.write(final_commit_message)
-        print(f"Created final commit message file: {final_commit_file}")
-    
-    print("\nCommit message generation completed.")
+        print("\nCommit message generation completed.")
     return final_commit_message
 
 # Example usage:
@@ -205,6 +140,7 @@ if __name__ == "__main__":
         sys.exit(1)
     
     ticket_number = sys.argv[1]
+    enable_from_env()
     commit_message = generate_commit_message(ticket_number)
     if commit_message:
         print("Generated commit message:")
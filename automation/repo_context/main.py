@@ -0,0 +1,116 @@
+# repo_context/main.py
+import sys
+import os
+import subprocess
+import threading
+from functools import cached_property
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.git_blob_reader.main import GitBlobReader
+
+class RepoContext:
+    """
+    Git facts for one run of the automation pipeline.
+
+    Create one at the start of a run and pass it to every stage. Each fact is
+    computed the first time it is read and cached afterwards, so the root,
+    branch, remotes and so on cost one git call per run instead of one per
+    module (or per file). `current_branch` and `head_oid` are therefore a
+    snapshot of where the run started, which is the branch the pipeline
+    returns to at the end.
+    """
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd
+        self._lock = threading.Lock()
+        self._merge_bases = {}
+        self._blob_reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def git(self, *args):
+        """Run a git command in the repository and return its stripped stdout, or None on failure."""
+        result = subprocess.run(['git', *args], capture_output=True, text=True, cwd=self.cwd)
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    @cached_property
+    def root(self):
+        root = self.git('rev-parse', '--show-toplevel')
+        if not root:
+            raise ValueError("Not inside a git repository")
+        return root
+
+    @cached_property
+    def current_branch(self):
+        return self.git('rev-parse', '--abbrev-ref', 'HEAD')
+
+    @cached_property
+    def head_oid(self):
+        return self.git('rev-parse', 'HEAD')
+
+    @cached_property
+    def remotes(self):
+        """Map of remote name to fetch URL."""
+        output = self.git('config', '--get-regexp', r'^remote\..*\.url$') or ''
+        remotes = {}
+        for line in output.splitlines():
+            key, _, url = line.partition(' ')
+            remotes[key[len('remote.'):-len('.url')]] = url
+        return remotes
+
+    def remote_url(self, remote='origin'):
+        return self.remotes.get(remote)
+
+    @cached_property
+    def default_branch(self):
+        """Default branch of origin, from the local origin/HEAD ref when it is set."""
+        ref = self.git('symbolic-ref', '--quiet', '--short', 'refs/remotes/origin/HEAD')
+        if ref:
+            return ref.split('/', 1)[1]
+        # origin/HEAD is only set by clone; ask the remote instead.
+        output = self.git('remote', 'show', 'origin') or ''
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith('HEAD branch:'):
+                return line.split(':', 1)[1].strip()
+        return None
+
+    def merge_base(self, first, second):
+        """Merge base of two refs, memoized per pair."""
+        key = (first, second)
+        with self._lock:
+            if key not in self._merge_bases:
+                self._merge_bases[key] = self.git('merge-base', first, second)
+            return self._merge_bases[key]
+
+    @property
+    def blob_reader(self):
+        """A `git cat-file --batch` reader shared by everything using this context."""
+        with self._lock:
+            if self._blob_reader is None:
+                self._blob_reader = GitBlobReader(self.root)
+            return self._blob_reader
+
+    def close(self):
+        """Release the background processes owned by this context."""
+        with self._lock:
+            if self._blob_reader is not None:
+                self._blob_reader.close()
+                self._blob_reader = None
+
+if __name__ == "__main__":
+    with RepoContext() as context:
+        print(f"Root: {context.root}")
+        print(f"Current branch: {context.current_branch}")
+        print(f"HEAD: {context.head_oid}")
+        for name, url in context.remotes.items():
+            print(f"Remote {name}: {url}")
+        print(f"Default branch: {context.default_branch}")
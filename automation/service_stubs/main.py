@@ -0,0 +1,233 @@
+# service_stubs/main.py
+import sys
+import re
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Injected behaviour of a stub: every request waits `latency` seconds plus up
+# to `jitter` more, and fails with `error_status` with probability `error_rate`.
+StubBehaviour = namedtuple('StubBehaviour', ['latency', 'jitter', 'error_rate', 'error_status', 'seed'])
+StubBehaviour.__new__.__defaults__ = (0.0, 0.0, 0.0, 503, None)
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+class StubServer:
+    """
+    A local HTTP server standing in for one external service.
+
+    `route(stub, method, path, body)` returns (status, json_body); the server
+    adds the injected latency and errors around it. Requests are served on
+    keep-alive connections from a thread per connection, and counted per
+    outcome in `stats`.
+    """
+
+    def __init__(self, name, route, behaviour=None, host='127.0.0.1', port=0):
+        self.name = name
+        self.route = route
+        self.behaviour = behaviour or StubBehaviour()
+        self.state = {}
+        self.stats = {'requests': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._random = random.Random(self.behaviour.seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                status, payload = stub.handle(self.command, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+    def handle(self, method, path, body):
+        """Apply the injected latency and errors, then route the request."""
+        behaviour = self.behaviour
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = behaviour.latency + (self._random.uniform(0, behaviour.jitter) if behaviour.jitter else 0)
+            failed = behaviour.error_rate and self._random.random() < behaviour.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return behaviour.error_status, {"error": f"injected {behaviour.error_status} from {self.name} stub"}
+        with self._lock:
+            return self.route(self, method, path, body)
+
+    def reset(self):
+        """Forget state and counters between runs."""
+        with self._lock:
+            self.state.clear()
+            self.stats = {'requests': 0, 'errors': 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"{self.name}-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+def route_chat(stub, method, path, body):
+    """Chat endpoint: answer every prompt with a short message in the service's JSON shape."""
+    if method != 'POST':
+        return 405, {"error": "method not allowed"}
+    request = json.loads(body or b'{}')
+    count = stub.state.get('answered', 0) + 1
+    stub.state['answered'] = count
+    match = re.search(r"'([^']+)'", request.get('system_prompt', ''))
+    subject = match.group(1) if match else "the changes"
+    return 200, {"response": f"Update {subject} (stub answer {count})"}
+
+def route_github(stub, method, path, body):
+    """GitHub: list and create pull requests; created PRs show up as open."""
+    match = re.match(r'^/repos/([^/]+)/([^/]+)/pulls$', urlsplit(path).path)
+    if not match:
+        return 404, {"message": "Not Found"}
+    owner, repo = match.groups()
+    pulls = stub.state.setdefault('pulls', [])
+    if method == 'GET':
+        # Everything fits on one page; the real API would add a Link header.
+        head = parse_qs(urlsplit(path).query).get('head')
+        return 200, [pr for pr in pulls if head is None or pr['head']['label'] == head[0]]
+    if method == 'POST':
+        request = json.loads(body or b'{}')
+        if any(pr['head']['ref'] == request['head'] for pr in pulls):
+            return 422, {"message": "A pull request already exists"}
+        number = len(pulls) + 1
+        pr = {
+            "number": number,
+            "title": request.get('title'),
+            "html_url": f"{stub.url}/{owner}/{repo}/pull/{number}",
+            "head": {"ref": request['head'], "label": f"{owner}:{request['head']}"},
+            "base": {"ref": request.get('base')},
+        }
+        pulls.append(pr)
+        return 201, pr
+    return 405, {"message": "Method not allowed"}
+
+def stub_issue(key, fields=None):
+    """A Jira issue in the REST v3 shape, without relationships unless asked for."""
+    issue = {
+        "key": key,
+        "fields": {
+            "summary": f"Synthetic issue {key}",
+            "status": {"name": "In Progress"},
+            "issuetype": {"name": "Story"},
+            "description": None,
+            "subtasks": [],
+            "issuelinks": [],
+        },
+    }
+    if fields:
+        issue['fields'] = {name: value for name, value in issue['fields'].items() if name in fields}
+    return issue
+
+def route_jira(stub, method, path, body):
+    """Jira: single issue lookups and JQL searches by key."""
+    parts = urlsplit(path)
+    match = re.match(r'^/rest/api/3/issue/([^/]+)$', parts.path)
+    if method == 'GET' and match:
+        fields = re.search(r'fields=([^&]+)', parts.query)
+        return 200, stub_issue(match.group(1), fields.group(1).replace('%2C', ',').split(',') if fields else None)
+    if method == 'POST' and parts.path == '/rest/api/3/search/jql':
+        request = json.loads(body or b'{}')
+        keys = re.findall(r'[A-Z][A-Z0-9]*-\d+', request.get('jql', ''))
+        return 200, {"issues": [stub_issue(key, request.get('fields')) for key in keys], "isLast": True}
+    return 404, {"errorMessages": ["Issue does not exist"]}
+
+ROUTES = {
+    'chat': route_chat,
+    'github': route_github,
+    'jira': route_jira,
+}
+
+def start_stub(name, behaviour=None, port=0):
+    """Start the stub for 'chat', 'github' or 'jira' and return the running StubServer."""
+    return StubServer(name, ROUTES[name], behaviour, port=port).start()
+
+def stub_environment(stubs):
+    """Environment variables that point the automation at running stubs (a dict of name to StubServer)."""
+    env = {}
+    if 'chat' in stubs:
+        env['LLM_CHAT_URL'] = f"{stubs['chat'].url}/chat"
+    if 'github' in stubs:
+        env['GITHUB_API_URL'] = stubs['github'].url
+        env['GITHUB_TOKEN'] = 'stub-token'
+    if 'jira' in stubs:
+        env['JIRA_BASE_URL'] = stubs['jira'].url
+        env['JIRA_EMAIL'] = 'stub@example.com'
+        env['JIRA_API_TOKEN'] = 'stub-token'
+    return env
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the chat endpoint, GitHub and Jira.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds, at random (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with --error-status (default: 0)")
+    parser.add_argument('--error-status', type=int, default=503, help="Status code of injected errors (default: 503)")
+    args = parser.parse_args()
+
+    behaviour = StubBehaviour(args.latency, args.jitter, args.error_rate, args.error_status)
+    stubs = {name: start_stub(name, behaviour) for name in ROUTES}
+    print_success("Stubs running. Export these to use them:")
+    for key, value in stub_environment(stubs).items():
+        print(f"export {key}={value}")
+    print_info("Press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for stub in stubs.values():
+            stub.stop()
+        sys.exit(0)
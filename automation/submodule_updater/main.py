@@ -0,0 +1,242 @@
+# submodule_updater/main.py
+import sys
+import os
+import argparse
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import enable_from_env
+
+DEFAULT_SUBMODULE = 'shared-scripts'
+DEFAULT_BRANCH = 'dev'
+DEFAULT_MAX_WORKERS = 8
+COMMIT_MESSAGE = "Update submodule to latest commit"
+
+# Outcome for one repository. old_oid / new_oid are the submodule commits
+# before and after the run (abbreviated in the summary table).
+RepoUpdate = namedtuple('RepoUpdate', ['repo', 'status', 'old_oid', 'new_oid', 'detail'])
+
+# ANSI color codes for colorful output
+GREEN = '\033[0;32m'
+YELLOW = '\033[0;33m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+STATUS_COLORS = {
+    'updated': GREEN,
+    'would update': BLUE,
+    'up to date': RESET,
+    'skipped': YELLOW,
+    'failed': RED,
+}
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_error(message):
+    """Print an error message in red."""
+    print(f"{RED}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def git_environment():
+    """
+    Environment for every git call: never prompt for credentials or merge
+    messages, so one repository can't stall the whole run.
+    """
+    env = dict(os.environ)
+    env['GIT_TERMINAL_PROMPT'] = '0'
+    env['GIT_MERGE_AUTOEDIT'] = 'no'
+    env.setdefault('GIT_SSH_COMMAND', 'ssh -o BatchMode=yes')
+    return env
+
+class GitError(Exception):
+    """A git command exited with a non-zero status."""
+
+def git(repo, *args, env=None):
+    """Run git in `repo` and return its stripped stdout; raise GitError on failure."""
+    result = subprocess.run(['git', '-C', repo, *args], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        message = (result.stderr or result.stdout).strip().splitlines()
+        raise GitError(f"git {' '.join(args)}: {message[-1] if message else f'exit code {result.returncode}'}")
+    return result.stdout.strip()
+
+def find_workspace(start_dir):
+    """The directory holding the service repositories: the parent when run from inside one."""
+    if os.path.isdir(os.path.join(start_dir, '.git')):
+        return os.path.dirname(os.path.abspath(start_dir))
+    return os.path.abspath(start_dir)
+
+def find_repositories(workspace):
+    """First-level directories of the workspace that are git repositories, sorted by name."""
+    repos = []
+    for name in sorted(os.listdir(workspace)):
+        path = os.path.join(workspace, name)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, '.git')):
+            repos.append(path)
+    return repos
+
+def get_submodule_url(repo, submodule):
+    """URL of the submodule as declared in .gitmodules, or None when the repo doesn't have it."""
+    try:
+        return git(repo, 'config', '-f', '.gitmodules', '--get', f"submodule.{submodule}.url") or None
+    except GitError:
+        return None
+
+def resolve_submodule_url(repo, url):
+    """
+    Absolute form of a submodule URL. Relative URLs ('../scripts.git') are
+    resolved the way git does, against the repository's origin URL, or
+    against the repository itself when it has no origin.
+    """
+    if not url.startswith(('./', '../')):
+        return url
+    try:
+        base = git(repo, 'config', '--get', 'remote.origin.url')
+    except GitError:
+        base = os.path.abspath(repo)
+    base = base.rstrip('/')
+    separator = '/'
+    while url.startswith(('./', '../')):
+        if url.startswith('../'):
+            # Drop the last path component; for scp-like URLs (host:org/repo)
+            # the host part ends at the colon.
+            cut = max(base.rfind('/'), base.rfind(':'))
+            if cut < 0:
+                break
+            separator = base[cut]
+            base = base[:cut]
+        url = url.split('/', 1)[1]
+    return f"{base}{separator}{url}"
+
+def get_recorded_oid(repo, submodule):
+    """Submodule commit recorded in the repository's HEAD (the gitlink), or None."""
+    try:
+        entry = git(repo, 'ls-tree', 'HEAD', '--', submodule)
+    except GitError:
+        return None
+    parts = entry.split()
+    return parts[2] if len(parts) >= 3 and parts[1] == 'commit' else None
+
+def get_checked_out_oid(repo, submodule):
+    """Commit checked out in the submodule work tree, or None when it isn't initialized."""
+    path = os.path.join(repo, submodule)
+    if not os.path.exists(os.path.join(path, '.git')):
+        return None
+    try:
+        return git(path, 'rev-parse', 'HEAD')
+    except GitError:
+        return None
+
+def resolve_target_oids(urls, branch, env):
+    """Resolve the branch tip once per distinct submodule URL with ls-remote."""
+    targets = {}
+    for url in sorted(set(urls)):
+        try:
+            output = git('.', 'ls-remote', url, f"refs/heads/{branch}", env=env)
+            targets[url] = output.split()[0] if output else None
+        except GitError as e:
+            print_error(f"Failed to resolve {branch} of {url}: {e}")
+            targets[url] = None
+    return targets
+
+def update_repository(repo, submodule, target_oid, dry_run, env):
+    """
+    Bring one repository's submodule to target_oid: pull the repository, move
+    the submodule, commit only the submodule path and push. The steps run in
+    order within one worker, so each repository is committed and pushed once.
+    """
+    name = os.path.basename(repo)
+    old_oid = get_recorded_oid(repo, submodule)
+    # Already recorded and checked out at the target: nothing to fetch or push.
+    if old_oid == target_oid and get_checked_out_oid(repo, submodule) == target_oid:
+        return RepoUpdate(name, 'up to date', old_oid, target_oid, '')
+    if dry_run:
+        return RepoUpdate(name, 'would update', old_oid, target_oid, '')
+
+    try:
+        git(repo, 'pull', '--no-edit', env=env)
+        old_oid = get_recorded_oid(repo, submodule)
+        submodule_path = os.path.join(repo, submodule)
+        if get_checked_out_oid(repo, submodule) is None:
+            git(repo, 'submodule', 'update', '--init', '--', submodule, env=env)
+        git(submodule_path, 'fetch', 'origin', env=env)
+        git(submodule_path, 'checkout', '--quiet', '--detach', target_oid, env=env)
+        if old_oid == target_oid:
+            # Someone else already recorded the target; only the checkout moved.
+            return RepoUpdate(name, 'up to date', old_oid, target_oid, 'checked out recorded commit')
+        git(repo, 'add', '--', submodule, env=env)
+        git(repo, 'commit', '--quiet', '-m', COMMIT_MESSAGE, '--', submodule, env=env)
+        git(repo, 'push', '--quiet', env=env)
+    except GitError as e:
+        return RepoUpdate(name, 'failed', old_oid, target_oid, str(e))
+    return RepoUpdate(name, 'updated', old_oid, target_oid, '')
+
+def update_submodules(workspace, submodule=DEFAULT_SUBMODULE, branch=DEFAULT_BRANCH,
+                      max_workers=DEFAULT_MAX_WORKERS, dry_run=False):
+    """Update the submodule in every repository of the workspace and return a list of RepoUpdate."""
+    env = git_environment()
+    repos = find_repositories(workspace)
+    urls = {}
+    for repo in repos:
+        url = get_submodule_url(repo, submodule)
+        urls[repo] = resolve_submodule_url(repo, url) if url else None
+    targets = resolve_target_oids([url for url in urls.values() if url], branch, env)
+    print_info(f"Found {len(repos)} repositories in {workspace}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = []
+        for repo in repos:
+            url = urls[repo]
+            if url is None:
+                results.append(RepoUpdate(os.path.basename(repo), 'skipped', None, None, f"no {submodule} submodule"))
+            elif targets.get(url) is None:
+                results.append(RepoUpdate(os.path.basename(repo), 'failed', None, None, f"could not resolve {branch} of {url}"))
+            else:
+                futures.append(executor.submit(update_repository, repo, submodule, targets[url], dry_run, env))
+        results.extend(future.result() for future in futures)
+    return sorted(results, key=lambda result: result.repo)
+
+def short(oid):
+    return oid[:10] if oid else '-'
+
+def print_summary(results):
+    """Print one row per repository."""
+    width = max([len('Repository')] + [len(result.repo) for result in results])
+    print(f"\n{'Repository':<{width}}  {'Status':<12}  {'From':<10}  {'To':<10}  Detail")
+    for result in results:
+        color = STATUS_COLORS.get(result.status, RESET)
+        print(f"{result.repo:<{width}}  {color}{result.status:<12}{RESET}  "
+              f"{short(result.old_oid):<10}  {short(result.new_oid):<10}  {result.detail}")
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    print("\n" + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a submodule in every repository of a workspace.")
+    parser.add_argument('workspace', nargs='?', default=os.getcwd(),
+                        help="Directory holding the repositories (default: the parent of the current repository)")
+    parser.add_argument('--submodule', default=DEFAULT_SUBMODULE, help=f"Submodule path (default: {DEFAULT_SUBMODULE})")
+    parser.add_argument('--branch', default=DEFAULT_BRANCH, help=f"Submodule branch to record (default: {DEFAULT_BRANCH})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Repositories updated in parallel (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be updated")
+    args = parser.parse_args()
+
+    enable_from_env()
+    workspace = find_workspace(args.workspace)
+    results = update_submodules(workspace, args.submodule, args.branch, args.workers, args.dry_run)
+    print_summary(results)
+    if any(result.status == 'failed' for result in results):
+        sys.exit(1)
+    print_success("All submodules have been updated." if not args.dry_run else "Dry run complete.")
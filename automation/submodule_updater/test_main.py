@@ -0,0 +1,124 @@
+# submodule_updater/test_main.py
+import sys
+import os
+
+import pytest
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.submodule_updater.main import (
+    DEFAULT_SUBMODULE, DEFAULT_BRANCH, COMMIT_MESSAGE, git, resolve_submodule_url, update_submodules,
+)
+
+def commit_file(repo, name, content):
+    with open(os.path.join(repo, name), 'w') as f:
+        f.write(content)
+    git(repo, 'add', name)
+    git(repo, 'commit', '--quiet', '-m', f"Add {name}")
+    return git(repo, 'rev-parse', 'HEAD')
+
+@pytest.fixture
+def git_identity(monkeypatch):
+    monkeypatch.setenv('GIT_AUTHOR_NAME', 'Test')
+    monkeypatch.setenv('GIT_AUTHOR_EMAIL', 'test@example.com')
+    monkeypatch.setenv('GIT_COMMITTER_NAME', 'Test')
+    monkeypatch.setenv('GIT_COMMITTER_EMAIL', 'test@example.com')
+    # Submodules cloned from local paths are refused by default.
+    monkeypatch.setenv('GIT_CONFIG_COUNT', '1')
+    monkeypatch.setenv('GIT_CONFIG_KEY_0', 'protocol.file.allow')
+    monkeypatch.setenv('GIT_CONFIG_VALUE_0', 'always')
+
+def build_workspace(tmp_path, relative_url=False):
+    """
+    A bare submodule remote with a dev branch, and a workspace holding a
+    service (a clone of its own bare remote, with the submodule at the first
+    dev commit) and a repository without the submodule. With relative_url the
+    service declares the submodule as '../shared-scripts.git'.
+    """
+    scripts_remote = str(tmp_path / 'shared-scripts.git')
+    git(str(tmp_path), 'init', '--quiet', '--bare', '--initial-branch', DEFAULT_BRANCH, scripts_remote)
+    scripts = str(tmp_path / 'shared-scripts')
+    git(str(tmp_path), 'clone', '--quiet', scripts_remote, scripts)
+    first_oid = commit_file(scripts, 'Makefile.inc', 'first\n')
+    git(scripts, 'push', '--quiet', 'origin', f"HEAD:{DEFAULT_BRANCH}")
+
+    service_remote = str(tmp_path / 'service.git')
+    git(str(tmp_path), 'init', '--quiet', '--bare', '--initial-branch', 'main', service_remote)
+    root = tmp_path / 'workspace'
+    root.mkdir()
+    service = str(root / 'service')
+    git(str(root), 'clone', '--quiet', service_remote, service)
+    git(service, 'checkout', '--quiet', '-b', 'main')
+    url = '../shared-scripts.git' if relative_url else scripts_remote
+    git(service, 'submodule', 'add', '--quiet', '-b', DEFAULT_BRANCH, url, DEFAULT_SUBMODULE)
+    git(service, 'commit', '--quiet', '-m', "Add submodule")
+    git(service, 'push', '--quiet', '-u', 'origin', 'main')
+
+    plain = str(root / 'plain')
+    git(str(root), 'init', '--quiet', plain)
+    commit_file(plain, 'README.md', 'no submodule\n')
+
+    new_oid = commit_file(scripts, 'Makefile.inc', 'second\n')
+    git(scripts, 'push', '--quiet', 'origin', f"HEAD:{DEFAULT_BRANCH}")
+    return str(root), service_remote, first_oid, new_oid
+
+@pytest.fixture
+def workspace(tmp_path, git_identity):
+    return build_workspace(tmp_path)
+
+def statuses(results):
+    return {result.repo: result.status for result in results}
+
+def test_dry_run_reports_without_changing_anything(workspace):
+    root, service_remote, first_oid, new_oid = workspace
+    service = os.path.join(root, 'service')
+    head = git(service, 'rev-parse', 'HEAD')
+
+    results = update_submodules(root, dry_run=True)
+
+    assert statuses(results) == {'plain': 'skipped', 'service': 'would update'}
+    service_result = next(result for result in results if result.repo == 'service')
+    assert (service_result.old_oid, service_result.new_oid) == (first_oid, new_oid)
+    assert git(service, 'rev-parse', 'HEAD') == head
+    assert git(service_remote, 'rev-parse', 'main') == head
+
+def test_update_records_commits_and_pushes_the_branch_tip(workspace):
+    root, service_remote, first_oid, new_oid = workspace
+    service = os.path.join(root, 'service')
+
+    results = update_submodules(root)
+
+    assert statuses(results) == {'plain': 'skipped', 'service': 'updated'}
+    assert git(service, 'rev-parse', f"HEAD:{DEFAULT_SUBMODULE}") == new_oid
+    assert git(service, 'log', '-1', '--format=%s') == COMMIT_MESSAGE
+    assert git(service, 'diff', '--name-only', 'HEAD~1', 'HEAD') == DEFAULT_SUBMODULE
+    assert git(service_remote, 'rev-parse', 'main') == git(service, 'rev-parse', 'HEAD')
+
+    assert statuses(update_submodules(root)) == {'plain': 'skipped', 'service': 'up to date'}
+
+def test_relative_url_resolves_against_the_service_remote(tmp_path, git_identity, monkeypatch):
+    root, service_remote, first_oid, new_oid = build_workspace(tmp_path, relative_url=True)
+    service = os.path.join(root, 'service')
+    # ls-remote must not resolve '../shared-scripts.git' against the caller's directory.
+    elsewhere = tmp_path / 'elsewhere' / 'nested'
+    elsewhere.mkdir(parents=True)
+    monkeypatch.chdir(elsewhere)
+
+    results = update_submodules(root)
+
+    assert statuses(results) == {'plain': 'skipped', 'service': 'updated'}
+    assert git(service, 'rev-parse', f"HEAD:{DEFAULT_SUBMODULE}") == new_oid
+    assert git(service_remote, 'rev-parse', 'main') == git(service, 'rev-parse', 'HEAD')
+
+@pytest.mark.parametrize('origin, url, expected', [
+    ('https://github.com/org/service.git', '../shared-scripts.git', 'https://github.com/org/shared-scripts.git'),
+    ('git@github.com:org/service.git', '../shared-scripts.git', 'git@github.com:org/shared-scripts.git'),
+    ('git@github.com:service.git', '../shared-scripts.git', 'git@github.com:shared-scripts.git'),
+    ('git@github.com:org/service.git', 'git@github.com:other/scripts.git', 'git@github.com:other/scripts.git'),
+])
+def test_resolve_submodule_url(tmp_path, origin, url, expected):
+    repo = str(tmp_path / 'service')
+    git(str(tmp_path), 'init', '--quiet', repo)
+    git(repo, 'remote', 'add', 'origin', origin)
+    assert resolve_submodule_url(repo, url) == expected
@@ -0,0 +1,195 @@
+# summary_cache/main.py
+import sys
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# Size cap for the whole cache directory. Oldest-used entries are removed once
+# the total goes over it. Override with LLM_CACHE_MAX_BYTES.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_error(message):
+    """Print an error message in red."""
+    print(f"{RED}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def get_default_cache_dir():
+    """Return the cache directory, honoring LLM_CACHE_DIR and XDG_CACHE_HOME."""
+    if os.getenv('LLM_CACHE_DIR'):
+        return os.getenv('LLM_CACHE_DIR')
+    cache_home = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'shared-scripts', 'llm-summaries')
+
+def _digest(parts):
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+def file_summary_key(original_oid, new_oid, prompt_variant, file_path):
+    """
+    Key for a per-file summary. Blob OIDs are content addresses, so the key only
+    changes when one side of the file, the prompt, or the path changes.
+    """
+    return _digest(['file', original_oid, new_oid, prompt_variant, file_path])
+
+def final_message_key(summaries, prompt_variant):
+    """Key for the combine call, built from the ordered per-file summaries."""
+    return _digest(['final', prompt_variant, list(summaries)])
+
+class SummaryCache:
+    """
+    Content-addressed on-disk store for LLM responses.
+
+    Each entry is one JSON file named after its key. Reads bump the file's mtime,
+    so evicting by oldest mtime gives least-recently-used order.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        if max_bytes is None:
+            max_bytes = int(os.getenv('LLM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every entry on disk."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with span('read summary cache entry', 'file') as current, open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+                current.bytes_in = len(text)
+            entry = json.loads(text)
+            os.utime(path, None)
+            return entry.get('value')
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value, **metadata):
+        """Store `value` under `key`, then evict old entries if over the size cap."""
+        path = self._entry_path(key)
+        entry = dict(metadata, key=key, value=value, created=time.time())
+        data = json.dumps(entry).encode('utf-8')
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                existing_size = os.path.getsize(path) if os.path.exists(path) else 0
+                # Write to a temp file and rename so a concurrent reader never
+                # sees a half-written entry.
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with span('write summary cache entry', 'file') as current, open(tmp_path, 'wb') as f:
+                    f.write(data)
+                    current.bytes_out = len(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print_error(f"Failed to write cache entry {key}: {e}")
+                return
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(data) - existing_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        """Return a dict describing the cache contents."""
+        entries = list(self._entries())
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "oldest": min((mtime for _, _, mtime in entries), default=None),
+            "newest": max((mtime for _, _, mtime in entries), default=None),
+        }
+
+    def purge(self, older_than_seconds=None):
+        """Delete all entries, or only those unused for `older_than_seconds`. Returns the count removed."""
+        cutoff = time.time() - older_than_seconds if older_than_seconds is not None else None
+        removed = 0
+        with self._lock:
+            for path, _, mtime in list(self._entries()):
+                if cutoff is not None and mtime >= cutoff:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            self._total_bytes = None
+        return removed
+
+def format_timestamp(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else "-"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'purge'):
+        print("Usage: python summary_cache/main.py stats")
+        print("       python summary_cache/main.py purge [<olderThanDays>]")
+        sys.exit(1)
+
+    cache = SummaryCache()
+    if sys.argv[1] == 'stats':
+        stats = cache.stats()
+        print_info(f"Cache directory: {stats['cache_dir']}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Size: {stats['bytes']} / {stats['max_bytes']} bytes")
+        print(f"Least recently used: {format_timestamp(stats['oldest'])}")
+        print(f"Most recently used: {format_timestamp(stats['newest'])}")
+    else:
+        older_than = float(sys.argv[2]) * 86400 if len(sys.argv) > 2 else None
+        removed = cache.purge(older_than)
+        print_success(f"Removed {removed} cache entr{'y' if removed == 1 else 'ies'} from {cache.cache_dir}")
@@ -0,0 +1,675 @@
+# summary_pipeline/main.py
+import sys
+import os
+import difflib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.summary_cache.main import SummaryCache, file_summary_key, final_message_key
+from automation.change_manifest.main import GITLINK_MODE, MANIFEST_FILENAME, iter_manifest, read_manifest_header
+from automation.repo_context.main import RepoContext
+from automation.git_blob_reader.main import BlobInfo
+from automation.trivial_changes.main import TrivialRules, COLLAPSED_LABELS, build_collapsed_summary, build_path_summary
+from automation.tracing.main import span
+
+# Number of per-file summaries sent to the chat endpoint in parallel.
+# The endpoint starts throttling above a handful of concurrent requests per
+# token, so keep this small; override with LLM_MAX_WORKERS.
+DEFAULT_MAX_WORKERS = 4
+
+# How file changes are sent to the chat endpoint: 'diff' sends unified hunks
+# with DEFAULT_DIFF_CONTEXT lines of context, 'full' sends the whole original
+# and new file. Override with LLM_PAYLOAD_MODE and LLM_DIFF_CONTEXT.
+DEFAULT_PAYLOAD_MODE = 'diff'
+DEFAULT_DIFF_CONTEXT = 3
+
+# Payloads longer than DEFAULT_CHUNK_SIZE characters are split into chunks that
+# are summarized one request at a time and then merged. Blobs larger than
+# DEFAULT_MAX_FILE_BYTES are never loaded; they get a metadata-only summary
+# built locally. Override with LLM_CHUNK_SIZE and LLM_MAX_FILE_BYTES.
+DEFAULT_CHUNK_SIZE = 32000
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+
+# Number of manifest records taken from the manifest at a time while their
+# blobs are read.
+FETCH_BATCH_SIZE = 128
+
+# The combine step is a tree reduction: summaries are grouped by directory into
+# requests of at most DEFAULT_REDUCE_TOKEN_BUDGET (estimated) tokens and
+# DEFAULT_REDUCE_FAN_OUT summaries, each group is reduced in parallel, and the
+# results are grouped again until everything fits in one final request.
+# Override with LLM_REDUCE_TOKEN_BUDGET and LLM_REDUCE_FAN_OUT.
+DEFAULT_REDUCE_TOKEN_BUDGET = 6000
+DEFAULT_REDUCE_FAN_OUT = 16
+MAX_REDUCE_LEVELS = 8
+
+# Payloads summarized locally, without a request: files too large to read,
+# files whose blobs are missing from the object database, renames or copies
+# whose content didn't change, and changes matched by one of the
+# trivial_changes rules.
+LOCAL_PAYLOAD_KINDS = ('metadata', 'missing', 'rename', 'trivial')
+
+# Separator between per-file summaries in the combine prompt.
+SUMMARY_SEPARATOR = "\n-------------\n"
+
+# Records passed between the pipeline stages. `index` is the 1-based position
+# of the file in the changeset and is what keeps every later stage ordered.
+# `entry` is the file's ManifestEntry. FileBlobs keeps the entry's `source`,
+# the path a renamed or copied file came from, and its `status`. `rule` names
+# the trivial_changes rule that matched the file, on the records from that
+# point on; a FileBlobs with a rule carries sizes only, never content.
+FileChange = namedtuple('FileChange', ['index', 'entry'])
+FileBlobs = namedtuple('FileBlobs', ['index', 'path', 'original', 'new', 'source', 'status', 'rule'])
+FileBlobs.__new__.__defaults__ = (None, None, None)
+FilePayload = namedtuple('FilePayload', ['index', 'path', 'kind', 'text', 'payload_kind', 'original_oid', 'new_oid', 'source', 'rule'])
+FilePayload.__new__.__defaults__ = (None, None)
+FileSummary = namedtuple('FileSummary', ['index', 'path', 'kind', 'message', 'rule'])
+FileSummary.__new__.__defaults__ = (None,)
+
+# Everything the handlers pass to the stages for one run, resolved by
+# resolve_pipeline_options. `summary_cache`, `debug_dir` and `trivial_rules`
+# are None when the feature is off.
+PipelineOptions = namedtuple('PipelineOptions', [
+    'max_workers', 'summary_cache', 'payload_mode', 'diff_context', 'debug_dir', 'token_budget', 'fan_out',
+    'chunk_size', 'max_file_bytes', 'trivial_rules',
+])
+
+# ANSI color codes for colorful output
+GREEN = '\033[0;32m'
+YELLOW = '\033[0;33m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_error(message):
+    """Print an error message in red."""
+    print(f"{RED}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def print_warning(message):
+    """Print a warning message in yellow."""
+    print(f"{YELLOW}{message}{RESET}")
+
+def get_debug_dir(repo_root, debug_artifacts=None):
+    """
+    Folder for debug artifacts, or None when they are disabled.
+    Enabled by passing debug_artifacts=True or setting LLM_DEBUG_ARTIFACTS.
+    """
+    if debug_artifacts is None:
+        debug_artifacts = bool(os.getenv('LLM_DEBUG_ARTIFACTS'))
+    if not debug_artifacts:
+        return None
+    debug_dir = os.path.join(repo_root, 'TEMP')
+    os.makedirs(debug_dir, exist_ok=True)
+    print_info(f"Writing debug artifacts to: {debug_dir}")
+    return debug_dir
+
+def resolve_pipeline_options(repo_root, max_workers=None, use_cache=None, payload_mode=None, diff_context=None,
+                             debug_artifacts=None, token_budget=None, fan_out=None, chunk_size=None,
+                             max_file_bytes=None, trivial_rules=None):
+    """
+    Fill in every option the caller left as None from its environment
+    variable (LLM_MAX_WORKERS, LLM_CACHE_DISABLE, LLM_PAYLOAD_MODE, ...) or its
+    DEFAULT_* constant, and set up the summary cache, debug folder and
+    trivial-change rules for the run. Returns a PipelineOptions.
+    """
+    debug_dir = get_debug_dir(repo_root, debug_artifacts)
+
+    if use_cache is None:
+        use_cache = not os.getenv('LLM_CACHE_DISABLE')
+    summary_cache = SummaryCache() if use_cache else None
+    if summary_cache is not None:
+        print_info(f"Using summary cache at: {summary_cache.cache_dir}")
+
+    if payload_mode is None:
+        payload_mode = os.getenv('LLM_PAYLOAD_MODE', DEFAULT_PAYLOAD_MODE)
+    if diff_context is None:
+        diff_context = int(os.getenv('LLM_DIFF_CONTEXT', DEFAULT_DIFF_CONTEXT))
+    if max_workers is None:
+        max_workers = int(os.getenv('LLM_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+    max_workers = max(1, max_workers)
+    if token_budget is None:
+        token_budget = int(os.getenv('LLM_REDUCE_TOKEN_BUDGET', DEFAULT_REDUCE_TOKEN_BUDGET))
+    if fan_out is None:
+        fan_out = int(os.getenv('LLM_REDUCE_FAN_OUT', DEFAULT_REDUCE_FAN_OUT))
+    if chunk_size is None:
+        chunk_size = int(os.getenv('LLM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    if max_file_bytes is None:
+        max_file_bytes = int(os.getenv('LLM_MAX_FILE_BYTES', DEFAULT_MAX_FILE_BYTES))
+    if trivial_rules is None and not os.getenv('LLM_TRIVIAL_DISABLE'):
+        trivial_rules = TrivialRules.from_repo(repo_root)
+    print_info(f"Summarizing files with {max_workers} worker(s)")
+
+    return PipelineOptions(max_workers, summary_cache, payload_mode, diff_context, debug_dir, token_budget,
+                           fan_out, chunk_size, max_file_bytes, trivial_rules)
+
+def write_debug_artifact(debug_dir, name, text):
+    """Write one artifact into the debug folder; a no-op when debugging is off."""
+    if debug_dir is None:
+        return
+    try:
+        with span(f"write {name}", 'file') as current, open(os.path.join(debug_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+            current.bytes_out = len(text)
+    except IOError as e:
+        print_warning(f"Failed to write debug artifact {name}: {e}")
+
+def iter_manifest_changes(manifest_path, diff_base=None):
+    """
+    Stage 1: stream a FileChange for every record of the change manifest.
+    With `diff_base`, a manifest written against another base is rejected.
+    """
+    # The header is checked before any record is read, so a manifest of an
+    # unknown version (or a stale one) fails before the pipeline starts.
+    with span(f"read {os.path.basename(manifest_path)} header", 'file') as current:
+        header = read_manifest_header(manifest_path)
+        current.bytes_in = os.path.getsize(manifest_path)
+    if diff_base is not None and header.original_ref != diff_base:
+        raise ValueError(f"{manifest_path} lists changes since {header.original_ref}, not since {diff_base}")
+    print_info(f"Manifest lists {header.files} file(s) between {header.original_ref} and {header.new_ref}")
+    for index, entry in enumerate(iter_manifest(manifest_path), start=1):
+        yield FileChange(index, entry)
+
+def _manifest_side(oid, size, mode):
+    """BlobInfo for one side of a manifest entry, without content; None when that side has no blob."""
+    if oid is None or size is None or mode == GITLINK_MODE:
+        return None
+    return BlobInfo(oid, oid, 'blob', size, None, False)
+
+def _read_loaded(blob_reader, oids):
+    return dict((blob.spec, blob) for blob in blob_reader.read_many(oids))
+
+def _loaded_side(side, loaded):
+    """The blob read for one side; a side that wasn't read keeps content None, a missing one is flagged."""
+    if side is None or side.oid not in loaded:
+        return side
+    blob = loaded[side.oid]
+    return side._replace(missing=True) if blob.missing else blob
+
+def _fetch_batch(batch, blob_reader, max_file_bytes, trivial_rules):
+    planned = []
+    for change in batch:
+        entry = change.entry
+        sides = [_manifest_side(entry.old_oid, entry.old_size, entry.old_mode),
+                 _manifest_side(entry.new_oid, entry.new_size, entry.new_mode)]
+        rule = trivial_rules.classify_entry(entry) if trivial_rules is not None else None
+        if rule is None and entry.binary:
+            print_warning(f"Skipping binary file: {entry.path}")
+            continue
+        # Files matched by a path rule are summarized from the manifest record
+        # alone. Otherwise only blobs under the cap are read; larger ones keep
+        # their oid and size with content None. A pure rename or copy is
+        # recognized by its OIDs alone, so neither side is read.
+        pure_move = entry.source and entry.old_oid == entry.new_oid
+        to_load = [] if rule is not None or pure_move else list(dict.fromkeys(
+            side.oid for side in sides if side is not None and side.size <= max_file_bytes))
+        planned.append((change, sides, rule, to_load))
+
+    # One request for the whole batch; if it fails, read file by file so a
+    # single bad blob only costs its own file.
+    try:
+        loaded = _read_loaded(blob_reader, list(dict.fromkeys(oid for *_, to_load in planned for oid in to_load)))
+    except RuntimeError as e:
+        print_error(f"Error reading a batch of {len(planned)} files: {e}")
+        loaded = None
+
+    for change, sides, rule, to_load in planned:
+        entry = change.entry
+        if rule is not None:
+            yield FileBlobs(change.index, entry.path, sides[0], sides[1], entry.source, entry.status, rule)
+            continue
+        if loaded is None and to_load:
+            try:
+                file_loaded = _read_loaded(blob_reader, to_load)
+            except RuntimeError as e:
+                print_error(f"Error reading blobs for {entry.path}: {e}")
+                print_warning("Skipping this file and continuing with the next one.")
+                continue
+        else:
+            file_loaded = loaded or {}
+        original, new = [_loaded_side(side, file_loaded) for side in sides]
+        yield FileBlobs(change.index, entry.path, original, new, entry.source, entry.status)
+
+def fetch_blobs(changes, blob_reader, max_file_bytes=DEFAULT_MAX_FILE_BYTES, trivial_rules=None):
+    """
+    Stage 2: read both sides of every change by OID through the shared blob
+    reader. OIDs and sizes come from the manifest, so there are no lookups:
+    blobs over max_file_bytes are never loaded, and files matched by a path
+    rule of `trivial_rules` (binaries, vendored files, lockfiles) are passed on
+    without being read. Other binary files are skipped.
+    """
+    batch = []
+    for change in changes:
+        batch.append(change)
+        if len(batch) >= FETCH_BATCH_SIZE:
+            yield from _fetch_batch(batch, blob_reader, max_file_bytes, trivial_rules)
+            batch = []
+    if batch:
+        yield from _fetch_batch(batch, blob_reader, max_file_bytes, trivial_rules)
+
+def build_diff_payload(original_text, new_text, file_name, context_lines, original_name=None):
+    """
+    Build a unified diff between the original and new text; `original_name`
+    is the source path of a renamed or copied file.
+    Returns None when the full content should be sent instead: new or deleted
+    files, or a diff that is larger than the new file itself.
+    """
+    if original_text is None or new_text is None:
+        return None
+    diff_lines = []
+    for line in difflib.unified_diff(original_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                     f"a/{original_name or file_name}", f"b/{file_name}", n=context_lines):
+        diff_lines.append(line if line.endswith('\n') else line + '\n')
+    diff = ''.join(diff_lines)
+    if len(diff) >= len(new_text):
+        return None
+    return "===== UNIFIED DIFF =====\n\n" + (diff or "No content changes.\n")
+
+def build_metadata_summary(file_name, kind, original, new):
+    """Summary for a file too large to send, built from its blob sizes alone."""
+    sizes = ' -> '.join(f"{blob.size} bytes" for blob in (original, new) if blob is not None)
+    verb = {'new': 'added', 'deleted': 'deleted', 'renamed': 'renamed', 'copied': 'copied'}.get(kind, 'modified')
+    return f"{verb.capitalize()} '{file_name}' ({sizes}). The file is too large to summarize, so its content was not reviewed."
+
+def build_missing_summary(file_name, kind):
+    """Summary for a file whose blobs could not be read, built from the manifest alone."""
+    verb = {'new': 'added', 'deleted': 'deleted', 'renamed': 'renamed', 'copied': 'copied'}.get(kind, 'modified')
+    return f"{verb.capitalize()} '{file_name}'. Its content is missing from the repository, so it was not reviewed."
+
+def build_rename_summary(file_name, kind, source):
+    """Summary for a file renamed or copied without changes; no request is needed."""
+    verb = 'Copied' if kind == 'copied' else 'Renamed'
+    return f"{verb} '{source}' to '{file_name}' without changing its content."
+
+def build_full_payload(original_text, new_text, missing_side_message):
+    """Original and new content in one payload, separated by markers."""
+    parts = []
+    if original_text is not None:
+        parts.append("===== ORIGINAL CONTENT =====\n\n")
+        parts.append(original_text)
+        parts.append("\n\n===== NEW CONTENT =====\n\n")
+    parts.append(new_text if new_text is not None else missing_side_message)
+    return ''.join(parts)
+
+def _trivial_payload(blobs, kind, rule, text):
+    print_info(f"File '{blobs.path}' matches the '{rule}' rule; summarizing locally")
+    return FilePayload(blobs.index, blobs.path, kind, text, 'trivial',
+                       blobs.original.oid if blobs.original else None,
+                       blobs.new.oid if blobs.new else None, blobs.source, rule)
+
+def build_payloads(file_blobs, payload_mode=DEFAULT_PAYLOAD_MODE, diff_context=DEFAULT_DIFF_CONTEXT,
+                   include_deleted=False, missing_side_message="File does not exist in the new branch.",
+                   debug_dir=None, trivial_rules=None):
+    """
+    Stage 3: turn each pair of blobs into the text sent to the chat endpoint.
+    Files matched by a rule of `trivial_rules` get a summary built locally
+    instead.
+    """
+    for blobs in file_blobs:
+        if blobs.original is None and blobs.new is None:
+            print_warning(f"Skipping file '{blobs.path}' as it doesn't exist on either side.")
+            continue
+        if blobs.original is None:
+            kind = 'new'
+        elif blobs.new is None:
+            kind = 'deleted'
+        elif blobs.source:
+            kind = 'copied' if blobs.status == 'copied' else 'renamed'
+        else:
+            kind = 'modified'
+        if kind == 'deleted' and not include_deleted:
+            continue
+
+        if blobs.rule is not None:
+            yield _trivial_payload(blobs, kind, blobs.rule,
+                                   build_path_summary(blobs.rule, blobs.path, kind, blobs.original, blobs.new))
+            continue
+
+        if kind in ('renamed', 'copied') and blobs.original.oid == blobs.new.oid:
+            print_info(f"File '{blobs.path}' was {kind} from '{blobs.source}' without changes; summarizing locally")
+            yield FilePayload(blobs.index, blobs.path, kind, build_rename_summary(blobs.path, kind, blobs.source),
+                              'rename', blobs.original.oid, blobs.new.oid, blobs.source)
+            continue
+
+        missing = [blob.oid for blob in (blobs.original, blobs.new) if blob is not None and blob.missing]
+        if missing:
+            print_error(f"Object {', '.join(missing)} of '{blobs.path}' is missing from the repository; "
+                        "it can't be summarized")
+            summary, payload_kind = build_missing_summary(blobs.path, kind), 'missing'
+        elif any(blob is not None and blob.content is None for blob in (blobs.original, blobs.new)):
+            print_warning(f"File '{blobs.path}' is over the size cap; using a metadata-only summary")
+            summary, payload_kind = build_metadata_summary(blobs.path, kind, blobs.original, blobs.new), 'metadata'
+        else:
+            summary = None
+        if summary is not None:
+            yield FilePayload(
+                blobs.index,
+                blobs.path,
+                kind,
+                summary,
+                payload_kind,
+                blobs.original.oid if blobs.original else None,
+                blobs.new.oid if blobs.new else None,
+                blobs.source,
+            )
+            continue
+
+        try:
+            original_text = blobs.original.content.decode('utf-8') if blobs.original else None
+            new_text = blobs.new.content.decode('utf-8') if blobs.new else None
+        except UnicodeDecodeError:
+            print_warning(f"Skipping non-text file: {blobs.path}")
+            continue
+
+        trivial = trivial_rules.classify_texts(blobs.path, original_text, new_text) if trivial_rules is not None else None
+        if trivial is not None:
+            yield _trivial_payload(blobs, kind, *trivial)
+            continue
+
+        text = None
+        if payload_mode == 'diff':
+            text = build_diff_payload(original_text, new_text, blobs.path, diff_context, blobs.source)
+        payload_kind = f"diff{diff_context}" if text is not None else 'full'
+        if text is None:
+            text = build_full_payload(original_text, new_text, missing_side_message)
+        if kind in ('renamed', 'copied'):
+            text = f"File {kind} from '{blobs.source}' to '{blobs.path}'.\n\n{text}"
+        print_info(f"Prepared {payload_kind} payload for {kind} file '{blobs.path}' ({len(text)} chars)")
+        write_debug_artifact(debug_dir, f"{kind}_{blobs.index}.txt", text)
+
+        yield FilePayload(
+            blobs.index,
+            blobs.path,
+            kind,
+            text,
+            payload_kind,
+            blobs.original.oid if blobs.original else None,
+            blobs.new.oid if blobs.new else None,
+            blobs.source,
+        )
+
+def split_payload_text(text, chunk_size):
+    """
+    Split payload text into chunks of about chunk_size characters on line
+    boundaries. Once a chunk is half full it is closed at the next diff hunk
+    header, so hunks are not cut in two when that can be avoided.
+    """
+    chunks = []
+    current = []
+    current_size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > chunk_size:
+            # A single line longer than a chunk is cut where it has to be.
+            if current:
+                chunks.append(''.join(current))
+                current, current_size = [], 0
+            chunks.append(line[:chunk_size])
+            line = line[chunk_size:]
+        at_hunk = line.startswith('@@') and current_size >= chunk_size // 2
+        if current and (current_size + len(line) > chunk_size or at_hunk):
+            chunks.append(''.join(current))
+            current, current_size = [], 0
+        current.append(line)
+        current_size += len(line)
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+def summarize_chunks(payload, request_summary, request_combine=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Summarize an oversized payload chunk by chunk, then merge the chunk summaries."""
+    chunks = split_payload_text(payload.text, chunk_size)
+    print_info(f"Splitting '{payload.path}' into {len(chunks)} chunks")
+    messages = []
+    for number, chunk in enumerate(chunks, start=1):
+        chunk_text = f"(Part {number} of {len(chunks)} of the changes to '{payload.path}')\n\n{chunk}"
+        message = request_summary(payload._replace(text=chunk_text))
+        if message:
+            messages.append(message)
+        else:
+            print_warning(f"No summary for part {number} of '{payload.path}'")
+    if not messages:
+        return None
+    combined = SUMMARY_SEPARATOR.join(messages).strip()
+    if request_combine is None or len(messages) == 1:
+        return combined
+    return request_combine(combined) or combined
+
+def summarize_payload(payload, request_summary, summary_cache=None, prompt_version='', debug_dir=None,
+                      chunk_size=DEFAULT_CHUNK_SIZE, request_combine=None):
+    """Summarize one payload, going to the network only on a cache miss."""
+    try:
+        if payload.payload_kind in LOCAL_PAYLOAD_KINDS:
+            write_debug_artifact(debug_dir, f"{payload.kind}_{payload.index}_llm.txt", payload.text)
+            return FileSummary(payload.index, payload.path, payload.kind, payload.text, payload.rule)
+
+        chunked = bool(chunk_size) and len(payload.text) > chunk_size
+        prompt_variant = f"{prompt_version}:{payload.kind}:{payload.payload_kind}"
+        if chunked:
+            prompt_variant += f":chunks{chunk_size}"
+        message = None
+        cache_path = f"{payload.source} -> {payload.path}" if payload.source else payload.path
+        cache_key = file_summary_key(payload.original_oid, payload.new_oid, prompt_variant, cache_path)
+        if summary_cache is not None:
+            message = summary_cache.get(cache_key)
+            if message:
+                print_success(f"Reusing cached commit message for '{payload.path}'")
+        if not message:
+            if chunked:
+                message = summarize_chunks(payload, request_summary, request_combine, chunk_size)
+            else:
+                message = request_summary(payload)
+            if message and summary_cache is not None:
+                summary_cache.put(cache_key, message, file_path=payload.path)
+        if not message:
+            return None
+        write_debug_artifact(debug_dir, f"{payload.kind}_{payload.index}_llm.txt", message)
+        return FileSummary(payload.index, payload.path, payload.kind, message)
+    except Exception as e:
+        print_error(f"Error processing file {payload.path}: {str(e)}")
+        print_warning("Skipping this file and continuing with the next one.")
+        return None
+
+def summarize_payloads(payloads, request_summary, max_workers=DEFAULT_MAX_WORKERS, summary_cache=None,
+                       prompt_version='', debug_dir=None, chunk_size=DEFAULT_CHUNK_SIZE, request_combine=None):
+    """
+    Stage 4: summarize payloads on a bounded worker pool and yield the results
+    in input order. At most 2 * max_workers payloads are held in memory, and
+    upstream stages keep producing while requests are in flight. Payloads over
+    chunk_size characters are summarized in chunks merged with request_combine.
+    """
+    max_workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for payload in payloads:
+            pending.append(executor.submit(summarize_payload, payload, request_summary, summary_cache,
+                                           prompt_version, debug_dir, chunk_size, request_combine))
+            while len(pending) >= max_workers * 2:
+                summary = pending.popleft().result()
+                if summary is not None:
+                    yield summary
+        while pending:
+            summary = pending.popleft().result()
+            if summary is not None:
+                yield summary
+
+def collapse_trivial_summaries(summaries):
+    """
+    Replace the local summaries of each collapsible trivial_changes rule with
+    one summary listing every file it matched, placed at the first of them, so
+    a thousand vendored files cost the combine step one line instead of a
+    thousand. Rules that matched a single file are left as they are.
+    """
+    by_rule = {}
+    for summary in summaries:
+        if summary.rule in COLLAPSED_LABELS:
+            by_rule.setdefault(summary.rule, []).append(summary)
+    collapsed = {}
+    for rule, matched in by_rule.items():
+        if len(matched) < 2:
+            continue
+        paths = [summary.path for summary in matched]
+        print_info(f"Collapsing {len(matched)} '{rule}' summaries into one")
+        collapsed[matched[0].index] = FileSummary(matched[0].index, os.path.commonpath(paths), 'trivial',
+                                                  build_collapsed_summary(rule, paths), rule)
+        collapsed.update((summary.index, None) for summary in matched[1:])
+    result = []
+    for summary in summaries:
+        summary = collapsed.get(summary.index, summary)
+        if summary is not None:
+            result.append(summary)
+    return result
+
+def combine_summaries(summaries):
+    """Stage 5: join the ordered per-file summaries into the combine prompt."""
+    return SUMMARY_SEPARATOR.join(summary.message for summary in summaries).strip()
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for budgeting."""
+    return len(text) // 4 + 1
+
+def group_summaries(summaries, token_budget, fan_out):
+    """
+    Split summaries into groups that each fit one combine request. Summaries are
+    ordered by directory first, so a group covers one directory (or a run of
+    neighbouring ones) whenever the budget allows.
+    """
+    ordered = sorted(summaries, key=lambda summary: (os.path.dirname(summary.path), summary.index))
+    groups = []
+    current = []
+    current_tokens = 0
+    for summary in ordered:
+        tokens = estimate_tokens(summary.message) + estimate_tokens(SUMMARY_SEPARATOR)
+        if current and (current_tokens + tokens > token_budget or len(current) >= fan_out):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def reduce_group(group, request_combine, summary_cache=None, prompt_version='', token_budget=DEFAULT_REDUCE_TOKEN_BUDGET):
+    """Combine one group of summaries into a single FileSummary."""
+    paths = [summary.path for summary in group]
+    group_path = os.path.commonpath(paths) if len(paths) > 1 else paths[0]
+    messages = [summary.message for summary in group]
+    message = None
+    cache_key = final_message_key(messages, f"{prompt_version}:group")
+    if summary_cache is not None:
+        message = summary_cache.get(cache_key)
+    if not message:
+        message = request_combine(SUMMARY_SEPARATOR.join(messages).strip())
+        if message and summary_cache is not None:
+            summary_cache.put(cache_key, message, file_path=group_path)
+    if not message:
+        # Keep the group's text so nothing is lost; trim it so the next level
+        # still makes progress toward a single request.
+        print_warning(f"Failed to reduce summaries for '{group_path or '.'}'; passing them through")
+        message = SUMMARY_SEPARATOR.join(messages).strip()[:token_budget * 4]
+    return FileSummary(min(summary.index for summary in group), group_path, 'group', message)
+
+def reduce_summaries(summaries, request_combine, token_budget=DEFAULT_REDUCE_TOKEN_BUDGET,
+                     fan_out=DEFAULT_REDUCE_FAN_OUT, max_workers=DEFAULT_MAX_WORKERS,
+                     summary_cache=None, prompt_version=''):
+    """
+    Tree-reduce summaries until they fit in a single combine request.
+
+    Returns the summaries to send to the final combine call, in file order. When
+    everything already fits, the input is returned unchanged, so small
+    changesets still cost exactly one combine request.
+    """
+    fan_out = max(2, fan_out)
+    level = list(summaries)
+    for depth in range(1, MAX_REDUCE_LEVELS + 1):
+        total_tokens = sum(estimate_tokens(summary.message) for summary in level)
+        if len(level) <= fan_out and total_tokens <= token_budget:
+            break
+        groups = group_summaries(level, token_budget, fan_out)
+        print_info(f"Reduce level {depth}: {len(level)} summaries (~{total_tokens} tokens) in {len(groups)} group(s)")
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            level = list(executor.map(
+                lambda group: reduce_group(group, request_combine, summary_cache, prompt_version, token_budget),
+                groups,
+            ))
+    return sorted(level, key=lambda summary: summary.index)
+
+def summarize_manifest(request_summary, request_final, prompt_version, manifest_path=None, repo_context=None,
+                       diff_base=None, include_deleted=False,
+                       missing_side_message="File does not exist in the new branch.", **options):
+    """
+    Run every stage over a change manifest and return the final commit message
+    (the raw reply of `request_final`), or None when it can't be generated.
+
+    `request_summary(payload)` asks for one file summary and
+    `request_final(text)` combines summaries; `prompt_version` keys their cache
+    entries. The manifest defaults to the one in the repo root and must list
+    changes since `diff_base` when that is given. Deleted files are only
+    summarized with include_deleted. Other keyword options are those of
+    resolve_pipeline_options.
+    """
+    owns_context = repo_context is None
+    if owns_context:
+        repo_context = RepoContext()
+    repo_root = repo_context.root
+    if manifest_path is None:
+        manifest_path = os.path.join(repo_root, MANIFEST_FILENAME)
+
+    print_info(f"Reading change manifest: {manifest_path}")
+    if not os.path.exists(manifest_path):
+        print_error(f"Error: change manifest '{manifest_path}' not found.")
+        if owns_context:
+            repo_context.close()
+        return None
+
+    if diff_base is not None:
+        # Accept a branch or an abbreviated hash; the manifest records the full one.
+        diff_base = repo_context.git('rev-parse', '--verify', '--quiet', f"{diff_base}^{{commit}}") or diff_base
+    options = resolve_pipeline_options(repo_root, **options)
+
+    # Each stage is a generator, so files flow through one at a time while up
+    # to max_workers summaries are in flight. Results come back in manifest order.
+    try:
+        changes = iter_manifest_changes(manifest_path, diff_base)
+        file_blobs = fetch_blobs(changes, repo_context.blob_reader, options.max_file_bytes, options.trivial_rules)
+        payloads = build_payloads(file_blobs, options.payload_mode, options.diff_context, include_deleted,
+                                  missing_side_message, options.debug_dir, options.trivial_rules)
+        summaries = list(summarize_payloads(payloads, request_summary, options.max_workers, options.summary_cache,
+                                            prompt_version, options.debug_dir, options.chunk_size, request_final))
+    except ValueError as e:
+        print_error(f"Error reading change manifest: {e}")
+        return None
+    finally:
+        if owns_context:
+            repo_context.close()
+    print_success(f"Summarized {len(summaries)} file(s).")
+    summaries = collapse_trivial_summaries(summaries)
+
+    final_message = None
+    final_key = final_message_key([summary.message for summary in summaries], f"{prompt_version}:final")
+    if options.summary_cache is not None:
+        final_message = options.summary_cache.get(final_key)
+        if final_message:
+            print_success("Reusing cached final commit message")
+    if not final_message:
+        # Large changesets are reduced group by group first, so the final
+        # request stays within the endpoint's context window.
+        reduced = reduce_summaries(summaries, request_final, options.token_budget, options.fan_out,
+                                   options.max_workers, options.summary_cache, prompt_version)
+        print_info(f"Combining {len(reduced)} commit message(s)")
+        final_message = request_final(combine_summaries(reduced))
+        if final_message and options.summary_cache is not None:
+            options.summary_cache.put(final_key, final_message)
+    if final_message:
+        write_debug_artifact(options.debug_dir, 'final_commit_message.txt', final_message)
+    return final_message
@@ -0,0 +1,191 @@
+# synthetic_repo/main.py
+import sys
+import os
+import random
+import argparse
+import subprocess
+from collections import namedtuple
+
+# Shape of the working-tree change set to generate. The ratios are fractions of
+# `changed_files`; whatever is left after binaries, renames, deletions and new
+# files is plain text modifications. `ignored_ratio` adds untracked files that
+# match .gitignore on top and `unchanged_files` adds committed files that are
+# left alone (defaults to `changed_files`).
+RepoSpec = namedtuple('RepoSpec', [
+    'changed_files', 'file_size', 'binary_ratio', 'rename_ratio', 'delete_ratio', 'new_ratio',
+    'ignored_ratio', 'unchanged_files', 'directories', 'seed',
+])
+RepoSpec.__new__.__defaults__ = (100, 2048, 0.05, 0.05, 0.05, 0.1, 0.05, None, 20, 0)
+
+# A generated repository: its work tree, the bare repository configured as
+# `origin`, the branch it is on and how many changes of each kind it holds.
+SyntheticRepo = namedtuple('SyntheticRepo', ['path', 'remote', 'branch', 'counts'])
+
+DEFAULT_BRANCH = 'main'
+
+GITIGNORE = """\
+*.log
+build/
+tmp-*
+"""
+
+WORDS = (
+    "account request response handler service client token session cache index "
+    "update create delete fetch parse render validate config branch commit value "
+    "result error retry timeout payload message summary record report module"
+).split()
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_success(message):
+    """Print a success message in green."""
+    print(f"{GREEN}{message}{RESET}")
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+def git(repo, *args):
+    """Run git in `repo`; raise RuntimeError on failure."""
+    result = subprocess.run(['git', '-C', repo, *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+def text_content(rng, size):
+    """Source-like text of roughly `size` bytes."""
+    lines = []
+    length = 0
+    while length < size:
+        line = f"{rng.choice(WORDS)}_{rng.randrange(1000)} = {' '.join(rng.choices(WORDS, k=rng.randint(3, 9)))}\n"
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines)
+
+def binary_content(rng, size):
+    """Random bytes with a NUL early on, so every detector treats them as binary."""
+    return b'\0' + rng.randbytes(max(size - 1, 0))
+
+def edit_text(rng, text):
+    """Change a few lines of `text`, the way a typical edit would."""
+    lines = text.splitlines(keepends=True) or ['\n']
+    for _ in range(max(1, len(lines) // 20)):
+        position = rng.randrange(len(lines))
+        lines[position] = f"{rng.choice(WORDS)} = {' '.join(rng.choices(WORDS, k=5))}\n"
+    return ''.join(lines)
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb' if isinstance(content, bytes) else 'w') as file:
+        file.write(content)
+
+def plan_counts(spec):
+    """Number of changes of each kind for the spec."""
+    total = spec.changed_files
+    counts = {
+        'binary': int(total * spec.binary_ratio),
+        'renamed': int(total * spec.rename_ratio),
+        'deleted': int(total * spec.delete_ratio),
+        'new': int(total * spec.new_ratio),
+    }
+    counts['modified'] = max(total - sum(counts.values()), 0)
+    counts['ignored'] = int(total * spec.ignored_ratio)
+    return counts
+
+def generate_repo(path, spec=None, with_remote=True):
+    """
+    Create a repository at `path` with one base commit and an uncommitted
+    change set shaped by `spec` (a RepoSpec), as the integrator would find it.
+    With `with_remote`, a bare repository next to it is added as origin and the
+    base commit is pushed. Returns a SyntheticRepo.
+    """
+    spec = spec or RepoSpec()
+    rng = random.Random(spec.seed)
+    counts = plan_counts(spec)
+    unchanged = spec.changed_files if spec.unchanged_files is None else spec.unchanged_files
+
+    if os.path.exists(path) and os.listdir(path):
+        raise ValueError(f"{path} already exists and is not empty")
+    os.makedirs(path, exist_ok=True)
+    git(path, 'init', '--quiet', '--initial-branch', DEFAULT_BRANCH)
+    git(path, 'config', 'user.name', 'Synthetic Repo')
+    git(path, 'config', 'user.email', 'synthetic@example.com')
+    git(path, 'config', 'commit.gpgsign', 'false')
+
+    def file_path(index, extension):
+        return f"dir{index % spec.directories:02d}/file{index:05d}.{extension}"
+
+    # Committed files: everything that will be modified, renamed, deleted or
+    # left alone, plus the binaries that will be rewritten.
+    text_files = [file_path(index, 'txt') for index in range(counts['modified'] + counts['renamed'] + counts['deleted'] + unchanged)]
+    binary_files = [file_path(len(text_files) + index, 'bin') for index in range(counts['binary'])]
+    write_file(os.path.join(path, '.gitignore'), GITIGNORE)
+    contents = {}
+    for name in text_files:
+        contents[name] = text_content(rng, spec.file_size)
+        write_file(os.path.join(path, name), contents[name])
+    for name in binary_files:
+        write_file(os.path.join(path, name), binary_content(rng, spec.file_size))
+    git(path, 'add', '-A')
+    git(path, 'commit', '--quiet', '-m', 'Initial commit')
+
+    remote = None
+    if with_remote:
+        remote = f"{os.path.abspath(path).rstrip(os.sep)}-remote.git"
+        subprocess.run(['git', 'init', '--quiet', '--bare', remote], check=True)
+        git(path, 'remote', 'add', 'origin', remote)
+        git(path, 'push', '--quiet', '-u', 'origin', DEFAULT_BRANCH)
+        git(path, 'remote', 'set-head', 'origin', DEFAULT_BRANCH)
+
+    # Uncommitted change set, drawn from a shuffled copy of the text files.
+    shuffled = list(text_files)
+    rng.shuffle(shuffled)
+    modified = shuffled[:counts['modified']]
+    renamed = shuffled[counts['modified']:counts['modified'] + counts['renamed']]
+    deleted = shuffled[counts['modified'] + counts['renamed']:counts['modified'] + counts['renamed'] + counts['deleted']]
+
+    for name in modified:
+        write_file(os.path.join(path, name), edit_text(rng, contents[name]))
+    for name in renamed:
+        target = os.path.join(path, name.replace('/file', '/moved', 1))
+        os.replace(os.path.join(path, name), target)
+    for name in deleted:
+        os.remove(os.path.join(path, name))
+    for name in binary_files:
+        write_file(os.path.join(path, name), binary_content(rng, spec.file_size))
+    for index in range(counts['new']):
+        write_file(os.path.join(path, f"new/dir{index % spec.directories:02d}/added{index:05d}.txt"), text_content(rng, spec.file_size))
+    for index in range(counts['ignored']):
+        ignored = (f"logs/run{index:05d}.log", f"build/out{index:05d}.txt", f"tmp-{index:05d}")[index % 3]
+        write_file(os.path.join(path, ignored), text_content(rng, spec.file_size))
+
+    return SyntheticRepo(path, remote, DEFAULT_BRANCH, counts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a git repository with a synthetic uncommitted change set.")
+    parser.add_argument('path', help="Directory to create the repository in (must be empty or missing)")
+    parser.add_argument('--files', type=int, default=100, help="Changed files (default: 100)")
+    parser.add_argument('--file-size', type=int, default=2048, help="Approximate bytes per file (default: 2048)")
+    parser.add_argument('--binary-ratio', type=float, default=0.05, help="Fraction of changes that are binary (default: 0.05)")
+    parser.add_argument('--rename-ratio', type=float, default=0.05, help="Fraction of changes that are renames (default: 0.05)")
+    parser.add_argument('--delete-ratio', type=float, default=0.05, help="Fraction of changes that are deletions (default: 0.05)")
+    parser.add_argument('--new-ratio', type=float, default=0.1, help="Fraction of changes that are new files (default: 0.1)")
+    parser.add_argument('--ignored-ratio', type=float, default=0.05,
+                        help="Untracked ignored files to add, as a fraction of --files (default: 0.05)")
+    parser.add_argument('--unchanged', type=int, default=None, help="Committed files left alone (default: --files)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('--no-remote', action='store_true', help="Don't create a bare origin repository")
+    args = parser.parse_args()
+
+    spec = RepoSpec(args.files, args.file_size, args.binary_ratio, args.rename_ratio, args.delete_ratio,
+                    args.new_ratio, args.ignored_ratio, args.unchanged, seed=args.seed)
+    try:
+        repo = generate_repo(args.path, spec, with_remote=not args.no_remote)
+    except (RuntimeError, ValueError) as e:
+        print(str(e))
+        sys.exit(1)
+    print_success(f"Generated {repo.path}" + (f" (origin: {repo.remote})" if repo.remote else ""))
+    print_info(", ".join(f"{count} {kind}" for kind, count in repo.counts.items()))
@@ -0,0 +1,108 @@
+# task_graph/main.py
+import sys
+import os
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.tracing.main import span
+
+# A registered task: `func` is called with the results of `deps`, in order.
+Task = namedtuple('Task', ['name', 'func', 'deps'])
+
+# Wall-clock timing of one finished task, in seconds since the graph started.
+TaskTiming = namedtuple('TaskTiming', ['name', 'start', 'end', 'status'])
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+RED = '\033[0;31m'
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+class TaskFailed(Exception):
+    """Raised by TaskGraph.run when a task raised; the original error is the __cause__."""
+
+    def __init__(self, task_name, error):
+        super().__init__(f"Task '{task_name}' failed: {error}")
+        self.task_name = task_name
+        self.error = error
+
+class TaskGraph:
+    """
+    Run named tasks concurrently as soon as their dependencies have finished.
+
+    Each task is a callable that receives the results of its dependencies as
+    positional arguments. If a task raises, no new tasks are started, the ones
+    already running are allowed to finish, and run() raises TaskFailed.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.results = {}
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def add(self, name, func, deps=()):
+        """Register a task. Dependencies must already be registered, which also rules out cycles."""
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already registered")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        self.tasks[name] = Task(name, func, tuple(deps))
+        return name
+
+    def _run_task(self, task, started_at):
+        start = time.monotonic() - started_at
+        status = 'failed'
+        try:
+            with span(task.name, 'step'):
+                result = task.func(*[self.results[dep] for dep in task.deps])
+            status = 'done'
+            return result
+        finally:
+            with self._lock:
+                self.timings.append(TaskTiming(task.name, start, time.monotonic() - started_at, status))
+
+    def run(self):
+        """Run every task and return a dict of task name to result."""
+        started_at = time.monotonic()
+        pending = dict(self.tasks)
+        running = {}
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failure is None:
+                    ready = [task for task in pending.values() if all(dep in self.results for dep in task.deps)]
+                    for task in ready:
+                        del pending[task.name]
+                        running[executor.submit(self._run_task, task, started_at)] = task.name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = (name, e)
+        if failure is not None:
+            raise TaskFailed(*failure) from failure[1]
+        return self.results
+
+    def print_summary(self):
+        """Print when each task ran, to show which steps overlapped."""
+        print_info("Task timeline (seconds since start):")
+        for timing in sorted(self.timings, key=lambda timing: timing.start):
+            color = GREEN if timing.status == 'done' else RED
+            print(f"  {color}{timing.name:<24}{RESET} {timing.start:7.2f} -> {timing.end:7.2f}  ({timing.end - timing.start:.2f}s)")
@@ -0,0 +1,306 @@
+# tracing/main.py
+import sys
+import os
+import json
+import time
+import shlex
+import atexit
+import pstats
+import cProfile
+import threading
+import subprocess
+from collections import namedtuple
+
+# Tracing is off unless one of these is set:
+# - AUTOMATION_TRACE: write a Chrome trace (chrome://tracing, Perfetto) to this path
+# - AUTOMATION_TRACE_SUMMARY: print the per-span summary table when the run ends
+# - AUTOMATION_PROFILE: run cProfile for the first span with this name, e.g.
+#   'commit_message', and write the stats next to the trace
+TRACE_ENV = 'AUTOMATION_TRACE'
+SUMMARY_ENV = 'AUTOMATION_TRACE_SUMMARY'
+PROFILE_ENV = 'AUTOMATION_PROFILE'
+
+# Functions listed when a profiled span ends.
+PROFILE_TOP_FUNCTIONS = 25
+
+# One finished span. `start` and `duration` are seconds since tracing was
+# enabled; bytes are None when they don't apply. `status` is the exit code of a
+# subprocess, the HTTP status of a request, or 'ok' / the exception name.
+SpanRecord = namedtuple('SpanRecord', ['name', 'category', 'start', 'duration', 'thread', 'bytes_in', 'bytes_out', 'status', 'args'])
+
+# ANSI color codes
+BLUE = '\033[0;34m'
+RESET = '\033[0m'
+
+def print_info(message):
+    """Print an info message in blue."""
+    print(f"{BLUE}{message}{RESET}")
+
+class Span:
+    """An open span; set bytes_in, bytes_out and status before it ends."""
+
+    __slots__ = ('name', 'category', 'args', 'bytes_in', 'bytes_out', 'status', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.bytes_in = None
+        self.bytes_out = None
+        self.status = None
+        self.start = None
+
+    def set(self, **values):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+class _NullSpan:
+    """Returned by span() when tracing is off, so instrumented code costs next to nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **values):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class _ActiveSpan:
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        self.span.start = time.perf_counter()
+        self.tracer._start_profile(self.span.name)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        self.tracer._stop_profile(self.span.name)
+        span = self.span
+        if exc_type is not None:
+            span.status = exc_type.__name__
+        elif span.status is None:
+            span.status = 'ok'
+        self.tracer.records.append(SpanRecord(
+            span.name, span.category, span.start - self.tracer.started_at, end - span.start,
+            threading.current_thread().name, span.bytes_in, span.bytes_out, span.status, span.args,
+        ))
+        return False
+
+class Tracer:
+    """Collects spans from every thread of one run."""
+
+    def __init__(self, trace_path=None, print_summary=False, profile_span=None):
+        self.trace_path = trace_path
+        self.print_summary_at_exit = print_summary
+        self.profile_span = profile_span
+        self.records = []
+        self.started_at = time.perf_counter()
+        self._profile_lock = threading.Lock()
+        self._profiler = None
+        self._profiled = False
+
+    def span(self, name, category='step', **args):
+        return _ActiveSpan(self, Span(name, category, args))
+
+    def _start_profile(self, name):
+        if name != self.profile_span:
+            return
+        with self._profile_lock:
+            # cProfile follows a single thread, so only the first span with
+            # this name is profiled.
+            if self._profiled:
+                return
+            self._profiled = True
+            self._profiler = (threading.get_ident(), cProfile.Profile())
+        self._profiler[1].enable()
+
+    def _stop_profile(self, name):
+        if name != self.profile_span or self._profiler is None or self._profiler[0] != threading.get_ident():
+            return
+        profiler = self._profiler[1]
+        profiler.disable()
+        self._profiler = None
+        base = os.path.splitext(self.trace_path)[0] if self.trace_path else 'automation-trace'
+        profile_path = f"{base}.{name}.prof"
+        profiler.dump_stats(profile_path)
+        print_info(f"Profile of '{name}' written to {profile_path}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+
+    def chrome_trace(self):
+        """The spans as a Chrome trace event dict."""
+        threads = {}
+        events = []
+        for record in sorted(self.records, key=lambda record: record.start):
+            tid = threads.setdefault(record.thread, len(threads) + 1)
+            args = dict(record.args, status=record.status)
+            if record.bytes_in is not None:
+                args['bytes_in'] = record.bytes_in
+            if record.bytes_out is not None:
+                args['bytes_out'] = record.bytes_out
+            events.append({
+                "name": record.name, "cat": record.category, "ph": "X", "pid": os.getpid(), "tid": tid,
+                "ts": round(record.start * 1e6), "dur": round(record.duration * 1e6), "args": args,
+            })
+        for thread_name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path=None):
+        path = path or self.trace_path
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        print_info(f"Trace with {len(self.records)} spans written to {path}")
+
+    def summary(self):
+        """One row per (category, name): count, total and max seconds, bytes, and spans that didn't succeed."""
+        rows = {}
+        for record in self.records:
+            row = rows.setdefault((record.category, record.name), {
+                "category": record.category, "name": record.name, "count": 0, "total": 0.0, "max": 0.0,
+                "bytes_in": 0, "bytes_out": 0, "failed": 0,
+            })
+            row["count"] += 1
+            row["total"] += record.duration
+            row["max"] = max(row["max"], record.duration)
+            row["bytes_in"] += record.bytes_in or 0
+            row["bytes_out"] += record.bytes_out or 0
+            if record.status not in ('ok', 0) and not (isinstance(record.status, int) and 200 <= record.status < 400):
+                row["failed"] += 1
+        return sorted(rows.values(), key=lambda row: row["total"], reverse=True)
+
+    def print_summary(self):
+        """Print the summary table, slowest first. Totals overlap when spans run in parallel or nest."""
+        print(f"\n{'Category':<11}{'Span':<36}{'Count':>7}{'Total':>10}{'Max':>10}{'In':>10}{'Out':>10}{'Failed':>8}")
+        for row in self.summary():
+            print(f"{row['category']:<11}{row['name'][:35]:<36}{row['count']:>7}{row['total']:>9.2f}s{row['max']:>9.2f}s"
+                  f"{format_bytes(row['bytes_in']):>10}{format_bytes(row['bytes_out']):>10}{row['failed']:>8}")
+
+    def finish(self):
+        if self.trace_path:
+            self.write_chrome_trace()
+        if self.print_summary_at_exit:
+            self.print_summary()
+
+def format_bytes(count):
+    for unit in ('B', 'K', 'M'):
+        if count < 1024:
+            return f"{count:.0f}{unit}" if unit == 'B' else f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count:.1f}G"
+
+_tracer = None
+_original_run = subprocess.run
+
+def get_tracer():
+    """The active Tracer, or None when tracing is off."""
+    return _tracer
+
+def span(name, category='step', **args):
+    """
+    Context manager timing one span. Yields an object whose bytes_in,
+    bytes_out and status can be set; when tracing is off it does nothing.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, category, **args)
+
+def command_name(args):
+    """Short span name for a command: the program and, for git, the subcommand."""
+    if isinstance(args, str):
+        try:
+            args = shlex.split(args)
+        except ValueError:
+            args = args.split()
+    args = [str(arg) for arg in args]
+    if not args:
+        return 'subprocess'
+    program = os.path.basename(args[0])
+    if program != 'git':
+        return program
+    rest = iter(args[1:])
+    for arg in rest:
+        if arg in ('-C', '-c'):
+            next(rest, None)
+        elif not arg.startswith('-'):
+            return f"git {arg}"
+    return 'git'
+
+def _traced_run(*popenargs, **kwargs):
+    """
+    subprocess.run, recorded as a 'subprocess' span. Only the command name is
+    kept: arguments carry commit messages, refs and URLs with credentials.
+    """
+    args = popenargs[0] if popenargs else kwargs.get('args')
+    with span(command_name(args), 'subprocess') as current:
+        if kwargs.get('input') is not None:
+            current.bytes_out = len(kwargs['input'])
+        result = _original_run(*popenargs, **kwargs)
+        current.bytes_in = len(result.stdout or '') + len(result.stderr or '')
+        current.status = result.returncode
+        return result
+
+def enable(trace_path=None, print_summary=False, profile_span=None):
+    """
+    Start tracing for the rest of the process, or until `disable`. Every
+    subprocess.run call is recorded while tracing is on; the trace and summary
+    are written when it ends.
+    """
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    _tracer = Tracer(trace_path, print_summary, profile_span)
+    subprocess.run = _traced_run
+    atexit.register(disable)
+    return _tracer
+
+def disable():
+    """Stop tracing: restore subprocess.run, then write the trace and summary."""
+    global _tracer
+    tracer = _tracer
+    if tracer is None:
+        return
+    _tracer = None
+    if subprocess.run is _traced_run:
+        subprocess.run = _original_run
+    tracer.finish()
+
+def enable_from_env():
+    """Enable tracing when AUTOMATION_TRACE, AUTOMATION_TRACE_SUMMARY or AUTOMATION_PROFILE is set."""
+    trace_path = os.getenv(TRACE_ENV)
+    print_summary = bool(os.getenv(SUMMARY_ENV))
+    profile_span = os.getenv(PROFILE_ENV)
+    if trace_path or print_summary or profile_span:
+        return enable(trace_path, print_summary, profile_span)
+    return None
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python tracing/main.py <trace.json>")
+        print("Prints the summary table of a trace written with AUTOMATION_TRACE.")
+        sys.exit(1)
+
+    with open(sys.argv[1]) as f:
+        events = json.load(f)["traceEvents"]
+    tracer = Tracer()
+    threads = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    for event in events:
+        if event["ph"] != "X":
+            continue
+        args = dict(event["args"])
+        tracer.records.append(SpanRecord(
+            event["name"], event["cat"], event["ts"] / 1e6, event["dur"] / 1e6, threads.get(event["tid"]),
+            args.pop("bytes_in", None), args.pop("bytes_out", None), args.pop("status", None), args,
+        ))
+    tracer.print_summary()
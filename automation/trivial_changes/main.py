@@ -0,0 +1,263 @@
+# trivial_changes/main.py
+import sys
+import os
+import re
+import json
+import difflib
+from collections import namedtuple
+
+# Add the parent directory of 'automation' to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from automation.gitignore_matcher.main import parse_ignore_line
+from automation.tracing.main import span
+
+# Per-repo configuration, read from the repository root. Keys are rule names
+# mapped to extra patterns (.gitignore syntax, added after the defaults, so
+# '!pattern' takes a default back out), plus "disable" listing rules to turn
+# off entirely:
+#   {"lockfile": ["deps/*.lock"], "vendored": ["external/"], "disable": ["whitespace"]}
+RULES_FILENAME = ".autocommit-rules.json"
+
+# Rules in the order they are tried. The first three are decided from the
+# manifest record alone, before any blob is read; the last two compare the
+# decoded contents.
+PATH_RULES = ('binary', 'vendored', 'lockfile')
+CONTENT_RULES = ('version_bump', 'whitespace')
+RULE_NAMES = PATH_RULES + CONTENT_RULES
+
+# Paths each rule applies to. 'whitespace' leaves out formats where
+# indentation carries meaning.
+DEFAULT_PATTERNS = {
+    'binary': ['*'],
+    'vendored': ['vendor/', 'third_party/', 'third-party/', 'node_modules/', 'bower_components/', 'Pods/'],
+    'lockfile': [
+        'go.sum', 'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lockb',
+        'Cargo.lock', 'poetry.lock', 'Pipfile.lock', 'uv.lock', 'Gemfile.lock', 'composer.lock',
+        'packages.lock.json', 'gradle.lockfile', 'mix.lock', 'pubspec.lock', 'Podfile.lock', 'flake.lock',
+    ],
+    'version_bump': [
+        'go.mod', 'package.json', 'pyproject.toml', 'setup.py', 'setup.cfg', 'requirements*.txt', 'Pipfile',
+        'Cargo.toml', 'Gemfile', 'composer.json', 'pom.xml', 'build.gradle', 'build.gradle.kts',
+        'gradle.properties', '*.csproj', 'Directory.Packages.props', 'Chart.yaml', 'Dockerfile',
+        'VERSION', 'version.txt', '.tool-versions', '.nvmrc', '.python-version',
+    ],
+    'whitespace': ['*', '!*.py', '!*.yaml', '!*.yml', '!Makefile', '!*.mk', '!*.md', '!*.pug', '!*.haml', '!*.coffee'],
+}
+
+# Heading of the single summary that replaces many local summaries of one
+# rule. Version bumps are not collapsed, since each one names what changed.
+COLLAPSED_LABELS = {
+    'binary': 'Binary assets changed',
+    'vendored': 'Vendored files updated',
+    'lockfile': 'Lockfiles regenerated',
+    'whitespace': 'Whitespace-only edits',
+}
+
+# Items listed in one local summary before the rest are counted.
+MAX_LISTED_ITEMS = 20
+
+# A dotted version, optionally with a 'v' prefix and a pre-release or build
+# suffix: 1.2, v1.2.3, 4.17.21-beta.1, v0.0.0-20230101000000-abcdef123456.
+VERSION_PATTERN = re.compile(r'v?\d+(?:\.\d+)+(?:[-+~][0-9A-Za-z][0-9A-Za-z.+~-]*)?')
+VERSION_PLACEHOLDER = '\0'
+
+# The dependency a version belongs to is the last name-like word before it,
+# e.g. '"lodash": "^' -> 'lodash', 'requests==' -> 'requests'.
+NAME_PATTERN = re.compile(r'[\w@./-]+')
+
+# One version change on a line: `name` is the word before the first version on
+# the line ('' when there is none).
+VersionChange = namedtuple('VersionChange', ['name', 'old', 'new'])
+
+# ANSI color codes
+YELLOW = '\033[0;33m'
+RESET = '\033[0m'
+
+def print_warning(message):
+    """Print a warning message in yellow."""
+    print(f"{YELLOW}{message}{RESET}")
+
+def _normalized_lines(text):
+    """Lines with whitespace collapsed and blank lines dropped."""
+    return [' '.join(line.split()) for line in text.splitlines() if line.strip()]
+
+def _changed_blocks(original_lines, new_lines):
+    matcher = difflib.SequenceMatcher(None, original_lines, new_lines, autojunk=False)
+    return [opcode for opcode in matcher.get_opcodes() if opcode[0] != 'equal']
+
+def whitespace_only(original_text, new_text):
+    """Whether two texts differ in whitespace alone, line breaks included."""
+    return original_text != new_text and original_text.split() == new_text.split()
+
+def version_changes(original_text, new_text):
+    """
+    The version changes between two texts, or None unless every changed line
+    (ignoring whitespace) is the same line with different version numbers.
+    """
+    original_lines = _normalized_lines(original_text)
+    new_lines = _normalized_lines(new_text)
+    changes = []
+    for tag, i1, i2, j1, j2 in _changed_blocks(original_lines, new_lines):
+        if tag != 'replace' or i2 - i1 != j2 - j1:
+            return None
+        for before, after in zip(original_lines[i1:i2], new_lines[j1:j2]):
+            if before == after:
+                continue
+            if VERSION_PATTERN.sub(VERSION_PLACEHOLDER, before) != VERSION_PATTERN.sub(VERSION_PLACEHOLDER, after):
+                return None
+            old, new = VERSION_PATTERN.findall(before), VERSION_PATTERN.findall(after)
+            names = NAME_PATTERN.findall(after[:VERSION_PATTERN.search(after).start()])
+            changes.append(VersionChange(names[-1] if names else '', ', '.join(old), ', '.join(new)))
+    return changes or None
+
+def _listed(items):
+    listed = ', '.join(items[:MAX_LISTED_ITEMS])
+    if len(items) > MAX_LISTED_ITEMS:
+        listed += f" and {len(items) - MAX_LISTED_ITEMS} more"
+    return listed
+
+def build_path_summary(rule, file_name, kind, original, new):
+    """Summary for a file matched by one of the PATH_RULES; `original` and `new` need only a size."""
+    verb = {'new': 'added', 'deleted': 'deleted', 'renamed': 'renamed', 'copied': 'copied'}.get(kind, 'updated')
+    if rule == 'binary':
+        sizes = ' -> '.join(f"{blob.size} bytes" for blob in (original, new) if blob is not None)
+        return f"{verb.capitalize()} binary file '{file_name}' ({sizes})."
+    if rule == 'lockfile':
+        if kind == 'modified':
+            return f"Regenerated lockfile '{file_name}'."
+        return f"{verb.capitalize()} lockfile '{file_name}'."
+    return f"{verb.capitalize()} vendored file '{file_name}'."
+
+def build_version_summary(file_name, changes):
+    """Summary for a file whose only changes are version numbers."""
+    bumps = [f"{change.name} {change.old} -> {change.new}" if change.name else f"{change.old} -> {change.new}"
+             for change in changes]
+    return f"Bumped {len(changes)} version(s) in '{file_name}': {_listed(bumps)}."
+
+def build_whitespace_summary(file_name, original_text, new_text):
+    """Summary for a file whose changes are whitespace only."""
+    original_lines = original_text.splitlines()
+    new_lines = new_text.splitlines()
+    touched = sum(max(i2 - i1, j2 - j1) for _tag, i1, i2, j1, j2 in _changed_blocks(original_lines, new_lines))
+    return f"Reformatted '{file_name}': whitespace-only changes on {touched} line(s), no content changes."
+
+def build_collapsed_summary(rule, paths):
+    """One summary for every file a rule matched; vendored files are listed by directory."""
+    if rule == 'vendored':
+        items = list(dict.fromkeys(os.path.dirname(path) or '.' for path in paths))
+    else:
+        items = list(paths)
+    return f"{COLLAPSED_LABELS[rule]} ({len(paths)} files): {_listed(items)}."
+
+def read_rules_file(path):
+    """
+    The extra patterns and disabled rules of a rules file, as ({rule: [patterns]}, [rules]).
+    A missing file configures nothing; a malformed one is reported and ignored.
+    """
+    try:
+        with span('read rules file', 'file', path=path) as current, open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+            current.bytes_in = len(text)
+    except OSError:
+        return {}, []
+    try:
+        config = json.loads(text)
+        if not isinstance(config, dict):
+            raise ValueError("expected a JSON object")
+    except ValueError as e:
+        print_warning(f"Ignoring {path}: {e}")
+        return {}, []
+
+    patterns = {}
+    disabled = config.get('disable', [])
+    for key, value in config.items():
+        if key == 'disable':
+            continue
+        if key not in RULE_NAMES or not isinstance(value, list):
+            print_warning(f"Ignoring '{key}' in {path}: expected one of {', '.join(RULE_NAMES)} with a list of patterns")
+            continue
+        patterns[key] = [str(pattern) for pattern in value]
+    return patterns, [rule for rule in disabled if rule in RULE_NAMES]
+
+class TrivialRules:
+    """
+    Rule-based classifier for changes that don't need a model to describe.
+
+    Each rule has a list of path patterns in .gitignore syntax. The closest
+    match decides: a pattern matching the file itself wins over one matching a
+    parent directory, and among those the last one wins, so '!path' can take a
+    single file back out of a directory pattern.
+    """
+
+    def __init__(self, patterns=None, disabled=(), source=RULES_FILENAME):
+        patterns = patterns or {}
+        self.enabled = tuple(rule for rule in RULE_NAMES if rule not in disabled)
+        self._rules = {}
+        self._cache = {}
+        for rule in self.enabled:
+            lines = DEFAULT_PATTERNS[rule] + list(patterns.get(rule, []))
+            parsed = (parse_ignore_line(line, '', source, number) for number, line in enumerate(lines, start=1))
+            self._rules[rule] = [(re.compile(parsed_rule.regex), parsed_rule) for parsed_rule in parsed
+                                 if parsed_rule is not None]
+
+    @classmethod
+    def from_repo(cls, repo_root):
+        """The default rules plus whatever the repository's rules file adds or disables."""
+        path = os.path.join(repo_root, RULES_FILENAME)
+        patterns, disabled = read_rules_file(path)
+        return cls(patterns, disabled, path)
+
+    def _match(self, rule, path, is_dir):
+        for regex, pattern in reversed(self._rules[rule]):
+            if pattern.dir_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not pattern.negated
+        return None
+
+    def applies(self, rule, path):
+        """Whether an enabled rule covers a repo-relative path."""
+        if rule not in self._rules:
+            return False
+        key = (rule, path)
+        if key not in self._cache:
+            matched = self._match(rule, path, False)
+            directory = os.path.dirname(path)
+            while matched is None and directory:
+                matched = self._match(rule, directory, True)
+                directory = os.path.dirname(directory)
+            self._cache[key] = bool(matched)
+        return self._cache[key]
+
+    def classify_entry(self, entry):
+        """The first of the PATH_RULES that covers a ManifestEntry, or None."""
+        for rule in PATH_RULES:
+            if rule == 'binary' and not entry.binary:
+                continue
+            if self.applies(rule, entry.path):
+                return rule
+        return None
+
+    def classify_texts(self, file_name, original_text, new_text):
+        """(rule, summary) for a modified text file matched by one of the CONTENT_RULES, or None."""
+        if original_text is None or new_text is None or original_text == new_text:
+            return None
+        if self.applies('version_bump', file_name):
+            changes = version_changes(original_text, new_text)
+            if changes:
+                return 'version_bump', build_version_summary(file_name, changes)
+        if self.applies('whitespace', file_name) and whitespace_only(original_text, new_text):
+            return 'whitespace', build_whitespace_summary(file_name, original_text, new_text)
+        return None
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python trivial_changes/main.py <path> [<path> ...]")
+        print("Prints the path rules covering each path, using the rules file of the current directory.")
+        sys.exit(1)
+
+    rules = TrivialRules.from_repo(os.getcwd())
+    for path in sys.argv[1:]:
+        matched = [rule for rule in RULE_NAMES if rule != 'binary' and rules.applies(rule, path)]
+        print(f"{', '.join(matched) or '-'}\t{path}")